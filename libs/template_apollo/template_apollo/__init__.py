@@ -2,7 +2,10 @@
 
 
 from .apollo_client import ApolloClient
+from .fake_server import FakeApolloServer, FakeApolloFailure
 
 __all__ = [
     'ApolloClient',
+    'FakeApolloServer',
+    'FakeApolloFailure',
 ]
@@ -160,7 +160,7 @@ class ApolloClient(object):
                         nid != latest_notification_id and
                         callable(self.config_changed_handler)
                 ):
-                    logger.info(f"pre call config_changed_handler(entry), entry: {entry}")
+                    logger.info("pre call config_changed_handler(entry), entry: %s", entry)
                     self.config_changed_handler(entry)
         else:
             logger.warning('Sleep...')
@@ -174,7 +174,7 @@ class ApolloClient(object):
             try:
                 self._long_poll()
             except requests.exceptions.RequestException:
-                logger.warning(f"network error, retry_times is {retry_times}", exc_info=True)
+                logger.warning("network error, retry_times is %s", retry_times, exc_info=True)
                 retry_times += 1
             time.sleep(self._cycle_time + 5 * retry_times)
 
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+
+import json
+import time
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs, unquote
+
+logger = logging.getLogger(__name__)
+
+
+class FakeApolloFailure:
+    """
+    故障注入模式
+    """
+    # 返回指定的HTTP状态码
+    STATUS = 'status'
+    # 超过指定时间后再返回
+    TIMEOUT = 'timeout'
+    # 直接断开连接
+    RESET = 'reset'
+
+
+class _FakeApolloRequestHandler(BaseHTTPRequestHandler):
+    # 支持keep-alive, 便于统计客户端的连接复用情况
+    protocol_version = 'HTTP/1.1'
+    server: '_FakeApolloHTTPServer'
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.apollo.record_connection()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("fake apollo: " + format, *args)
+
+    def do_GET(self) -> None:
+        apollo: FakeApolloServer = self.server.apollo
+        parsed = urlparse(self.path)
+        parts: List[str] = [unquote(_p) for _p in parsed.path.strip('/').split('/')]
+        query: Dict[str, List[str]] = parse_qs(parsed.query)
+        endpoint: str = parts[0] if parts else ''
+        if endpoint == 'configfiles':
+            endpoint = '/'.join(parts[:2])
+        apollo.record_request(endpoint)
+        # 延迟注入
+        if apollo.latency > 0:
+            time.sleep(apollo.latency)
+        # 故障注入
+        failure: Optional[Tuple[str, Any]] = apollo.pop_failure(endpoint)
+        if failure is not None:
+            mode, value = failure
+            if mode == FakeApolloFailure.RESET:
+                self.close_connection = True
+                return
+            if mode == FakeApolloFailure.TIMEOUT:
+                time.sleep(value)
+            else:
+                self._send_json(value, None)
+                return
+
+        if endpoint == 'notifications' and parts[1:] == ['v2']:
+            self._handle_notifications(apollo, query)
+        elif endpoint == 'configs' and len(parts) == 4:
+            self._handle_configs(apollo, parts[1], parts[2], parts[3])
+        elif endpoint == 'configfiles/json' and len(parts) == 5:
+            self._handle_configfiles(apollo, parts[2], parts[3], parts[4])
+        else:
+            self._send_json(404, None)
+
+    def _handle_notifications(self, apollo: 'FakeApolloServer', query: Dict[str, List[str]]) -> None:
+        app_id: str = query.get('appId', [''])[0]
+        cluster: str = query.get('cluster', ['default'])[0]
+        try:
+            notifications: List[Dict[str, Any]] = json.loads(query.get('notifications', ['[]'])[0])
+        except ValueError:
+            self._send_json(400, None)
+            return
+        client_ids: Dict[str, int] = {
+            _n['namespaceName']: int(_n.get('notificationId', -1)) for _n in notifications
+        }
+        changed: List[Dict[str, Any]] = apollo.wait_for_changes(app_id, cluster, client_ids)
+        if changed:
+            self._send_json(200, changed)
+        else:
+            self._send_json(304, None)
+
+    def _handle_configs(self, apollo: 'FakeApolloServer', app_id: str, cluster: str, namespace: str) -> None:
+        release: Optional[Dict[str, Any]] = apollo.get_release(app_id, cluster, namespace)
+        if release is None:
+            self._send_json(404, None)
+            return
+        self._send_json(200, {
+            'appId': app_id,
+            'cluster': cluster,
+            'namespaceName': namespace,
+            'configurations': release['configurations'],
+            'releaseKey': release['releaseKey'],
+        })
+
+    def _handle_configfiles(self, apollo: 'FakeApolloServer', app_id: str, cluster: str, namespace: str) -> None:
+        release: Optional[Dict[str, Any]] = apollo.get_release(app_id, cluster, namespace)
+        if release is None:
+            self._send_json(404, None)
+            return
+        self._send_json(200, release['configurations'])
+
+    def _send_json(self, status: int, data: Any) -> None:
+        body: bytes = b'' if data is None else json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+class _FakeApolloHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 大量客户端同时长轮询
+    request_queue_size = 128
+
+    def __init__(self, server_address: Tuple[str, int], apollo: 'FakeApolloServer'):
+        self.apollo = apollo
+        super().__init__(server_address, _FakeApolloRequestHandler)
+
+
+class FakeApolloServer:
+    """
+    进程内的Apollo配置中心替身, 仅用于测试与压测
+    实现了 /notifications/v2, /configs/... 以及 /configfiles/json/... 接口
+    支持脚本化发布配置、延迟注入以及故障注入
+    """
+
+    def __init__(
+            self, app_id: str = 'unittest', cluster: str = 'default', host: str = '127.0.0.1',
+            port: int = 0, long_poll_timeout: float = 60
+    ):
+        """
+        :param app_id: 默认的应用id
+        :param cluster: 默认的集群
+        :param host: 监听地址
+        :param port: 监听端口, 0表示随机端口
+        :param long_poll_timeout: 长轮询最大挂起时间, 超时返回304
+        """
+        self.app_id = app_id
+        self.cluster = cluster
+        self.long_poll_timeout = long_poll_timeout
+        # 每次请求注入的延迟(秒)
+        self.latency: float = 0
+        # (app_id, cluster, namespace) -> {'releaseKey', 'configurations', 'notificationId'}
+        self._releases: Dict[Tuple[str, str, str], Dict[str, Any]] = dict()
+        # endpoint -> [(mode, value), ...]
+        self._failures: Dict[str, List[Tuple[str, Any]]] = dict()
+        self._notification_id: int = 0
+        self._condition = threading.Condition()
+        self._timers: List[threading.Timer] = []
+        # 统计信息
+        self._stats_lock = threading.Lock()
+        self.connections: int = 0
+        self.requests: Dict[str, int] = dict()
+        self._httpd = _FakeApolloHTTPServer((host, port), self)
+        self._thread: Optional[threading.Thread] = None
+        self._running: bool = False
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeApolloServer':
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-apollo', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        for _timer in self._timers:
+            _timer.cancel()
+        # 唤醒所有挂起的长轮询
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        # 未启动时调用shutdown()会一直等待serve_forever退出
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'FakeApolloServer':
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def release(
+            self, namespace: str, configurations: Dict[str, Any],
+            app_id: Optional[str] = None, cluster: Optional[str] = None
+    ) -> int:
+        """
+        发布配置, 并唤醒等待该namespace的长轮询
+        :param namespace: namespace名称
+        :param configurations: 配置内容
+        :param app_id: 应用id, 默认使用初始化时的应用id
+        :param cluster: 集群, 默认使用初始化时的集群
+        :return: 本次发布的notificationId
+        """
+        key = (app_id or self.app_id, cluster or self.cluster, namespace)
+        with self._condition:
+            self._notification_id += 1
+            self._releases[key] = {
+                'releaseKey': f"{time.strftime('%Y%m%d%H%M%S')}-{self._notification_id}",
+                'configurations': {_k: str(_v) for _k, _v in configurations.items()},
+                'notificationId': self._notification_id,
+            }
+            self._condition.notify_all()
+            return self._notification_id
+
+    def schedule_releases(self, releases: List[Tuple[float, str, Dict[str, Any]]]) -> None:
+        """
+        按脚本延迟发布配置
+        :param releases: [(延迟秒数, namespace, configurations), ...]
+        :return:
+        """
+        for delay, namespace, configurations in releases:
+            _timer = threading.Timer(delay, self.release, args=(namespace, configurations))
+            _timer.daemon = True
+            _timer.start()
+            self._timers.append(_timer)
+
+    def set_latency(self, seconds: float) -> None:
+        """
+        设置每次请求的延迟
+        """
+        self.latency = seconds
+
+    def inject_failure(self, endpoint: str, mode: str = FakeApolloFailure.STATUS, value: Any = 500,
+                       times: int = 1) -> None:
+        """
+        注入故障
+        :param endpoint: notifications/configs/configfiles/json
+        :param mode: FakeApolloFailure中的故障模式
+        :param value: status模式下为状态码, timeout模式下为挂起秒数
+        :param times: 故障次数
+        :return:
+        """
+        with self._stats_lock:
+            self._failures.setdefault(endpoint, []).extend([(mode, value)] * times)
+
+    def pop_failure(self, endpoint: str) -> Optional[Tuple[str, Any]]:
+        with self._stats_lock:
+            failures: Optional[List[Tuple[str, Any]]] = self._failures.get(endpoint)
+            if failures:
+                return failures.pop(0)
+        return None
+
+    def get_release(self, app_id: str, cluster: str, namespace: str) -> Optional[Dict[str, Any]]:
+        with self._condition:
+            return self._releases.get((app_id, cluster, namespace))
+
+    def wait_for_changes(self, app_id: str, cluster: str, client_ids: Dict[str, int]) -> List[Dict[str, Any]]:
+        """
+        长轮询, 返回有变更的namespace, 超时返回空列表
+        """
+        deadline: float = time.monotonic() + self.long_poll_timeout
+        with self._condition:
+            while True:
+                changed: List[Dict[str, Any]] = []
+                for namespace, notification_id in client_ids.items():
+                    release = self._releases.get((app_id, cluster, namespace))
+                    if release is not None and release['notificationId'] > notification_id:
+                        changed.append({
+                            'namespaceName': namespace,
+                            'notificationId': release['notificationId'],
+                        })
+                remaining: float = deadline - time.monotonic()
+                if changed or remaining <= 0 or not self._running:
+                    return changed
+                self._condition.wait(remaining)
+
+    def record_connection(self) -> None:
+        with self._stats_lock:
+            self.connections += 1
+
+    def record_request(self, endpoint: str) -> None:
+        with self._stats_lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self.connections = 0
+            self.requests = dict()
@@ -1,11 +1,12 @@
 # -*- coding: UTF-8 -*-
 
 
-from .babel import TemplateBabel, get_text, get_lazy_text, LazyString
+from .babel import TemplateBabel, get_text, get_lazy_text, LazyString, translate_tree
 
 __all__ = [
     'LazyString',
     'TemplateBabel',
     'get_text',
     'get_lazy_text',
+    'translate_tree',
 ]
@@ -1,22 +1,52 @@
 # -*- coding: UTF-8 -*-
 
 
+import os
+import errno
+import logging
 import threading
 import gettext
+from gettext import NullTranslations, GNUTranslations
+from typing import Dict, Optional, List, Iterable, Any
 
 import inject
 
+logger = logging.getLogger(__name__)
+
 # 默认语言
 DEFAULT_LANG = "zh_CN"
+# 最多记录的未知语言数量, 超出后淘汰最早的记录
+MAX_UNKNOWN_LANGS = 256
 
 
 class TemplateBabel:
 
-    def __init__(self, domain: str, location: str):
+    def __init__(self, domain: str, location: str, memo_size: int = 0):
+        """
+        :param domain: 翻译文件的domain
+        :param location: 翻译文件所在目录
+        :param memo_size: 每种语言缓存的翻译结果数量, 0表示不缓存
+        """
         self.domain = domain
         self.location = location
+        self.memo_size = memo_size
         # thread local 存储语言
         self.registry = threading.local()
+        # 语言 -> 已解析的翻译(包含回退链)
+        self._translations: Dict[str, NullTranslations] = dict()
+        # 语言 -> {原文: 译文}
+        self._memo: Dict[str, Dict[str, str]] = dict()
+        # 预加载的语言 -> 展开回退链后的完整翻译字典
+        self._catalogs: Dict[str, Dict[str, str]] = dict()
+        # 没有翻译文件的语言, 使用默认语言的翻译, 不再重复查找翻译文件
+        self._unknown_langs: Dict[str, None] = dict()
+        # 翻译缓存版本, 翻译内容变化时递增
+        self.version: int = 0
+        self._lock = threading.Lock()
+        # mo文件 -> 修改时间
+        self._mo_mtimes: Dict[str, float] = dict()
+        self.watcher_thread: Optional[threading.Thread] = None
+        self._watcher_stopping = threading.Event()
 
     def set_lang(self, lang: str) -> None:
         """
@@ -42,25 +72,433 @@ class TemplateBabel:
         if hasattr(self.registry, 'lang'):
             del self.registry.lang
 
+    def _load_translation(self, lang: str) -> NullTranslations:
+        """
+        从磁盘加载翻译文件, 并按[lang, DEFAULT_LANG]的顺序组装回退链
+        不使用gettext模块的全局缓存, 便于后续重新加载
+        :param lang:
+        :return:
+        """
+        mo_files = gettext.find(self.domain, self.location, languages=[lang, DEFAULT_LANG], all=True)
+        if not mo_files:
+            raise FileNotFoundError(errno.ENOENT, 'No translation file found for domain', self.domain)
+        result: Optional[NullTranslations] = None
+        for mo_file in mo_files:
+            with open(mo_file, 'rb') as fp:
+                t = GNUTranslations(fp)
+            if result is None:
+                result = t
+            else:
+                result.add_fallback(t)
+        return result
+
+    def get_translation(self, lang: str) -> NullTranslations:
+        """
+        获得语言对应的翻译, 每种语言仅从磁盘解析一次
+        未知语言直接使用默认语言的翻译
+        :param lang:
+        :return:
+        """
+        translation: Optional[NullTranslations] = self._translations.get(lang)
+        if translation is not None:
+            return translation
+        if lang in self._unknown_langs:
+            return self.get_translation(DEFAULT_LANG)
+        if lang != DEFAULT_LANG and gettext.find(self.domain, self.location, languages=[lang]) is None:
+            # 未知语言只记录有限的数量, 避免外部传入的语言无限增长
+            with self._lock:
+                if len(self._unknown_langs) >= MAX_UNKNOWN_LANGS:
+                    self._unknown_langs.pop(next(iter(self._unknown_langs)))
+                self._unknown_langs[lang] = None
+            return self.get_translation(DEFAULT_LANG)
+        with self._lock:
+            translation = self._translations.get(lang)
+            if translation is None:
+                translation = self._load_translation(lang)
+                self._translations[lang] = translation
+        return translation
+
+    def gettext(self, v: str, lang: Optional[str] = None) -> str:
+        """
+        翻译文本
+        :param v: 原文
+        :param lang: 语言, 默认使用当前线程的语言
+        :return:
+        """
+        if lang is None:
+            lang = self.get_lang()
+        # 未知语言共用默认语言的翻译结果缓存
+        lang = self.resolve_lang(lang)
+        catalog: Optional[Dict[str, str]] = self._catalogs.get(lang)
+        if catalog is not None:
+            return catalog.get(v, v)
+        memo: Optional[Dict[str, str]] = self._memo.get(lang)
+        if memo is not None:
+            text: Optional[str] = memo.get(v)
+            if text is not None:
+                return text
+        text = self.get_translation(lang).gettext(v)
+        # 仅缓存已加载的语言
+        if self.memo_size > 0 and lang in self._translations:
+            self._remember(lang, v, text)
+        return text
+
+    def _remember(self, lang: str, v: str, text: str) -> None:
+        """
+        缓存翻译结果, 超过memo_size时淘汰最早的结果
+        """
+        with self._lock:
+            memo: Optional[Dict[str, str]] = self._memo.get(lang)
+            if memo is None:
+                memo = self._memo[lang] = dict()
+            if len(memo) >= self.memo_size:
+                memo.pop(next(iter(memo)))
+            memo[v] = text
+
+    def resolve_lang(self, lang: str) -> str:
+        """
+        实际使用的语言, 已知没有翻译文件的语言使用默认语言
+        """
+        return DEFAULT_LANG if lang in self._unknown_langs else lang
+
+    def is_loaded(self, lang: str) -> bool:
+        """
+        语言的翻译是否已经加载
+        """
+        return lang in self._translations or lang in self._catalogs or lang in self._unknown_langs
+
+    def clear_cache(self) -> None:
+        """
+        清理已加载的翻译以及翻译结果缓存
+        :return:
+        """
+        with self._lock:
+            self._translations = dict()
+            self._memo = dict()
+            self._catalogs = dict()
+            self._unknown_langs = dict()
+            self.version += 1
+
+    def _scan_mo_files(self) -> Dict[str, float]:
+        """
+        扫描翻译目录下所有的mo文件
+        :return: {mo文件: 修改时间}
+        """
+        result: Dict[str, float] = dict()
+        try:
+            langs: List[str] = os.listdir(self.location)
+        except OSError:
+            return result
+        for lang in langs:
+            mo_file: str = os.path.join(self.location, lang, 'LC_MESSAGES', f"{self.domain}.mo")
+            try:
+                result[mo_file] = os.stat(mo_file).st_mtime
+            except OSError:
+                continue
+        return result
+
+    def available_languages(self) -> List[str]:
+        """
+        返回翻译目录下所有可用的语言
+        :return:
+        """
+        return sorted(
+            os.path.basename(os.path.dirname(os.path.dirname(mo_file))) for mo_file in self._scan_mo_files()
+        )
+
+    @staticmethod
+    def _flatten(translation: NullTranslations) -> Dict[str, str]:
+        """
+        将翻译的回退链展开为一个字典, 查询结果与translation.gettext一致
+        """
+        chain: List[NullTranslations] = []
+        while translation is not None:
+            chain.append(translation)
+            translation = translation._fallback
+        result: Dict[str, str] = dict()
+        # 从最后一级回退开始, 前面的翻译覆盖后面的翻译
+        for t in reversed(chain):
+            _catalog: Dict = getattr(t, '_catalog', None) or dict()
+            own: Dict[str, str] = dict()
+            # gettext在单数形式缺失时会查找复数形式
+            plural_index: int = t.plural(1) if hasattr(t, 'plural') else 0
+            for key, value in _catalog.items():
+                if isinstance(key, tuple) and key[1] == plural_index:
+                    own[key[0]] = value
+            for key, value in _catalog.items():
+                if isinstance(key, str):
+                    own[key] = value
+            result.update(own)
+        return result
+
+    def preload(self, languages: Optional[Iterable[str]] = None) -> None:
+        """
+        启动时预加载翻译, 每种语言展开为一个完整的翻译字典
+        全部加载完成后一次性替换, 加载过程中不影响正在进行的翻译
+        :param languages: 需要预加载的语言, 默认为翻译目录下所有语言
+        :return:
+        """
+        languages = list(languages) if languages is not None else self.available_languages()
+        if DEFAULT_LANG not in languages:
+            languages.append(DEFAULT_LANG)
+        mtimes: Dict[str, float] = self._scan_mo_files()
+        translations: Dict[str, NullTranslations] = dict()
+        catalogs: Dict[str, Dict[str, str]] = dict()
+        for lang in languages:
+            translations[lang] = self._load_translation(lang)
+            catalogs[lang] = self._flatten(translations[lang])
+        with self._lock:
+            self._translations = translations
+            self._catalogs = catalogs
+            self._memo = dict()
+            # 新增的翻译文件可能包含之前的未知语言
+            self._unknown_langs = dict()
+            self._mo_mtimes = mtimes
+            self.version += 1
+        logger.info("preload translations %s from %s", languages, self.location)
+
+    def reload(self) -> None:
+        """
+        重新加载已经加载过的语言
+        :return:
+        """
+        if self._catalogs:
+            self.preload(list(self._catalogs))
+            return
+        languages: List[str] = list(self._translations)
+        mtimes: Dict[str, float] = self._scan_mo_files()
+        translations: Dict[str, NullTranslations] = {
+            lang: self._load_translation(lang) for lang in languages
+        }
+        with self._lock:
+            self._translations = translations
+            self._memo = dict()
+            self._unknown_langs = dict()
+            self._mo_mtimes = mtimes
+            self.version += 1
+        logger.info("reload translations %s from %s", languages, self.location)
+
+    def start_watcher(self, interval: float = 5) -> None:
+        """
+        启动后台线程轮询mo文件的修改时间, 文件变化时重新加载翻译
+        :param interval: 轮询间隔(秒)
+        :return:
+        """
+        if self.watcher_thread is not None:
+            return
+        if not self._mo_mtimes:
+            self._mo_mtimes = self._scan_mo_files()
+        self._watcher_stopping.clear()
+        self.watcher_thread = threading.Thread(target=self._watch, args=(interval,), name='babel-watcher')
+        self.watcher_thread.daemon = True
+        self.watcher_thread.start()
+
+    def stop_watcher(self) -> None:
+        """
+        停止监听mo文件
+        :return:
+        """
+        self._watcher_stopping.set()
+        if self.watcher_thread is not None:
+            self.watcher_thread.join()
+            self.watcher_thread = None
+
+    def _watch(self, interval: float) -> None:
+        while not self._watcher_stopping.wait(interval):
+            if self._scan_mo_files() == self._mo_mtimes:
+                continue
+            # noinspection PyBroadException
+            try:
+                self.reload()
+            except Exception:
+                logger.warning("failed to reload translations from %s", self.location, exc_info=True)
+                # 避免对同一个错误的文件反复重试
+                self._mo_mtimes = self._scan_mo_files()
+
 
 def get_text(v: str) -> str:
     # 获得配置
-    translate_cfg = inject.instance(TemplateBabel)
-
-    # 获得语言
-    lang = translate_cfg.get_lang()
-    # 默认中文
-    t = gettext.translation(translate_cfg.domain, translate_cfg.location, languages=[lang, DEFAULT_LANG])
-    return t.gettext(v)
+    translate_cfg: TemplateBabel = inject.instance(TemplateBabel)
+    return translate_cfg.gettext(v)
 
 
 class LazyString:
-    def __init__(self, text):
+    """
+    延迟翻译的字符串
+    翻译结果按语言缓存在实例上, 翻译内容重新加载后自动失效
+    """
+    __slots__ = ('text', '_cache', '_version')
+
+    def __init__(self, text: str):
         self.text = text
+        # 语言 -> 译文
+        self._cache: Optional[Dict[str, str]] = None
+        # 缓存对应的 (TemplateBabel, 版本)
+        self._version: Optional[tuple] = None
+
+    def translate(self, lang: Optional[str] = None, translate_cfg: Optional[TemplateBabel] = None) -> str:
+        """
+        翻译
+        :param lang: 语言, 默认使用当前线程的语言
+        :param translate_cfg: 翻译配置, 默认从inject获取
+        :return:
+        """
+        if translate_cfg is None:
+            translate_cfg = inject.instance(TemplateBabel)
+        if lang is None:
+            lang = translate_cfg.get_lang()
+        version: tuple = (id(translate_cfg), translate_cfg.version)
+        cache: Optional[Dict[str, str]] = self._cache
+        if cache is None or self._version != version:
+            cache = self._cache = dict()
+            self._version = version
+        # 未知语言按默认语言缓存, 外部传入的语言不会使缓存无限增长
+        lang = translate_cfg.resolve_lang(lang)
+        text: Optional[str] = cache.get(lang)
+        if text is None:
+            text = translate_cfg.gettext(self.text, lang)
+            # 首次翻译后才能确定是否为未知语言; 仅缓存已加载的语言
+            lang = translate_cfg.resolve_lang(lang)
+            if translate_cfg.is_loaded(lang):
+                cache[lang] = text
+        return text
+
+    def __str__(self) -> str:
+        return self.translate()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.text!r})"
+
+    def __len__(self) -> int:
+        return len(self.translate())
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.translate()
+
+    def __iter__(self):
+        return iter(self.translate())
+
+    def __getitem__(self, key):
+        return self.translate()[key]
 
-    def __str__(self):
-        return get_text(self.text)
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LazyString):
+            # 与__hash__保持一致, 比较原文
+            return self.text == other.text
+        return self.translate() == other if isinstance(other, str) else NotImplemented
+
+    def __ne__(self, other) -> bool:
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __lt__(self, other) -> bool:
+        return self.translate() < str(other) if isinstance(other, (str, LazyString)) else NotImplemented
+
+    def __le__(self, other) -> bool:
+        return self.translate() <= str(other) if isinstance(other, (str, LazyString)) else NotImplemented
+
+    def __gt__(self, other) -> bool:
+        return self.translate() > str(other) if isinstance(other, (str, LazyString)) else NotImplemented
+
+    def __ge__(self, other) -> bool:
+        return self.translate() >= str(other) if isinstance(other, (str, LazyString)) else NotImplemented
+
+    def __hash__(self) -> int:
+        # 按原文计算, 切换语言或重新加载翻译后不变, 可以作为dict的key
+        # 与翻译后的str比较相等, 但哈希值不同, 不能用str查找以LazyString为key的dict
+        return hash((LazyString, self.text))
+
+    def __add__(self, other) -> str:
+        return self.translate() + str(other)
+
+    def __radd__(self, other) -> str:
+        return str(other) + self.translate()
+
+    def __mul__(self, n: int) -> str:
+        return self.translate() * n
+
+    __rmul__ = __mul__
+
+    def __mod__(self, other) -> str:
+        return self.translate() % other
+
+    def __rmod__(self, other) -> str:
+        return other % self.translate()
+
+    def __format__(self, format_spec: str) -> str:
+        return format(self.translate(), format_spec)
+
+    def __getattr__(self, name: str):
+        # 私有属性与魔术方法不代理, 避免copy/pickle时触发翻译
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.translate(), name)
+
+    def __getstate__(self) -> str:
+        return self.text
+
+    def __setstate__(self, state: str) -> None:
+        self.text = state
+        self._cache = None
+        self._version = None
 
 
 def get_lazy_text(v: str) -> LazyString:
     return LazyString(v)
+
+
+# 不需要遍历的类型
+_ATOMIC_TYPES = (str, int, float, bool, type(None))
+
+
+def translate_tree(obj: Any, lang: Optional[str] = None) -> Any:
+    """
+    遍历payload(dict/list/tuple), 一次性翻译其中所有的LazyString
+    语言以及翻译配置仅获取一次, 不包含LazyString的子结构原样返回, 不会被复制
+    可以在json序列化之前调用:
+    json.dumps(translate_tree(payload), cls=TemplateJSONEncoder)
+    :param obj: 待翻译的payload
+    :param lang: 语言, 默认使用当前线程的语言
+    :return:
+    """
+    translate_cfg: TemplateBabel = inject.instance(TemplateBabel)
+    if lang is None:
+        lang = translate_cfg.get_lang()
+    return _translate_node(obj, lang, translate_cfg)
+
+
+def _translate_node(obj: Any, lang: str, translate_cfg: TemplateBabel) -> Any:
+    cls = obj.__class__
+    if cls in _ATOMIC_TYPES:
+        return obj
+    if isinstance(obj, LazyString):
+        return obj.translate(lang, translate_cfg)
+    if cls is dict:
+        result: Optional[Dict] = None
+        for key, value in obj.items():
+            new_key = key.translate(lang, translate_cfg) if isinstance(key, LazyString) else key
+            new_value = value if value.__class__ in _ATOMIC_TYPES else _translate_node(value, lang, translate_cfg)
+            if result is None:
+                if new_key is key and new_value is value:
+                    continue
+                # 第一次发现LazyString时才复制之前的内容
+                result = dict()
+                for _k, _v in obj.items():
+                    if _k is key:
+                        break
+                    result[_k] = _v
+            result[new_key] = new_value
+        return obj if result is None else result
+    if cls is list or cls is tuple:
+        items: Optional[List] = None
+        for index, value in enumerate(obj):
+            new_value = value if value.__class__ in _ATOMIC_TYPES else _translate_node(value, lang, translate_cfg)
+            if items is None:
+                if new_value is value:
+                    continue
+                items = list(obj[:index])
+            items.append(new_value)
+        if items is None:
+            return obj
+        return items if cls is list else tuple(items)
+    return obj
@@ -4,19 +4,25 @@
 from setuptools import setup
 
 SHORT = u'template_json_encoder'
-__version__ = "1.0.0"
+__version__ = "1.1.0"
 __author__ = '1995chen'
 __email__ = 'chenl2448365088@gmail.com'
 # 依赖的库
 __install_requires__ = [
     "inject >= 4.3.1", "numpy >= 1.19.5"
 ]
+# 可选的json后端
+__extras_require__ = {
+    'orjson': ["orjson >= 3.6.0"],
+    'ujson': ["ujson >= 5.0.0"],
+}
 
 setup(
     name='template_json_encoder',
     version=__version__,
     packages=["template_json_encoder"],
     install_requires=__install_requires__,
+    extras_require=__extras_require__,
     url='',
     author=__author__,
     author_email=__email__,
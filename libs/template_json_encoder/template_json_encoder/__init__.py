@@ -1,8 +1,24 @@
 # -*- coding: UTF-8 -*-
 
 
-from .encoder import TemplateJSONEncoder
+from .encoder import TemplateJSONEncoder, register, use_compact_ndarray
+from .ndarray import encode_ndarray, decode_ndarray
+from .backend import dumps, dumps_bytes, loads, get_backend, set_backend
+from .stream import iter_encode, dump_stream
+from .decoder import from_dict
 
 __all__ = [
     'TemplateJSONEncoder',
+    'register',
+    'use_compact_ndarray',
+    'encode_ndarray',
+    'decode_ndarray',
+    'dumps',
+    'dumps_bytes',
+    'loads',
+    'get_backend',
+    'set_backend',
+    'iter_encode',
+    'dump_stream',
+    'from_dict',
 ]
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+
+import re
+import json
+import uuid
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Union
+
+from .encoder import TemplateJSONEncoder
+from .ndarray import ndarray_to_list, is_orjson_native
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# 与orjson输出保持一致: 紧凑格式, 不转义非ASCII字符
+_stdlib_encoder: TemplateJSONEncoder = TemplateJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_stdlib_sorted_encoder: TemplateJSONEncoder = TemplateJSONEncoder(
+    ensure_ascii=False, separators=(',', ':'), sort_keys=True
+)
+# 所有后端共用的default方法
+_default: Callable[[Any], Any] = _stdlib_encoder.default
+_resolve_handler: Callable[[type], Any] = TemplateJSONEncoder.resolve_handler
+# 标准库与ujson输出中与orjson不同的浮点数写法, 跳过字符串:
+# 指数的+号与补零(1e+16/1e-07), 1e-5 <= |x| < 1e-4 时orjson不使用科学计数法(2.5e-05), NaN/Infinity
+_FLOAT_HINT: 're.Pattern' = re.compile(rb'e\+|e-0|e-5|NaN|Infinity')
+_FLOAT_TOKEN: 're.Pattern' = re.compile(
+    rb'"(?:[^"\\]|\\.)*"|(-?)(\d)(?:\.(\d+))?e-0?5(?!\d)|e\+|e-0|-?Infinity|NaN'
+)
+_FLOAT_REPLACEMENTS: Dict[bytes, bytes] = {b'e+': b'e', b'e-0': b'e-'}
+
+
+def _replace_float_token(match: 're.Match') -> bytes:
+    token: bytes = match.group()
+    if token[0] == 0x22:
+        # 字符串原样保留
+        return token
+    if match.group(2) is not None:
+        # 2.5e-05 -> 0.000025
+        return match.group(1) + b'0.0000' + match.group(2) + (match.group(3) or b'')
+    return _FLOAT_REPLACEMENTS.get(token, b'null')
+
+
+def _normalize_floats(data: bytes) -> bytes:
+    """
+    浮点数统一为orjson的写法, 保证各后端的输出逐字节一致: 1e+16 -> 1e16, 1e-07 -> 1e-7, 2.5e-05 -> 0.000025,
+    NaN/Infinity -> null
+    """
+    if _FLOAT_HINT.search(data) is None:
+        return data
+    return _FLOAT_TOKEN.sub(_replace_float_token, data)
+
+
+def _stdlib_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    encoder: TemplateJSONEncoder = _stdlib_sorted_encoder if sort_keys else _stdlib_encoder
+    return _normalize_floats(encoder.encode(obj).encode('utf-8'))
+
+
+# orjson不支持直接写入已序列化的片段, 原生序列化的ndarray先以占位字符串写入, 完成后替换
+_NDARRAY_PLACEHOLDER: str = f"__ndarray_{uuid.uuid4().hex}_"
+_NDARRAY_PLACEHOLDER_RE: 're.Pattern' = re.compile(rb'"' + _NDARRAY_PLACEHOLDER.encode('ascii') + rb'(\d+)"')
+# 当前线程的序列化是否因遇到可原生序列化的ndarray而中止
+_orjson_state: threading.local = threading.local()
+
+
+def _orjson_default(o: Any) -> Any:
+    if _resolve_handler(o.__class__) is ndarray_to_list and is_orjson_native(o):
+        # 中止后重新序列化, 不包含ndarray的数据不需要为占位替换付出额外开销
+        _orjson_state.native_ndarray = True
+        raise TypeError
+    return _default(o)
+
+
+def _orjson_dumps_ndarrays(obj: Any, option: int) -> bytes:
+    """
+    is_orjson_native的ndarray单独使用OPT_SERIALIZE_NUMPY序列化, 其他对象仍经由_default转换
+    """
+    arrays: List[bytes] = []
+
+    def default(o: Any) -> Any:
+        if _resolve_handler(o.__class__) is ndarray_to_list and is_orjson_native(o):
+            arrays.append(orjson.dumps(o, option=orjson.OPT_SERIALIZE_NUMPY))
+            return f"{_NDARRAY_PLACEHOLDER}{len(arrays) - 1}"
+        return _default(o)
+
+    data: bytes = orjson.dumps(obj, default=default, option=option)
+    return _NDARRAY_PLACEHOLDER_RE.sub(lambda match: arrays[int(match.group(1))], data)
+
+
+def _orjson_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    # datetime与dataclass交给TemplateJSONEncoder处理, 保证输出一致
+    # 不全局开启OPT_SERIALIZE_NUMPY: orjson原生输出的float32(最短表示)、datetime64(补全时分秒)与其他后端不同,
+    # 1970年以前的datetime64还会导致进程崩溃, 只有is_orjson_native的数组单独使用该选项序列化
+    option: int = (
+            orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+    )
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    try:
+        try:
+            return orjson.dumps(obj, default=_orjson_default, option=option)
+        except orjson.JSONEncodeError:
+            if not getattr(_orjson_state, 'native_ndarray', False):
+                raise
+            _orjson_state.native_ndarray = False
+        return _orjson_dumps_ndarrays(obj, option)
+    except orjson.JSONEncodeError as e:
+        # orjson不支持超过64位的整数
+        if not str(e).startswith('Integer exceeds'):
+            raise
+    return _stdlib_dumps(obj, sort_keys)
+
+
+def _ujson_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    if sort_keys:
+        # ujson开启sort_keys时, default返回的dict会被序列化为{}
+        return _stdlib_dumps(obj, sort_keys)
+    try:
+        return _normalize_floats(
+            ujson.dumps(obj, default=_default, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+        )
+    except OverflowError:
+        # ujson不支持超过64位的整数
+        return _stdlib_dumps(obj, sort_keys)
+
+
+# 可用的后端 -> (dumps_bytes, loads)
+BACKENDS: Dict[str, tuple] = {'json': (_stdlib_dumps, json.loads)}
+if ujson is not None:
+    BACKENDS['ujson'] = (_ujson_dumps, ujson.loads)
+if orjson is not None:
+    BACKENDS['orjson'] = (_orjson_dumps, orjson.loads)
+
+# 当前使用的后端, 优先使用orjson
+_backend: str = 'orjson' if orjson is not None else 'ujson' if ujson is not None else 'json'
+_dumps_bytes, _loads = BACKENDS[_backend]
+
+
+def get_backend() -> str:
+    """
+    获得当前使用的后端
+    :return: orjson/ujson/json
+    """
+    return _backend
+
+
+def set_backend(name: str) -> None:
+    """
+    切换后端
+    :param name: orjson/ujson/json
+    :return:
+    """
+    global _backend, _dumps_bytes, _loads
+    if name not in BACKENDS:
+        raise ValueError(f"json backend {name} is not installed, available: {list(BACKENDS)}")
+    _backend = name
+    _dumps_bytes, _loads = BACKENDS[name]
+    logger.info("use json backend %s", name)
+
+
+def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    """
+    序列化为utf-8编码的bytes
+    :param obj: 待序列化的对象
+    :param sort_keys: 是否对key排序
+    :return:
+    """
+    return _dumps_bytes(obj, sort_keys)
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """
+    序列化为字符串
+    :param obj: 待序列化的对象
+    :param sort_keys: 是否对key排序
+    :return:
+    """
+    return _dumps_bytes(obj, sort_keys).decode('utf-8')
+
+
+def loads(s: Union[str, bytes]) -> Any:
+    """
+    反序列化
+    :param s: json字符串或bytes
+    :return:
+    """
+    return _loads(s)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+
+import types
+import typing
+import threading
+import dataclasses
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar, FrozenSet
+
+T = TypeVar('T')
+
+# 缺省值标记
+_MISSING = object()
+# PEP 604 的 X | Y 语法
+_UnionType: Optional[type] = getattr(types, 'UnionType', None)
+# 使用type_hooks时最多缓存的转换方法数量, 超出后淘汰最久未使用的
+MAX_HOOKED_DECODERS = 256
+# dataclass类型 -> 编译后的转换方法(未使用type_hooks)
+_decoders: Dict[Tuple[type, Optional[FrozenSet]], Callable[[Dict[str, Any]], Any]] = dict()
+# (dataclass类型, type_hooks) -> 编译后的转换方法, 以hook方法本身为key, 按LRU淘汰, 每次传入新的lambda时不会无限增长
+_hooked_decoders: 'OrderedDict[Tuple[type, FrozenSet], Callable[[Dict[str, Any]], Any]]' = OrderedDict()
+# 生成转换方法时持有, 嵌套的dataclass在同一个线程中递归生成
+_lock: threading.RLock = threading.RLock()
+# 正在生成的转换方法(包括引用自身时的转发方法), 只在持有_lock的线程中使用, 全部生成后再写入缓存
+_compiling: Dict[Tuple[type, Optional[FrozenSet]], Callable[[Dict[str, Any]], Any]] = dict()
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _accepted_types(tp: Any, hooks: Dict[type, Callable[[Any], Any]]) -> Optional[Tuple[type, ...]]:
+    """
+    Union中该类型可以接收的输入类型, 返回None时无法判断, 直接尝试转换
+    """
+    if tp in hooks:
+        return None
+    if dataclasses.is_dataclass(tp) and isinstance(tp, type):
+        return (dict,)
+    origin: Any = getattr(tp, '__origin__', None)
+    if origin in (list, set, frozenset, tuple):
+        return (list, tuple, set, frozenset)
+    if origin is dict:
+        return (dict,)
+    if isinstance(tp, type):
+        return (tp,)
+    return None
+
+
+def _is_optional(tp: Any) -> bool:
+    origin: Any = getattr(tp, '__origin__', None)
+    if origin is typing.Union or (_UnionType is not None and isinstance(tp, _UnionType)):
+        return type(None) in tp.__args__
+    return False
+
+
+def _compile_type(tp: Any, hooks: Dict[type, Callable[[Any], Any]], hooks_key: Optional[FrozenSet]) -> Callable:
+    """
+    生成类型对应的转换方法, 不需要转换时返回_identity
+    """
+    if tp in hooks:
+        return hooks[tp]
+    if dataclasses.is_dataclass(tp) and isinstance(tp, type):
+        return _get_decoder(tp, hooks, hooks_key)
+    origin: Any = getattr(tp, '__origin__', None)
+    args: Tuple = getattr(tp, '__args__', None) or ()
+    if origin is typing.Union or (_UnionType is not None and isinstance(tp, _UnionType)):
+        options: List[Any] = [_a for _a in args if _a is not type(None)]
+        if len(options) == 1:
+            # Optional[X]
+            convert: Callable = _compile_type(options[0], hooks, hooks_key)
+            if convert is _identity:
+                return _identity
+            return lambda value: None if value is None else convert(value)
+        converters: List[Callable] = [_compile_type(_a, hooks, hooks_key) for _a in options]
+        if all(_c is _identity for _c in converters):
+            return _identity
+        # 与dacite一致: 按声明顺序选择可以接收该输入的类型, 例如Union[str, SomeDataclass]中dict转换为SomeDataclass
+        candidates: List[Tuple[Optional[Tuple[type, ...]], Callable]] = [
+            (_accepted_types(_a, hooks), _c) for _a, _c in zip(options, converters)
+        ]
+        # 输入本身已经是Union中不需要转换的类型时直接返回
+        exact: Tuple[type, ...] = tuple(
+            _a for _a, _c in zip(options, converters) if _c is _identity and isinstance(_a, type)
+        )
+
+        def convert_union(value: Any) -> Any:
+            if value is None or type(value) in exact:
+                return value
+            for accepted, _convert in candidates:
+                if accepted is not None and not isinstance(value, accepted):
+                    continue
+                try:
+                    return _convert(value)
+                except (TypeError, ValueError, KeyError, AttributeError):
+                    continue
+            raise ValueError(f"can not convert {value!r} to {tp}")
+
+        return convert_union
+    if origin in (list, set, frozenset) and args:
+        convert = _compile_type(args[0], hooks, hooks_key)
+        if convert is _identity:
+            return origin
+        return lambda value: origin(convert(_v) for _v in value)
+    if origin is tuple and args:
+        if len(args) == 2 and args[1] is Ellipsis:
+            convert = _compile_type(args[0], hooks, hooks_key)
+            return tuple if convert is _identity else lambda value: tuple(convert(_v) for _v in value)
+        converters = [_compile_type(_a, hooks, hooks_key) for _a in args]
+        return lambda value: tuple(_c(_v) for _c, _v in zip(converters, value))
+    if origin is dict and len(args) == 2:
+        convert_key: Callable = _compile_type(args[0], hooks, hooks_key)
+        convert_value: Callable = _compile_type(args[1], hooks, hooks_key)
+        if convert_key is _identity and convert_value is _identity:
+            return dict
+        return lambda value: {convert_key(_k): convert_value(_v) for _k, _v in value.items()}
+    return _identity
+
+
+def _get_decoder(
+        data_class: type, hooks: Dict[type, Callable[[Any], Any]], hooks_key: Optional[FrozenSet]
+) -> Callable[[Dict[str, Any]], Any]:
+    """
+    获得dataclass的转换方法, 首次调用时生成代码并缓存
+    """
+    key: Tuple[type, Optional[FrozenSet]] = (data_class, hooks_key)
+    decoder: Optional[Callable[[Dict[str, Any]], Any]] = _decoders.get(key) if hooks_key is None else None
+    if decoder is not None:
+        return decoder
+    with _lock:
+        decoder = _compiling.get(key)
+        if decoder is not None:
+            return decoder
+        if hooks_key is None:
+            decoder = _decoders.get(key)
+        else:
+            decoder = _hooked_decoders.get(key)
+            if decoder is not None:
+                _hooked_decoders.move_to_end(key)
+        if decoder is not None:
+            return decoder
+        outermost: bool = not _compiling
+        # 先记录一个转发方法, 支持引用自身的dataclass, 调用时转换方法已经生成
+        compiled: List[Callable[[Dict[str, Any]], Any]] = []
+        _compiling[key] = lambda data: compiled[0](data)
+        try:
+            decoder = _compile_decoder(data_class, hooks, hooks_key)
+        except Exception:
+            if outermost:
+                _compiling.clear()
+            raise
+        compiled.append(decoder)
+        _compiling[key] = decoder
+        if outermost:
+            cache: Dict = _decoders if hooks_key is None else _hooked_decoders
+            cache.update(_compiling)
+            _compiling.clear()
+            while len(_hooked_decoders) > MAX_HOOKED_DECODERS:
+                _hooked_decoders.popitem(last=False)
+        return decoder
+
+
+def _compile_decoder(
+        data_class: type, hooks: Dict[type, Callable[[Any], Any]], hooks_key: Optional[FrozenSet]
+) -> Callable[[Dict[str, Any]], Any]:
+    fields: List[dataclasses.Field] = [_f for _f in dataclasses.fields(data_class) if _f.init]
+    # 本地定义的dataclass也可以引用自身
+    type_hints: Dict[str, Any] = typing.get_type_hints(data_class, localns={data_class.__name__: data_class})
+    namespace: Dict[str, Any] = {'_missing': _MISSING, 'cls': data_class}
+    lines: List[str] = ['def __from_dict(data):', '    kwargs = {}']
+    for index, f in enumerate(fields):
+        convert: Callable = _compile_type(type_hints.get(f.name, Any), hooks, hooks_key)
+        lines.append(f"    v = data.get({f.name!r}, _missing)")
+        lines.append("    if v is not _missing:")
+        if convert is _identity:
+            # 不需要转换的字段直接赋值
+            lines.append(f"        kwargs[{f.name!r}] = v")
+        else:
+            namespace[f"c{index}"] = convert
+            lines.append(f"        kwargs[{f.name!r}] = c{index}(v)")
+        if (
+                f.default is dataclasses.MISSING and f.default_factory is dataclasses.MISSING and
+                _is_optional(type_hints.get(f.name))
+        ):
+            # 与dacite一致: 缺少没有默认值的Optional字段时使用None
+            lines.append("    else:")
+            lines.append(f"        kwargs[{f.name!r}] = None")
+    lines.append('    return cls(**kwargs)')
+    exec('\n'.join(lines), namespace)
+    decoder: Callable[[Dict[str, Any]], Any] = namespace['__from_dict']
+    decoder.__qualname__ = f"{data_class.__qualname__}.__from_dict"
+    return decoder
+
+
+def from_dict(
+        data_class: Type[T], data: Dict[str, Any], type_hooks: Optional[Dict[type, Callable[[Any], Any]]] = None
+) -> T:
+    """
+    将dict转换为dataclass, 支持Optional、Union、List/Set/Tuple/Dict以及嵌套的dataclass
+    每个dataclass(以及type_hooks)的转换方法只生成一次, 不对字段做类型校验
+    type_hooks以hook方法本身区分, 每次传入新的lambda时都会重新生成, 应当复用同一个hook方法
+    :param data_class: dataclass类型
+    :param data: 数据
+    :param type_hooks: 类型 -> 转换方法, 例如 {IMessageType: IMessageType}
+    :return:
+    """
+    if not type_hooks:
+        decoder: Optional[Callable[[Dict[str, Any]], Any]] = _decoders.get((data_class, None))
+        if decoder is None:
+            decoder = _get_decoder(data_class, dict(), None)
+        return decoder(data)
+    return _get_decoder(data_class, type_hooks, frozenset(type_hooks.items()))(data)
@@ -3,44 +3,173 @@
 
 import uuid
 import logging
+import operator
 import dataclasses
 from enum import Enum
 from datetime import timedelta, datetime, date
 from decimal import Decimal
 from json import JSONEncoder
-from typing import Any
+from typing import Any, Callable, Dict, Optional, List, Union
 
-from numpy import ndarray
-from template_babel.babel import LazyString
+from .ndarray import ndarray_to_list, generic_to_python, encode_ndarray
 
 logger = logging.getLogger(__name__)
 
+# 未解析过的类型
+_MISSING = object()
+# 无需转换的类型
+_ATOMIC_TYPES = frozenset((str, int, float, bool, type(None)))
+# dataclass类型 -> 编译后的转换方法
+_dataclass_serializers: Dict[type, Callable[[Any], Dict[str, Any]]] = dict()
+
+
+def _compile_dataclass_serializer(tp: type) -> Callable[[Any], Dict[str, Any]]:
+    """
+    为dataclass类型生成专用的转换方法, 避免每次序列化都通过dataclasses.fields反射
+    :param tp: dataclass类型
+    :return:
+    """
+    lines: List[str] = ['def __serialize(obj):']
+    items: List[str] = []
+    for index, f in enumerate(dataclasses.fields(tp)):
+        lines.append(f"    v{index} = obj.{f.name}")
+        items.append(f"{f.name!r}: v{index} if v{index}.__class__ in _atomic else _convert(v{index})")
+    lines.append(f"    return {{{', '.join(items)}}}")
+    namespace: Dict[str, Any] = {'_atomic': _ATOMIC_TYPES, '_convert': _convert}
+    exec('\n'.join(lines), namespace)
+    serializer: Callable[[Any], Dict[str, Any]] = namespace['__serialize']
+    serializer.__qualname__ = f"{tp.__qualname__}.__serialize"
+    _dataclass_serializers[tp] = serializer
+    return serializer
+
+
+def _convert(obj: Any) -> Any:
+    """
+    与_asdict_inner(obj, dict)结果一致, dataclass使用编译后的转换方法
+    """
+    cls = obj.__class__
+    if cls in _ATOMIC_TYPES:
+        return obj
+    serializer: Optional[Callable[[Any], Dict[str, Any]]] = _dataclass_serializers.get(cls)
+    if serializer is not None:
+        return serializer(obj)
+    if cls is list:
+        return [v if v.__class__ in _ATOMIC_TYPES else _convert(v) for v in obj]
+    if cls is dict:
+        return {
+            (k if k.__class__ in _ATOMIC_TYPES else _convert(k)):
+                (v if v.__class__ in _ATOMIC_TYPES else _convert(v))
+            for k, v in obj.items()
+        }
+    if hasattr(cls, dataclasses._FIELDS):
+        return _compile_dataclass_serializer(cls)(obj)
+    if isinstance(obj, tuple) and hasattr(obj, '_fields'):
+        return {key: _convert(obj[index]) for index, key in enumerate(obj._fields)}
+    if isinstance(obj, (list, tuple)):
+        return cls(_convert(v) for v in obj)
+    if isinstance(obj, dict):
+        return cls((_convert(k), _convert(v)) for k, v in obj.items())
+    if hasattr(obj, 'to_dict') and callable(obj.to_dict):
+        return obj.to_dict()
+    return obj
+
+
+def _asdict_inner(obj: Any, dict_factory: Callable) -> Any:
+    if dict_factory is dict:
+        return _convert(obj)
+    if dataclasses._is_dataclass_instance(obj):
+        result = []
+        for f in dataclasses.fields(obj):
+            value = _asdict_inner(getattr(obj, f.name), dict_factory)
+            result.append((f.name, value))
+        return dict_factory(result)
+    elif isinstance(obj, tuple) and hasattr(obj, '_fields'):
+        result = {}
+        for index, key in enumerate(obj._fields):
+            result[key] = _asdict_inner(obj[index], dict_factory)
+        return result
+    elif isinstance(obj, (list, tuple)):
+        return type(obj)(_asdict_inner(v, dict_factory) for v in obj)
+    elif isinstance(obj, dict):
+        return type(obj)((_asdict_inner(k, dict_factory),
+                          _asdict_inner(v, dict_factory))
+                         for k, v in obj.items())
+    elif hasattr(obj, 'to_dict') and callable(obj.to_dict):
+        return obj.to_dict()
+    else:
+        return obj
+
+
+def _to_dict(obj: Any) -> Any:
+    return obj.to_dict()
+
+
+def _translate(obj: Any) -> str:
+    return obj.translate()
+
+
+def _type_name(tp: type) -> str:
+    return f"{tp.__module__}.{tp.__qualname__}"
+
 
 class TemplateJSONEncoder(JSONEncoder):
+    # 注册的类型或类型全名(module.qualname) -> handler(obj)
+    _handlers: Dict[Union[type, str], Callable[[Any], Any]] = dict()
+    # 具体类型 -> handler, 首次遇到该类型时沿MRO解析, None表示无法序列化
+    _handler_cache: Dict[type, Optional[Callable[[Any], Any]]] = dict()
 
-    def default(self, obj: Any) -> Any:
-        try:
-            if isinstance(obj, (timedelta, datetime, date)):
-                return str(obj)
-            if isinstance(obj, Decimal):
-                return float(obj)
-            if isinstance(obj, LazyString):
-                return str(obj)
-            if isinstance(obj, uuid.UUID):
-                return str(obj)
-            if isinstance(obj, Enum):
-                return obj.value
-            if dataclasses.is_dataclass(obj):
-                return self._asdict(obj)
-            if hasattr(obj, 'to_dict') and callable(obj.to_dict):
-                return obj.to_dict()
-            if isinstance(obj, ndarray):
-                return obj.tolist()
-            iterable = iter(obj)
-        except TypeError:
-            logger.warning(f"failed to transfer obj: {obj}, use JSONEncoder.default()")
+    @classmethod
+    def register(cls, tp: Union[type, str], handler: Callable[[Any], Any]) -> None:
+        """
+        注册类型的序列化方法, 该类型及其子类的对象都会使用该方法
+        :param tp: 类型或类型全名, 例如'numpy.ndarray', 使用全名时不需要导入该类型所在的模块
+        :param handler: handler(obj), 返回可以被json序列化的对象
+        :return:
+        """
+        if not callable(handler):
+            raise TypeError(f"handler for {tp} is not callable")
+        # 同一个类型只保留最后注册的handler
+        name: str = tp if isinstance(tp, str) else _type_name(tp)
+        for key in [_k for _k in cls._handlers if _k == name or (isinstance(_k, type) and _type_name(_k) == name)]:
+            cls._handlers.pop(key)
+        cls._handlers[tp] = handler
+        # 已解析的类型可能受影响, 重新解析
+        cls._handler_cache.clear()
+
+    @classmethod
+    def resolve_handler(cls, tp: type) -> Optional[Callable[[Any], Any]]:
+        """
+        沿MRO查找类型的handler并缓存
+        :param tp: 类型
+        :return: handler, 无法序列化时返回None
+        """
+        handler: Optional[Callable[[Any], Any]] = cls._handler_cache.get(tp, _MISSING)
+        if handler is not _MISSING:
+            return handler
+        for base in tp.__mro__:
+            handler = cls._handlers.get(base) or cls._handlers.get(_type_name(base))
+            if handler is not None:
+                break
         else:
-            return list(iterable)
+            if dataclasses.is_dataclass(tp):
+                handler = _convert
+            elif callable(getattr(tp, 'to_dict', None)):
+                handler = _to_dict
+            elif hasattr(tp, '__iter__') or hasattr(tp, '__getitem__'):
+                handler = list
+        cls._handler_cache[tp] = handler
+        return handler
+
+    def default(self, obj: Any) -> Any:
+        handler: Optional[Callable[[Any], Any]] = self._handler_cache.get(obj.__class__, _MISSING)
+        if handler is _MISSING:
+            handler = self.resolve_handler(obj.__class__)
+        if handler is not None:
+            try:
+                return handler(obj)
+            except TypeError:
+                pass
+        logger.warning("failed to transfer obj: %s, use JSONEncoder.default()", obj)
         return JSONEncoder.default(self, obj)
 
     def _asdict(self, obj: Any, *, dict_factory=dict):
@@ -49,24 +178,33 @@ class TemplateJSONEncoder(JSONEncoder):
         return self._asdict_inner(obj, dict_factory)
 
     def _asdict_inner(self, obj: Any, dict_factory):
-        if dataclasses._is_dataclass_instance(obj):
-            result = []
-            for f in dataclasses.fields(obj):
-                value = self._asdict_inner(getattr(obj, f.name), dict_factory)
-                result.append((f.name, value))
-            return dict_factory(result)
-        elif isinstance(obj, tuple) and hasattr(obj, '_fields'):
-            result = {}
-            for index, key in enumerate(obj._fields):
-                result[key] = self._asdict_inner(obj[index], dict_factory)
-            return result
-        elif isinstance(obj, (list, tuple)):
-            return type(obj)(self._asdict_inner(v, dict_factory) for v in obj)
-        elif isinstance(obj, dict):
-            return type(obj)((self._asdict_inner(k, dict_factory),
-                              self._asdict_inner(v, dict_factory))
-                             for k, v in obj.items())
-        elif hasattr(obj, 'to_dict') and callable(obj.to_dict):
-            return obj.to_dict()
-        else:
-            return obj
+        return _asdict_inner(obj, dict_factory)
+
+
+def register(tp: type, handler: Callable[[Any], Any]) -> None:
+    """
+    注册类型的序列化方法
+    :param tp: 类型
+    :param handler: handler(obj)
+    :return:
+    """
+    TemplateJSONEncoder.register(tp, handler)
+
+
+def use_compact_ndarray(enabled: bool = True) -> None:
+    """
+    ndarray是否使用紧凑格式(base64编码的原始内存以及dtype、shape), 使用decode_ndarray解码
+    :param enabled: False时恢复为list
+    :return:
+    """
+    register('numpy.ndarray', encode_ndarray if enabled else ndarray_to_list)
+
+
+for _tp in (timedelta, datetime, date, uuid.UUID):
+    register(_tp, str)
+register(Decimal, float)
+register(Enum, operator.attrgetter('value'))
+# 按类型全名注册, 避免导入numpy与template_babel
+register('template_babel.babel.LazyString', _translate)
+register('numpy.ndarray', ndarray_to_list)
+register('numpy.generic', generic_to_python)
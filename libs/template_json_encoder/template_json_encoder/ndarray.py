@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+
+import base64
+from typing import Any, Dict, Union
+
+# 不在模块级别导入numpy, 收到numpy对象时numpy必然已经导入
+
+# 紧凑格式中存放数据的key
+COMPACT_KEY: str = '__ndarray__'
+# 使用orjson原生序列化的最小元素个数, 较小的数组重新序列化的固定开销大于收益
+ORJSON_NATIVE_MIN_SIZE: int = 512
+
+
+def ndarray_to_list(obj: 'numpy.ndarray') -> list:
+    """
+    ndarray转为list, datetime64按numpy的ISO 8601格式转为字符串并保留原有精度, 例如datetime64[D] -> "2021-01-01"
+    float32等低精度浮点数按tolist扩展为python float, 例如0.1 -> 0.10000000149011612
+    """
+    if obj.dtype.kind == 'M':
+        import numpy
+        return numpy.datetime_as_string(obj).tolist()
+    return obj.tolist()
+
+
+def is_orjson_native(obj: 'numpy.ndarray') -> bool:
+    """
+    orjson的OPT_SERIALIZE_NUMPY能否直接序列化该数组, 且输出与ndarray_to_list一致
+    仅限C连续、本机字节序的bool/整数/float64数组, float32(最短表示)与datetime64(补全时分秒)的输出不同,
+    大端序的数组会按本机字节序错误解读
+    """
+    dtype = obj.dtype
+    return (
+            obj.size >= ORJSON_NATIVE_MIN_SIZE
+            and (dtype.kind in 'biu' or (dtype.kind == 'f' and dtype.itemsize == 8))
+            and dtype.isnative
+            and obj.flags.c_contiguous
+            and obj.__class__.__module__ == 'numpy'
+    )
+
+
+def generic_to_python(obj: 'numpy.generic') -> Any:
+    """
+    numpy标量转为python对象, 例如np.int64 -> int, np.float32 -> float, np.bool_ -> bool
+    转换结果与ndarray_to_list中的同类型元素一致
+    """
+    if obj.dtype.kind == 'M':
+        import numpy
+        return str(numpy.datetime_as_string(obj))
+    return obj.item()
+
+
+def encode_ndarray(obj: 'numpy.ndarray') -> Union[Dict[str, Any], list]:
+    """
+    紧凑格式: 原始内存的base64编码以及dtype、shape, 不需要逐个元素转换
+    object类型的数组无法紧凑编码, 仍转为list
+    """
+    if obj.dtype.hasobject:
+        return ndarray_to_list(obj)
+    data: 'numpy.ndarray' = obj if obj.flags.c_contiguous else obj.copy(order='C')
+    return {
+        COMPACT_KEY: base64.b64encode(data.data).decode('ascii'),
+        'dtype': data.dtype.str,
+        'shape': list(data.shape),
+    }
+
+
+def decode_ndarray(obj: Dict[str, Any]) -> Any:
+    """
+    紧凑格式的解码, 用作json.loads的object_hook
+    json.loads(s, object_hook=decode_ndarray)
+    """
+    if COMPACT_KEY not in obj:
+        return obj
+    import numpy
+    buffer: bytearray = bytearray(base64.b64decode(obj[COMPACT_KEY]))
+    return numpy.frombuffer(buffer, dtype=numpy.dtype(obj['dtype'])).reshape(obj['shape'])
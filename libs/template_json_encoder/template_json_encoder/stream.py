@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+
+from json.encoder import encode_basestring
+from typing import Any, IO, Iterator, List, Optional, Callable
+
+from .backend import dumps, _normalize_floats
+from .encoder import TemplateJSONEncoder, _MISSING
+from .ndarray import ndarray_to_list
+
+# 默认缓冲区大小
+DEFAULT_BUFFER_SIZE: int = 64 * 1024
+
+_float_repr: Callable[[float], str] = float.__repr__
+_int_repr: Callable[[int], str] = int.__repr__
+
+
+def _encode_float_key(o: float) -> str:
+    if o != o:
+        return 'NaN'
+    if o == float('inf'):
+        return 'Infinity'
+    if o == float('-inf'):
+        return '-Infinity'
+    return _float_repr(o)
+
+
+def _encode_float(o: float) -> str:
+    # 与dumps的输出一致, 例如NaN/Infinity输出为null, 1e+16输出为1e16
+    if o != o or o in (float('inf'), float('-inf')):
+        return 'null'
+    text: str = _float_repr(o)
+    if 'e' in text:
+        return _normalize_floats(text.encode('ascii')).decode('ascii')
+    return text
+
+
+def _encode_key(key: Any) -> str:
+    # 与标准库json的规则一致
+    if isinstance(key, str):
+        return encode_basestring(key)
+    if key is True:
+        return '"true"'
+    if key is False:
+        return '"false"'
+    if key is None:
+        return '"null"'
+    if isinstance(key, float):
+        return f'"{_encode_float_key(key)}"'
+    if isinstance(key, int):
+        return f'"{_int_repr(key)}"'
+    raise TypeError(f"keys must be str, int, float, bool or None, not {key.__class__.__name__}")
+
+
+def _resolve(o: Any) -> Optional[Callable[[Any], Any]]:
+    handler: Optional[Callable[[Any], Any]] = TemplateJSONEncoder._handler_cache.get(o.__class__, _MISSING)
+    if handler is _MISSING:
+        handler = TemplateJSONEncoder.resolve_handler(o.__class__)
+    return handler
+
+
+def _iterencode(o: Any, markers: set) -> Iterator[str]:
+    """
+    逐段生成json字符串, 可迭代对象逐个元素消费, 不会先转为list
+    """
+    if isinstance(o, str):
+        yield encode_basestring(o)
+    elif o is None:
+        yield 'null'
+    elif o is True:
+        yield 'true'
+    elif o is False:
+        yield 'false'
+    elif isinstance(o, int):
+        yield _int_repr(o)
+    elif isinstance(o, float):
+        yield _encode_float(o)
+    elif isinstance(o, dict):
+        yield from _iterencode_dict(o, markers)
+    elif isinstance(o, (list, tuple)):
+        yield from _iterencode_list(o, markers)
+    else:
+        handler: Optional[Callable[[Any], Any]] = _resolve(o)
+        if handler is None:
+            raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
+        if handler is list:
+            # 生成器/ORM结果集等可迭代对象, 惰性消费
+            yield from _iterencode_list(o, markers)
+        elif handler is ndarray_to_list:
+            # 整个数组交给当前后端的dumps, 避免逐个元素生成片段
+            # orjson后端下较大的bool/整数/float64数组由orjson直接序列化, 其余经由ndarray_to_list转为list
+            yield dumps(o)
+        else:
+            marker: int = id(o)
+            if marker in markers:
+                raise ValueError("Circular reference detected")
+            markers.add(marker)
+            yield from _iterencode(handler(o), markers)
+            markers.discard(marker)
+
+
+def _iterencode_list(o: Any, markers: set) -> Iterator[str]:
+    marker: int = id(o)
+    if marker in markers:
+        raise ValueError("Circular reference detected")
+    markers.add(marker)
+    separator: str = '['
+    for value in o:
+        yield separator
+        separator = ','
+        if value.__class__ is str:
+            yield encode_basestring(value)
+        else:
+            yield from _iterencode(value, markers)
+    yield '[]' if separator == '[' else ']'
+    markers.discard(marker)
+
+
+def _iterencode_dict(o: dict, markers: set) -> Iterator[str]:
+    marker: int = id(o)
+    if marker in markers:
+        raise ValueError("Circular reference detected")
+    markers.add(marker)
+    separator: str = '{'
+    for key, value in o.items():
+        yield separator
+        separator = ','
+        yield encode_basestring(key) if key.__class__ is str else _encode_key(key)
+        yield ':'
+        if value.__class__ is str:
+            yield encode_basestring(value)
+        else:
+            yield from _iterencode(value, markers)
+    yield '{}' if separator == '{' else '}'
+    markers.discard(marker)
+
+
+def iter_encode(obj: Any, buffer_size: int = DEFAULT_BUFFER_SIZE) -> Iterator[bytes]:
+    """
+    流式序列化, 按缓冲区大小逐块生成utf-8编码的bytes
+    内存占用取决于缓冲区大小与单个元素的大小, 与整体数据量无关
+    :param obj: 待序列化的对象
+    :param buffer_size: 缓冲区大小(字符数), 缓冲区满后输出一块
+    :return:
+    """
+    if buffer_size <= 0:
+        raise ValueError(f"buffer_size must be positive, got {buffer_size}")
+    parts: List[str] = []
+    size: int = 0
+    for chunk in _iterencode(obj, set()):
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield ''.join(parts).encode('utf-8')
+            parts.clear()
+            size = 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def dump_stream(obj: Any, fp: IO[bytes], buffer_size: int = DEFAULT_BUFFER_SIZE) -> int:
+    """
+    流式序列化并写入二进制文件对象
+    :param obj: 待序列化的对象
+    :param fp: 支持write(bytes)的文件对象
+    :param buffer_size: 缓冲区大小(字符数)
+    :return: 写入的字节数
+    """
+    written: int = 0
+    for chunk in iter_encode(obj, buffer_size):
+        fp.write(chunk)
+        written += len(chunk)
+    return written
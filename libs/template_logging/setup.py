@@ -9,12 +9,19 @@ __author__ = '1995chen'
 __email__ = 'chenl2448365088@gmail.com'
 # 依赖的库
 __install_requires__ = []
+# 可选依赖
+__extras_require__ = {
+    'zstd': ["zstandard >= 0.15.0"],
+    # TemplateJSONFormatter使用TemplateJSONEncoder序列化extra中的字段
+    'json': ["template_json_encoder >= 1.1.0"],
+}
 
 setup(
     name='template_logging',
     version=__version__,
     packages=["template_logging"],
     install_requires=__install_requires__,
+    extras_require=__extras_require__,
     url='',
     author=__author__,
     author_email=__email__,
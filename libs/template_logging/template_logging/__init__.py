@@ -1,11 +1,24 @@
 # -*- coding: UTF-8 -*-
 
 
-from .logger import getLogger, init_logger
-from .handlers import TemplateTimedRotatingFileHandler
+from .logger import getLogger, init_logger, shutdown_logger
+from .handlers import (
+    TemplateTimedRotatingFileHandler, TemplateQueueHandler, TemplateQueueListener, TemplateRingBufferHandler
+)
+from .formatters import TemplateJSONFormatter
+from .filters import TemplateRateLimitFilter
+from .lazy import lazy, LazyMessage
 
 __all__ = [
     'init_logger',
     'getLogger',
+    'shutdown_logger',
     'TemplateTimedRotatingFileHandler',
+    'TemplateQueueHandler',
+    'TemplateQueueListener',
+    'TemplateRingBufferHandler',
+    'TemplateJSONFormatter',
+    'TemplateRateLimitFilter',
+    'lazy',
+    'LazyMessage',
 ]
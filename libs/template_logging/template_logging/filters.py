@@ -0,0 +1,111 @@
+# -*- coding: UTF-8 -*-
+
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# 汇总日志上的标记, 汇总日志本身不受限流影响
+SUMMARY_ATTR = 'rate_limit_summary'
+
+
+class _Window:
+    """
+    同一条日志(logger, 行号, 日志模板)在当前时间窗口内的计数
+    """
+    __slots__ = ('start', 'count', 'suppressed', 'level', 'template')
+
+    def __init__(self, start: float, level: int, template: str):
+        self.start: float = start
+        self.count: int = 0
+        self.suppressed: int = 0
+        self.level: int = level
+        self.template: str = template
+
+
+class TemplateRateLimitFilter(logging.Filter):
+    """
+    对同一条日志(logger, 行号, 日志模板)限流
+    每个时间窗口内前rate条正常输出, 超出后每sample条保留1条(sample为0时全部丢弃)
+    窗口结束后输出一条 "suppressed N messages" 的汇总日志(该日志再次出现, 或每隔window秒有日志经过该filter时)
+
+    log.ini中配置:
+    [filter_rate_limit]
+    class=template_logging.TemplateRateLimitFilter
+    args=(60, 10)
+    """
+
+    def __init__(self, window: float = 60, rate: int = 1, sample: int = 0, max_keys: int = 10000):
+        """
+        :param window: 时间窗口(秒)
+        :param rate: 每个时间窗口内正常输出的条数
+        :param sample: 超出rate后每sample条保留1条, 为0时全部丢弃
+        :param max_keys: 最多记录的日志条目数, 超出后清空
+        """
+        if window <= 0:
+            raise ValueError(f"window must be positive, got {window}")
+        if rate < 0 or sample < 0:
+            raise ValueError(f"rate and sample must not be negative, got {rate}, {sample}")
+        super().__init__()
+        self.window: float = window
+        self.rate: int = rate
+        self.sample: int = sample
+        self.max_keys: int = max_keys
+        self._windows: Dict[Tuple[str, int, str], _Window] = dict()
+        # 下次清理过期窗口的时间, 已经不再出现的日志也能输出汇总
+        self._next_purge: float = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, SUMMARY_ATTR, False):
+            return True
+        msg: Any = record.msg
+        if not isinstance(msg, str):
+            # 日志内容可能是dict等无法hash的对象
+            try:
+                msg = str(msg)
+            except Exception:
+                return True
+        key: Tuple[str, int, str] = (record.name, record.lineno, msg)
+        now: float = record.created
+        expired: List[Tuple[str, _Window]] = []
+        with self._lock:
+            if now >= self._next_purge or len(self._windows) >= self.max_keys:
+                self._purge(now, expired)
+            window: Optional[_Window] = self._windows.get(key)
+            if window is None or now - window.start >= self.window:
+                if window is not None and window.suppressed:
+                    expired.append((record.name, window))
+                window = self._windows[key] = _Window(now, record.levelno, msg)
+            window.count += 1
+            over: int = window.count - self.rate
+            allowed: bool = over <= 0 or (self.sample > 0 and over % self.sample == 0)
+            if not allowed:
+                window.suppressed += 1
+        for name, summary in expired:
+            self._emit_summary(name, summary)
+        return allowed
+
+    def _purge(self, now: float, expired: List[Tuple[str, _Window]]) -> None:
+        """
+        清理已过期的窗口, 仍然过多时全部清空
+        """
+        for key in [_k for _k, _w in self._windows.items() if now - _w.start >= self.window]:
+            window: _Window = self._windows.pop(key)
+            if window.suppressed:
+                expired.append((key[0], window))
+        if len(self._windows) >= self.max_keys:
+            expired.extend((_k[0], _w) for _k, _w in self._windows.items() if _w.suppressed)
+            self._windows.clear()
+        self._next_purge = now + self.window
+
+    def _emit_summary(self, name: str, window: _Window) -> None:
+        """
+        直接交给该logger的handlers输出, 不经过logger的级别与filter判断
+        """
+        logger: logging.Logger = logging.getLogger(name)
+        record: logging.LogRecord = logger.makeRecord(
+            name, window.level, '(rate limit)', 0, 'suppressed %d messages in %.0fs: %s',
+            (window.suppressed, self.window, window.template), None, extra={SUMMARY_ATTR: True}
+        )
+        logger.callHandlers(record)
@@ -0,0 +1,79 @@
+# -*- coding: UTF-8 -*-
+
+
+import json
+import time
+import socket
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# LogRecord自带的属性, 其余属性视为extra
+_RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+def _load_dumps() -> Callable[[Any], str]:
+    """
+    优先使用template_json_encoder, 与接口返回的序列化规则一致
+    """
+    try:
+        from template_json_encoder import dumps
+    except ImportError:
+        return _stdlib_dumps
+    return dumps
+
+
+class TemplateJSONFormatter(logging.Formatter):
+    """
+    每条日志输出为一行json, extra中的字段一并输出
+    log.ini中配置 class=template_logging.TemplateJSONFormatter
+    """
+    default_time_format = '%Y-%m-%dT%H:%M:%S'
+
+    def __init__(self, fmt=None, datefmt=None, style='%', validate=True, **kwargs):
+        # 不使用fmt, 保留参数以便在log.ini中配置
+        super().__init__(None, datefmt, style, validate, **kwargs)
+        self.hostname: str = socket.gethostname()
+        self._dumps: Optional[Callable[[Any], str]] = None
+        # (秒, 格式化后的时间), 同一秒内的日志复用
+        self._last_time: Tuple[int, str] = (-1, '')
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        second: int = int(record.created)
+        cached_second, text = self._last_time
+        if cached_second != second:
+            text = time.strftime(datefmt or self.datefmt or self.default_time_format, self.converter(second))
+            self._last_time = (second, text)
+        return f"{text}.{int(record.msecs):03d}"
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'host': self.hostname,
+            'process': record.process,
+            'thread': record.thread,
+            'file': record.filename,
+            'line': record.lineno,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = self.formatStack(record.stack_info)
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                data[key] = value
+        if self._dumps is None:
+            self._dumps = _load_dumps()
+        try:
+            return self._dumps(data)
+        except (TypeError, ValueError):
+            # extra中存在无法序列化的对象
+            return _stdlib_dumps(data)
@@ -3,26 +3,302 @@
 
 import os
 import re
+import copy
+import queue
 import tarfile
 import time
 import datetime
-from logging.handlers import BaseRotatingHandler
+import logging
+import weakref
+import threading
+import bisect
+import warnings
+from collections import OrderedDict
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener, MemoryHandler
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 队列满时的处理策略: 阻塞等待 / 丢弃 / 仅丢弃DEBUG日志
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP = 'drop'
+OVERFLOW_DROP_DEBUG = 'drop-debug'
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP, OVERFLOW_DROP_DEBUG)
+# 日志压缩包的格式
+COMPRESSIONS = ('gz', 'zst')
+
+
+class _ArchiveWorker:
+    """
+    在低优先级的后台线程中压缩并清理日志, 所有handler共用一个线程
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._queue: queue.Queue = queue.Queue()
+        self._pending: set = set()
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: threading.Thread = None
+
+    def submit(self, handler):
+        with self._lock:
+            # 同一个handler只保留一个未执行的任务
+            if handler in self._pending:
+                return
+            self._pending.add(handler)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='template-logging-archive', daemon=True)
+                self._thread.start()
+        self._queue.put(handler)
+
+    def wait(self):
+        """
+        等待已提交的任务全部完成
+        """
+        self._queue.join()
+
+    def _run(self):
+        self._lower_priority()
+        while True:
+            handler = self._queue.get()
+            with self._lock:
+                self._pending.discard(handler)
+            try:
+                handler.archive()
+            except Exception:
+                logging.getLogger(__name__).warning("failed to archive %s", handler.baseFilename, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _lower_priority():
+        # Linux下nice值作用于单个线程, 默认的IO优先级也由nice值决定
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+
+class _Flusher:
+    """
+    定时将开启写缓冲的handler中的日志写入文件, 所有handler共用一个线程
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._handlers: weakref.WeakSet = weakref.WeakSet()
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: threading.Thread = None
+        # 检查间隔(秒), 取所有handler中最小的flush_interval的一半
+        self._interval: float = 1
+        # 检查间隔变化时唤醒线程
+        self._wakeup: threading.Event = threading.Event()
+        # 写入期间持有, fork前获取, 保证子进程继承的文件缓冲不处于写入中的锁定状态
+        self._flushing: threading.Lock = threading.Lock()
+
+    def _before_fork(self):
+        self._lock.acquire()
+        self._flushing.acquire()
+
+    def _after_fork_in_parent(self):
+        self._flushing.release()
+        self._lock.release()
+
+    def _after_fork_in_child(self):
+        """
+        子进程中没有后台线程, 重新初始化后注册继承的handler
+        缓冲中的日志由父进程写入, 子进程中清空, 避免重复写入
+        """
+        handlers = list(self._handlers)
+        self._reset()
+        for handler in handlers:
+            handler._buffer.clear()
+            handler._buffered = 0
+            self.register(handler)
+
+    def register(self, handler):
+        with self._lock:
+            self._handlers.add(handler)
+            self._interval = min(_h.flush_interval for _h in self._handlers) / 2000
+            self._wakeup.set()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='template-logging-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+            with self._flushing:
+                for handler in list(self._handlers):
+                    try:
+                        handler.flush_if_due()
+                    except Exception:
+                        pass
+
+
+_archive_worker: _ArchiveWorker = _ArchiveWorker()
+_flusher: _Flusher = _Flusher()
+if hasattr(os, 'register_at_fork'):
+    # 子进程中后台线程不存在, 重新初始化
+    os.register_at_fork(after_in_child=_archive_worker._reset)
+    os.register_at_fork(
+        before=_flusher._before_fork, after_in_parent=_flusher._after_fork_in_parent,
+        after_in_child=_flusher._after_fork_in_child
+    )
 
 
 class TemplateTimedRotatingFileHandler(BaseRotatingHandler):
-    def __init__(self, filename, backup_count=0, encoding=None, delay=False, utc=False):
+    # 日志压缩包保留的天数
+    archive_retention_days = 60
+
+    def __init__(
+            self, filename, backup_count=0, encoding=None, delay=False, utc=False,
+            compression='gz', compression_level=6, multiprocess=False,
+            buffer_size=0, flush_interval=1000, flush_level=logging.ERROR,
+            max_bytes=0, retention_days=None, retention_bytes=0
+    ):
+        if multiprocess and fcntl is None:
+            raise ValueError("multiprocess mode requires fcntl")
+        # 多个进程写入同一个日志时, 通过文件锁保证只有一个进程执行压缩与清理
+        self.multiprocess = multiprocess
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"compression must be one of {COMPRESSIONS}, got {compression}")
+        if compression == 'zst' and zstandard is None:
+            warnings.warn("zstandard is not installed, compress logs with gzip")
+            compression = 'gz'
+        self.compression = compression
+        self.compression_level = compression_level
         self.utc = utc
         self.suffix = "%Y-%m-%d"
         self.baseFilename = os.path.abspath(filename)
-        self.currentFileName = self._compute_fn()
+        # 单个日志文件超过max_bytes(字节)后切换到当天的下一个文件 info.log.2022-01-01.1, 为0时只按天切换
+        self.max_bytes = max_bytes
+        # 当前日志文件的大小, 打开文件时获取, 之后按写入的字节数累加
+        self._file_size = 0
+        # 当天的日志文件名以及序号
+        self._day_fn = self._compute_fn()
+        self._part = self._find_last_part() if max_bytes > 0 else 0
+        self.currentFileName = self._part_fn()
+        # 下一次切换日志的时间戳
+        self.rolloverAt = self._compute_rollover(time.time())
         self.backup_count = backup_count
-        self.ext_match = re.compile(r"^\d{4}-\d{2}-\d{2}(\.\w+)?$", re.ASCII)
+        # 压缩包按天数与总大小清理, retention_bytes为0时不限制总大小
+        if retention_days is not None:
+            self.archive_retention_days = retention_days
+        self.retention_bytes = retention_bytes
+        self.ext_match = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:\.(\d+))?$", re.ASCII)
+        self.archive_match = re.compile(
+            r"^\d{4}-\d{2}-\d{2}(?:\.\d+)?_(\d{4}-\d{2}-\d{2})(?:\.\d+)?\.tar(\.gz|\.zst)?$", re.ASCII
+        )
+        # 日志文件(日期, 序号, 路径)与压缩包(最新日志的日期, 路径, 大小)的索引, 按时间排序
+        # 首次压缩时扫描目录建立, 之后在内存中维护
+        # 多进程模式下各进程按相同的文件名切换日志, 新的日志文件由各进程自己记录;
+        # 压缩与清理的次数记录在.lock文件中, 与上次看到的不同(其他进程修改过目录)时才重新扫描
+        self._index_lock = threading.Lock()
+        self._logs = None
+        self._archives = None
+        self._archive_bytes = 0
+        self._archive_generation = None
+        self._archive_changes = 0
+        # 写缓冲: 超过buffer_size(字节)、距离上次写入超过flush_interval(毫秒)
+        # 或者日志级别不低于flush_level时写入文件, buffer_size为0时每条日志都直接写入
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = logging._checkLevel(flush_level)
+        self._buffer = []
+        self._buffered = 0
+        self._flush_at = time.monotonic() + flush_interval / 1000
         super(BaseRotatingHandler, self).__init__(filename, 'a', encoding, delay)
+        if buffer_size > 0:
+            _flusher.register(self)
 
-    def shouldRollover(self, _record):
-        if self.currentFileName != self._compute_fn():
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                # 缓冲中的日志属于切换前的文件
+                self.flush()
+                self.doRollover()
+            msg = self.format(record) + self.terminator
+            self._buffer.append(msg)
+            self._buffered += len(msg)
+            if (
+                    self._buffered >= self.buffer_size or record.levelno >= self.flush_level or
+                    time.monotonic() >= self._flush_at
+            ):
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """
+        将缓冲中的日志写入文件
+        """
+        self.acquire()
+        try:
+            if self._buffer:
+                if self.stream is None:
+                    self.stream = self._open()
+                # 一次写入, 多进程追加写入同一个文件时不会交错
+                data = ''.join(self._buffer)
+                self.stream.write(data)
+                self._buffer.clear()
+                self._buffered = 0
+                if self.max_bytes > 0:
+                    self._file_size += (
+                        len(data) if data.isascii() else len(data.encode(self.stream.encoding, self.stream.errors))
+                    )
+            self._flush_at = time.monotonic() + self.flush_interval / 1000
+            super().flush()
+            if self.max_bytes > 0 and self.multiprocess and self.stream is not None:
+                # 其他进程也会写入同一个文件, 重新获取大小
+                self._file_size = os.fstat(self.stream.fileno()).st_size
+        finally:
+            self.release()
+
+    def flush_if_due(self):
+        if self._buffer and time.monotonic() >= self._flush_at:
+            self.flush()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+    def shouldRollover(self, record):
+        if self.max_bytes > 0 and self._file_size >= self.max_bytes:
             return True
-        return False
+        if record.created < self.rolloverAt:
+            return False
+        if self._day_fn == self._compute_fn():
+            # 日期没有变化(例如夏令时在0点切换), 重新计算切换时间
+            self.rolloverAt = self._compute_rollover(time.time())
+            return False
+        return True
+
+    def _compute_rollover(self, now):
+        """
+        计算下一个0点的时间戳
+        :param now: 当前时间戳
+        :return:
+        """
+        if self.utc:
+            return now - now % 86400 + 86400
+        t = time.localtime(now)
+        # tm_isdst=-1 由mktime判断是否处于夏令时
+        return time.mktime((t.tm_year, t.tm_mon, t.tm_mday + 1, 0, 0, 0, 0, 0, -1))
 
     def _compute_fn(self):
         if self.utc:
@@ -31,86 +307,441 @@ class TemplateTimedRotatingFileHandler(BaseRotatingHandler):
             t = time.localtime()
         return self.baseFilename + "." + time.strftime(self.suffix, t)
 
-    def get_files_to_backup(self):
+    def _part_fn(self):
+        return self._day_fn if self._part == 0 else f"{self._day_fn}.{self._part}"
+
+    def _find_last_part(self):
+        """
+        重启后继续写入当天最后一个日志文件
+        """
+        dir_name, day_name = os.path.split(self._day_fn)
+        prefix = day_name + "."
+        parts = [0]
+        for file_name in os.listdir(dir_name) if os.path.isdir(dir_name) else []:
+            if file_name.startswith(prefix) and file_name[len(prefix):].isdigit():
+                parts.append(int(file_name[len(prefix):]))
+        return max(parts)
+
+    def _scan(self):
+        """
+        扫描目录, 重新建立日志文件与压缩包的索引, 需要持有_index_lock
+        """
         dir_name, base_name = os.path.split(self.baseFilename)
-        file_names = os.listdir(dir_name)
-        result = []
         prefix = base_name + "."
-        plen = len(prefix)
-        for fileName in file_names:
-            if fileName[:plen] == prefix:
-                suffix = fileName[plen:]
-                if self.ext_match.match(suffix):
-                    result.append(os.path.join(dir_name, fileName))
+        logs = []
+        archives = []
+        for file_name in os.listdir(dir_name):
+            if not file_name.startswith(prefix):
+                continue
+            suffix = file_name[len(prefix):]
+            path = os.path.join(dir_name, file_name)
+            _result = self.ext_match.match(suffix)
+            if _result is not None:
+                logs.append((_result.group(1), int(_result.group(2) or 0), path))
+                continue
+            _result = self.archive_match.match(suffix)
+            if _result is not None:
+                try:
+                    archives.append((_result.group(1), path, os.path.getsize(path)))
+                except OSError:
+                    # 其他进程刚刚删除
+                    continue
+        logs.sort()
+        archives.sort()
+        self._logs = logs
+        self._archives = archives
+        self._archive_bytes = sum(_a[2] for _a in archives)
+
+    def _add_log(self, path):
+        """
+        记录新创建的日志文件, 索引尚未建立时跳过, 建立索引时会扫描到
+        """
+        dir_name, file_name = os.path.split(path)
+        _result = self.ext_match.match(file_name[len(os.path.basename(self.baseFilename)) + 1:])
+        if _result is None:
+            return
+        entry = (_result.group(1), int(_result.group(2) or 0), path)
+        with self._index_lock:
+            if self._logs is not None and entry not in self._logs:
+                bisect.insort(self._logs, entry)
+
+    def get_files_to_backup(self):
+        """
+        需要压缩的日志文件: 按日期与序号排序, 保留最新的backup_count个
+        """
+        with self._index_lock:
+            if self._logs is None:
+                self._scan()
+            result = [_l[2] for _l in self._logs]
         if len(result) < self.backup_count:
             result = []
         else:
-            result.sort()
             result = result[:len(result) - self.backup_count]
         return result
 
     def clean_log_zip(self):
         """
-        清理3个月前的日志
+        清理archive_retention_days天之前的日志压缩包, 并保证压缩包的总大小不超过retention_bytes
+        压缩包按最新的日志日期排序, 只需要从最早的压缩包开始删除
         :return:
         """
-        # 获得3个月以前的时间
-        clean_date = datetime.datetime.strptime(
-            datetime.datetime.now().strftime('%Y-%m-%d'), '%Y-%m-%d') - datetime.timedelta(days=60)
-        dir_name, base_name = os.path.split(self.baseFilename)
-        file_names = os.listdir(dir_name)
-        for fileName in file_names:
-            if fileName.endswith('.gz'):
-                _result = re.match(r'.*log.(.*)_.*', fileName)
-                if _result is None:
-                    continue
-                _zip_date = datetime.datetime.strptime(_result.group(1).strip(), '%Y-%m-%d')
-                if clean_date > _zip_date:
-                    os.remove(os.path.join(dir_name, fileName))
+        # 与日志文件名使用相同的时区
+        t = time.gmtime() if self.utc else time.localtime()
+        clean_date = (
+                datetime.date(t.tm_year, t.tm_mon, t.tm_mday) - datetime.timedelta(days=self.archive_retention_days)
+        ).strftime('%Y-%m-%d')
+        removed = []
+        with self._index_lock:
+            if self._archives is None:
+                self._scan()
+            while self._archives and (
+                    self._archives[0][0] < clean_date or
+                    0 < self.retention_bytes < self._archive_bytes
+            ):
+                _, path, size = self._archives.pop(0)
+                self._archive_bytes -= size
+                removed.append(path)
+            if removed:
+                self._archive_changes += 1
+        for path in removed:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
 
-    def doRollover(self):
-        # 清理日志压缩包
+    def archive(self):
+        """
+        压缩较早的日志并清理过期的压缩包, 在后台线程中执行
+        多进程模式下获得文件锁的进程执行, 其他进程跳过
+        :return:
+        """
+        if not self.multiprocess:
+            self._archive()
+            return
+        with open(self.baseFilename + '.lock', 'a+') as lock_file:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # 其他进程正在压缩
+                return
+            try:
+                lock_file.seek(0)
+                content = lock_file.read().strip()
+                generation = int(content) if content.isdigit() else 0
+                with self._index_lock:
+                    if generation != self._archive_generation:
+                        self._scan()
+                        self._archive_generation = generation
+                changes = self._archive_changes
+                try:
+                    self._archive()
+                except BaseException:
+                    # 索引可能与目录不一致, 下次压缩时重新扫描
+                    with self._index_lock:
+                        self._archive_generation = None
+                    raise
+                finally:
+                    if self._archive_changes != changes:
+                        lock_file.seek(0)
+                        lock_file.truncate()
+                        lock_file.write(str(generation + 1))
+                        lock_file.flush()
+                        with self._index_lock:
+                            if self._archive_generation is not None:
+                                self._archive_generation = generation + 1
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _archive(self):
         self.clean_log_zip()
+        if self.backup_count <= 0:
+            return
+        while True:
+            files_to_backup = [_f for _f in self.get_files_to_backup() if _f != self.currentFileName]
+            if len(files_to_backup) < self.backup_count:
+                break
+            self._compress(files_to_backup[:self.backup_count])
+
+    def _compress(self, log_files):
+        """
+        将日志文件流式写入压缩包, 完成后删除日志文件
+        :param log_files: 按日期排序的日志文件
+        :return:
+        """
+        base_name = os.path.basename(self.baseFilename)
+        # 日志文件名中的日期与序号, 例如 2022-01-01 或 2022-01-01.1
+        first_suffix = os.path.basename(log_files[0])[len(base_name) + 1:]
+        last_suffix = os.path.basename(log_files[-1])[len(base_name) + 1:]
+        tar_file_name = f"{base_name}.{first_suffix}_{last_suffix}.tar.{self.compression}"
+        tar_file_path = os.path.join(os.path.dirname(log_files[0]), tar_file_name)
+        # 先写入临时文件, 避免留下不完整的压缩包
+        tmp_path = tar_file_path + '.tmp'
+        self._archive_changes += 1
+        try:
+            if self.compression == 'zst':
+                with open(tmp_path, 'wb') as f:
+                    with zstandard.ZstdCompressor(level=self.compression_level).stream_writer(f) as writer:
+                        with tarfile.open(fileobj=writer, mode='w|') as tar:
+                            for log_file in log_files:
+                                tar.add(log_file, arcname=os.path.basename(log_file))
+            else:
+                with tarfile.open(tmp_path, 'w:gz', compresslevel=self.compression_level) as tar:
+                    for log_file in log_files:
+                        tar.add(log_file, arcname=os.path.basename(log_file))
+            os.replace(tmp_path, tar_file_path)
+        except BaseException:
+            # 压缩失败(例如磁盘已满)时删除不完整的临时文件, 日志文件保留到下次压缩
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        for log_file in log_files:
+            os.remove(log_file)
+        removed = set(log_files)
+        size = os.path.getsize(tar_file_path)
+        with self._index_lock:
+            self._logs = [_l for _l in self._logs if _l[2] not in removed]
+            bisect.insort(self._archives, (self.ext_match.match(last_suffix).group(1), tar_file_path, size))
+            self._archive_bytes += size
+
+    def doRollover(self):
         if self.stream:
             self.stream.close()
             self.stream = None
 
-        self.currentFileName = self._compute_fn()
+        day_fn = self._compute_fn()
+        if day_fn != self._day_fn:
+            self._day_fn = day_fn
+            self._part = 0
+            self.rolloverAt = self._compute_rollover(time.time())
+        else:
+            # 当天的日志超过max_bytes, 切换到下一个文件
+            self._part += 1
+        self._file_size = 0
+        self.currentFileName = self._part_fn()
+        # 压缩与清理交给后台线程
+        _archive_worker.submit(self)
 
-        if self.backup_count > 0:
-            files_to_backup = self.get_files_to_backup()
+    def _open(self):
+        stream = open(self.currentFileName, self.mode, encoding=self.encoding)
+        self._file_size = os.fstat(stream.fileno()).st_size
+        self._add_log(self.currentFileName)
+        # 先创建临时的软链接再替换, 多个进程同时切换日志时软链接始终存在
+        tmp_link = f"{self.baseFilename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.symlink(os.path.basename(self.currentFileName), tmp_link)
+            os.replace(tmp_link, self.baseFilename)
+        except OSError:
+            try:
+                os.remove(tmp_link)
+            except OSError:
+                pass
+        return stream
 
-            if len(files_to_backup) >= self.backup_count:
-                file_dir_name = os.path.dirname(files_to_backup[0])
-                filename = os.path.basename(self.baseFilename)
 
-                tar_file_name = (
-                        filename + '.' +
-                        files_to_backup[0].split('.')[-1] +
-                        '_' +
-                        files_to_backup[self.backup_count - 1].split('.')[-1] +
-                        '.tar.gz'
-                )
+class TemplateQueueHandler(QueueHandler):
+    """
+    代替target写入队列, 由TemplateQueueListener在后台线程调用target写入
+    多个TemplateQueueHandler共用一个队列
+    """
+    # 用于提前格式化异常信息
+    _formatter = logging.Formatter()
 
-                tar_file_path = os.path.join(file_dir_name, tar_file_name)
+    def __init__(self, queue_, target, overflow_policy=OVERFLOW_BLOCK):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}, got {overflow_policy}")
+        super().__init__(queue_)
+        self.target = target
+        self.overflow_policy = overflow_policy
+        # 队列满时丢弃的日志数量
+        self.dropped = 0
+        self.setLevel(target.level)
+        # filter在调用方线程执行
+        self.filters = target.filters
 
-                with tarfile.open(tar_file_path, 'w') as tar:
-                    for log_file in files_to_backup[0:self.backup_count]:
-                        tar.add(log_file, arcname=os.path.basename(log_file))
+    def prepare(self, record):
+        """
+        合并参数并提前格式化异常信息, 修改的是record的副本, 调用方以及其他handler看到的record不变
+        """
+        record = copy.copy(record)
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        elif not isinstance(record.msg, str):
+            record.msg = str(record.msg)
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._formatter.formatException(record.exc_info)
+            # 不再持有traceback中的栈帧
+            record.exc_info = None
+        return record
 
-                for log_file in files_to_backup[0:self.backup_count]:
-                    os.remove(log_file)
+    def enqueue(self, record):
+        item = (self.target, record)
+        if self.overflow_policy == OVERFLOW_BLOCK:
+            self.queue.put(item)
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if self.overflow_policy == OVERFLOW_DROP_DEBUG and record.levelno > logging.DEBUG:
+                self.queue.put(item)
+            else:
+                self.dropped += 1
 
-    def _open(self):
-        stream = open(self.currentFileName, self.mode, encoding=self.encoding)
 
-        if os.path.exists(self.baseFilename):
+class TemplateQueueListener(QueueListener):
+    """
+    在后台线程中调用TemplateQueueHandler对应的target写入日志
+    """
+
+    def __init__(self, queue_, *handlers, respect_handler_level=False):
+        super().__init__(queue_, *handlers, respect_handler_level=respect_handler_level)
+        # 写入日志期间持有, fork前获取, 保证子进程继承的文件缓冲不处于写入中的锁定状态
+        self.handling = threading.Lock()
+
+    def enqueue_sentinel(self):
+        # 队列有长度限制时, 等待队列有空位
+        self.queue.put(self._sentinel)
+
+    def handle(self, item):
+        target, record = item
+        with self.handling:
             try:
-                os.remove(self.baseFilename)
-            except OSError:
-                pass
+                target.acquire()
+                try:
+                    target.emit(record)
+                finally:
+                    target.release()
+            except Exception:
+                target.handleError(record)
+
+
+class _Ring:
+    """
+    固定长度的环形缓冲区, 槽位预先分配, 写满后覆盖最旧的日志
+    """
+    __slots__ = ('slots', 'position', 'size')
+
+    def __init__(self, capacity):
+        self.slots = [None] * capacity
+        self.position = 0
+        self.size = 0
+
+    def append(self, record):
+        self.slots[self.position] = record
+        self.position = (self.position + 1) % len(self.slots)
+        if self.size < len(self.slots):
+            self.size += 1
+
+    def drain(self):
+        """
+        按写入顺序取出所有日志并清空
+        """
+        capacity = len(self.slots)
+        start = (self.position - self.size) % capacity
+        records = [self.slots[(start + _i) % capacity] for _i in range(self.size)]
+        for index in range(capacity):
+            self.slots[index] = None
+        self.position = 0
+        self.size = 0
+        return records
+
+
+class TemplateRingBufferHandler(MemoryHandler):
+    """
+    在内存中保留每个线程(或整个进程)最近capacity条日志, 平时不写入任何文件
+    收到不低于flushLevel的日志或调用dump()时, 将对应的缓冲区交给target输出, 用于保留出错前的DEBUG日志
+
+    log.ini中配置:
+    [handler_ring]
+    class=template_logging.TemplateRingBufferHandler
+    level=DEBUG
+    args=(1000, ERROR)
+    target=debug_file_handler
+    """
+    # 最多保留的缓冲区数量, 超出后丢弃最久未写入的线程的缓冲区
+    max_rings = 256
+
+    def __init__(self, capacity, flushLevel=logging.ERROR, target=None, flushOnClose=False, per_thread=True):
+        """
+        :param capacity: 每个缓冲区保留的日志条数
+        :param flushLevel: 不低于该级别的日志会触发输出
+        :param target: 输出日志的handler, 其级别需要不高于缓冲的日志级别
+        :param flushOnClose: 关闭时是否输出所有缓冲区中的日志
+        :param per_thread: 每个线程使用独立的缓冲区, 为False时整个进程共用一个缓冲区
+        """
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        super().__init__(capacity, logging._checkLevel(flushLevel), target, flushOnClose)
+        self.per_thread = per_thread
+        self._rings = OrderedDict()
+
+    def _ring_key(self, process, thread):
+        # fork之后子进程使用新的缓冲区
+        return (process, thread) if self.per_thread else (process, None)
+
+    def shouldFlush(self, record):
+        return record.levelno >= self.flushLevel
+
+    def emit(self, record):
+        key = self._ring_key(record.process, record.thread)
+        ring = self._rings.get(key)
+        if ring is None:
+            if len(self._rings) >= self.max_rings:
+                self._rings.popitem(last=False)
+            ring = self._rings[key] = _Ring(self.capacity)
+        else:
+            self._rings.move_to_end(key)
+        ring.append(record)
+        if self.shouldFlush(record):
+            self._flush_ring(ring)
+
+    def _flush_ring(self, ring):
+        if self.target is None:
+            return
+        for record in ring.drain():
+            self.target.handle(record)
+
+    def dump(self, all_threads=False):
+        """
+        主动输出当前线程(per_thread为False时为整个进程)缓冲区中的日志
+        :param all_threads: 输出所有线程的缓冲区
+        :return:
+        """
+        self.acquire()
         try:
-            os.symlink(os.path.basename(self.currentFileName), self.baseFilename)
-        except OSError:
-            pass
-        return stream
+            if all_threads:
+                rings = list(self._rings.values())
+            else:
+                ring = self._rings.get(self._ring_key(os.getpid(), threading.get_ident()))
+                rings = [ring] if ring is not None else []
+            for ring in rings:
+                self._flush_ring(ring)
+        finally:
+            self.release()
+
+    def flush(self):
+        """
+        logging.shutdown等调用flush时不输出缓冲区, 仅flush target
+        """
+        self.acquire()
+        try:
+            if self.target:
+                self.target.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        try:
+            if self.flushOnClose:
+                self.dump(all_threads=True)
+        finally:
+            self.acquire()
+            try:
+                self._rings.clear()
+                self.target = None
+                logging.Handler.close(self)
+            finally:
+                self.release()
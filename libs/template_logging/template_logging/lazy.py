@@ -0,0 +1,38 @@
+# -*- coding: UTF-8 -*-
+
+
+from typing import Any, Callable
+
+# 尚未计算的标记
+_PENDING = object()
+
+
+class LazyMessage:
+    """
+    延迟计算的日志参数, 仅在日志真正输出(格式化)时调用func, 结果只计算一次
+    logger.debug("payload: %s", lazy(json.dumps, payload))
+    """
+    __slots__ = ('func', 'args', 'kwargs', '_value')
+
+    def __init__(self, func: Callable[..., Any], *args: Any, **kwargs: Any):
+        self.func: Callable[..., Any] = func
+        self.args: tuple = args
+        self.kwargs: dict = kwargs
+        self._value: Any = _PENDING
+
+    @property
+    def value(self) -> Any:
+        if self._value is _PENDING:
+            self._value = self.func(*self.args, **self.kwargs)
+        return self._value
+
+    def __str__(self) -> str:
+        return str(self.value)
+
+    def __repr__(self) -> str:
+        return repr(self.value)
+
+
+# 构造延迟计算的日志参数, 配合 %-style 日志使用, 日志级别未开启时不会调用func
+# 不要与f-string一起使用, f-string会立即计算
+lazy = LazyMessage
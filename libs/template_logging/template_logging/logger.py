@@ -2,25 +2,185 @@
 
 
 import os
+import queue
+import atexit
 import logging
+import importlib
+import threading
+import configparser
 from logging.config import fileConfig
+from typing import Optional, List, Dict, Tuple
+
+from .handlers import TemplateQueueHandler, TemplateQueueListener, OVERFLOW_BLOCK, OVERFLOW_POLICIES
+from .filters import TemplateRateLimitFilter
 
 logging_config = (
         os.getenv('LOG_CONFIG_PATH') or
         os.path.join(os.path.dirname(__file__), 'log.ini')
 )
 
+# 异步模式的后台线程
+_listener: Optional[TemplateQueueListener] = None
+# 异步模式下被替换的logger及其原有的handlers
+_replaced: Dict[logging.Logger, List[logging.Handler]] = dict()
+_lock: threading.Lock = threading.Lock()
+# 通过配置文件添加的filter, 重新加载配置时移除
+_installed_filters: List[Tuple[logging.Filterer, logging.Filter]] = list()
+# 异步模式的参数(queue_size, overflow_policy), 子进程中重新启动时使用
+_async_options: Optional[Tuple[int, str]] = None
+
 
-def init_logger(log_config_file=None):
+def init_logger(log_config_file=None, async_mode=False, queue_size=10000, overflow_policy=OVERFLOW_BLOCK):
     """
     加载日志配置
     :param log_config_file:
+    :param async_mode: 是否异步写入日志, 开启后由后台线程写入, 调用方只需要将日志放入队列
+    :param queue_size: 异步模式下队列的长度, 小于等于0时不限制长度
+    :param overflow_policy: 异步模式下队列满时的处理策略 block/drop/drop-debug
     :return:
     """
-    if log_config_file:
-        fileConfig(log_config_file, disable_existing_loggers=False)
-    else:
-        fileConfig(logging_config, disable_existing_loggers=False)
+    if overflow_policy not in OVERFLOW_POLICIES:
+        raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}, got {overflow_policy}")
+    # 重新加载配置前先停止之前的异步模式, 保证队列中的日志写入旧的handler
+    shutdown_logger()
+    config_file: str = log_config_file or logging_config
+    fileConfig(config_file, disable_existing_loggers=False)
+    _install_filters(config_file)
+    if async_mode:
+        _start_async(queue_size, overflow_policy)
+
+
+def _resolve(name: str) -> type:
+    module_name, _, attr = name.rpartition('.')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _install_filters(config_file: str) -> None:
+    """
+    标准库fileConfig不支持filter, 按照相同的格式解析[filters]、[filter_xxx]以及handler/logger中的filters配置
+    每个handler/logger使用独立的filter实例, 限流计数互不影响
+    """
+    for target, _filter in _installed_filters:
+        target.removeFilter(_filter)
+    _installed_filters.clear()
+    cp: configparser.ConfigParser = configparser.ConfigParser(interpolation=None)
+    cp.read(config_file)
+    if not cp.has_section('filters'):
+        return
+    filter_names: List[str] = [_n.strip() for _n in cp['filters'].get('keys', '').split(',') if _n.strip()]
+    loggers: List[logging.Logger] = [logging.getLogger()] + [
+        _l for _l in logging.Logger.manager.loggerDict.values() if isinstance(_l, logging.Logger)
+    ]
+    handlers: Dict[str, logging.Handler] = {_h.name: _h for _l in loggers for _h in _l.handlers if _h.name}
+    targets: List[Tuple[logging.Filterer, str]] = []
+    for section_name in cp.sections():
+        if 'filters' not in cp[section_name]:
+            continue
+        if section_name.startswith('handler_') and section_name[len('handler_'):] in handlers:
+            targets.append((handlers[section_name[len('handler_'):]], cp[section_name]['filters']))
+        elif section_name == 'logger_root':
+            targets.append((logging.getLogger(), cp[section_name]['filters']))
+        elif section_name.startswith('logger_'):
+            targets.append((logging.getLogger(cp[section_name]['qualname']), cp[section_name]['filters']))
+    for target, names in targets:
+        for name in [_n.strip() for _n in names.split(',') if _n.strip()]:
+            if name not in filter_names:
+                raise KeyError(f"filter {name} is not declared in [filters]")
+            section: configparser.SectionProxy = cp[f"filter_{name}"]
+            klass: type = _resolve(section['class']) if 'class' in section else TemplateRateLimitFilter
+            _filter: logging.Filter = klass(
+                *eval(section.get('args', '()'), vars(logging)), **eval(section.get('kwargs', '{}'), vars(logging))
+            )
+            target.addFilter(_filter)
+            _installed_filters.append((target, _filter))
+
+
+def _start_async(queue_size: int, overflow_policy: str) -> None:
+    """
+    将所有logger的handler替换为共用一个队列的TemplateQueueHandler, 原有的handler由后台线程调用
+    """
+    global _listener, _async_options
+    log_queue: queue.Queue = queue.Queue(max(queue_size, 0))
+    proxies: Dict[logging.Handler, TemplateQueueHandler] = dict()
+    loggers: List[logging.Logger] = [logging.getLogger()] + [
+        _l for _l in logging.Logger.manager.loggerDict.values() if isinstance(_l, logging.Logger)
+    ]
+    with _lock:
+        for logger in loggers:
+            if not logger.handlers:
+                continue
+            _replaced[logger] = logger.handlers
+            handlers: List[logging.Handler] = []
+            for handler in logger.handlers:
+                if handler not in proxies:
+                    proxies[handler] = TemplateQueueHandler(log_queue, handler, overflow_policy)
+                handlers.append(proxies[handler])
+            logger.handlers = handlers
+        _listener = TemplateQueueListener(log_queue, *proxies.values())
+        _listener.start()
+        _async_options = (queue_size, overflow_policy)
+
+
+def shutdown_logger() -> None:
+    """
+    停止异步模式: 等待队列中的日志全部写入, 并恢复为同步写入
+    进程退出时会自动调用
+    :return:
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        for logger, handlers in _replaced.items():
+            logger.handlers = handlers
+        _replaced.clear()
+        _listener.stop()
+        dropped: int = 0
+        for proxy in _listener.handlers:
+            proxy.flush()
+            proxy.target.flush()
+            dropped += proxy.dropped
+        _listener = None
+    if dropped:
+        logging.getLogger(__name__).warning("%d log records were dropped because the queue was full", dropped)
+
+
+def _before_fork() -> None:
+    """
+    等待后台线程写完当前的日志再fork
+    """
+    _lock.acquire()
+    if _listener is not None:
+        _listener.handling.acquire()
+
+
+def _after_fork_in_parent() -> None:
+    if _listener is not None:
+        _listener.handling.release()
+    _lock.release()
+
+
+def _after_fork_in_child() -> None:
+    """
+    fork后子进程中没有后台线程, 父进程队列中的日志由父进程写入:
+    恢复原有的handlers, 使用新的队列与后台线程重新开启异步模式
+    """
+    global _listener, _lock
+    _lock = threading.Lock()
+    if _listener is None:
+        return
+    for logger, handlers in _replaced.items():
+        logger.handlers = handlers
+    _replaced.clear()
+    _listener = None
+    _start_async(*_async_options)
+
+
+atexit.register(shutdown_logger)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(
+        before=_before_fork, after_in_parent=_after_fork_in_parent, after_in_child=_after_fork_in_child
+    )
 
 
 def getLogger(name=None) -> logging.Logger:
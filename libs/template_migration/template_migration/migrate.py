@@ -79,7 +79,7 @@ class Migration:
         """
         # 执行用户自定义handler
         if callable(self.do_init_data_handler):
-            logger.info(f"call user defined init handler")
+            logger.info("call user defined init handler")
             self.do_init_data_handler(*args, **kwargs)
         # 添加migrate记录
         _migrate = MigrationLog(version=0, script='sys_init', success=True, project=self.project)
@@ -87,7 +87,7 @@ class Migration:
         self.session.commit()
         # 添加migrate记录
         self._add_migration_log()
-        logger.info(f"init_data success!")
+        logger.info("init_data success!")
 
     def is_inited(self) -> bool:
         """
@@ -123,7 +123,7 @@ class Migration:
                     _migrate = MigrationLog(version=version, script=f, success=True, project=_project)
                     _session.add(_migrate)
                     _session.commit()
-        logger.info(f"success add migrate log")
+        logger.info("success add migrate log")
 
     def __execute_migration_scripts(self) -> None:
         """
@@ -166,10 +166,10 @@ class Migration:
             executed_versions = success_versions + fail_versions
             no_executed_versions = sorted([v for v in matches.values() if v not in executed_versions])
 
-            logger.info('max successful version: %s' % str(max_success_version))
-            logger.info('successful versions: %s' % str(success_versions))
-            logger.info('failed versions: %s' % str(fail_versions))
-            logger.info('non-executed versions: %s' % str(no_executed_versions))
+            logger.info('max successful version: %s', max_success_version)
+            logger.info('successful versions: %s', success_versions)
+            logger.info('failed versions: %s', fail_versions)
+            logger.info('non-executed versions: %s', no_executed_versions)
 
             with open(failed_fp, 'w') as fp:
                 line = str(fail_versions)
@@ -187,7 +187,7 @@ class Migration:
                         migrations_prod.do()
                         success = True
                     except Exception as e:
-                        logger.error(f"migration failed for {version}", exc_info=True)
+                        logger.error("migration failed for %s", version, exc_info=True)
                         success = False
                         raise e
                     finally:
@@ -209,7 +209,7 @@ class Migration:
         self._generate_table()
         # 判断服务是否初始化
         _is_inited: bool = self.is_inited()
-        logger.info(f"init state is {_is_inited}")
+        logger.info("init state is %s", _is_inited)
         if not _is_inited:
             self._init_data(*args, **kwargs)
             return
@@ -9,9 +9,9 @@ __author__ = '1995chen'
 __email__ = 'chenl2448365088@gmail.com'
 # 依赖的库
 __install_requires__ = [
-    "dacite >= 1.6.0",
     "requests >= 2.26.0",
-    "template_exception >= 1.0.1"
+    "template_exception >= 1.0.1",
+    "template_json_encoder >= 1.1.0"
 ]
 
 setup(
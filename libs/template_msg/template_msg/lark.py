@@ -8,7 +8,7 @@ import json
 from typing import Optional, Callable, Any, Dict, List, Set
 
 import requests
-from dacite import from_dict, Config
+from template_json_encoder import from_dict
 from template_exception import (
     HandlerUnCallableException, KeyParamsTypeInvalidException, KeyParamsValueInvalidException,
     RemoteServerException, KeyParamsValueOutOfRangeException
@@ -23,6 +23,8 @@ logger = logging.getLogger(__name__)
 class LarkClient:
     # 单次查询最大数量
     MAX_COUNT_PER_QUERY = 50
+    # 响应数据转换为dataclass时使用的类型转换
+    TYPE_HOOKS = {IMessageType: IMessageType}
 
     def __init__(
             self, app_id: str, app_secret: str,
@@ -133,7 +135,7 @@ class LarkClient:
                 if isinstance(_data_bytes, bytes):
                     _value = pickle.loads(_data_bytes)
             except Exception:
-                logger.warning(f"failed to get cache {key}", exc_info=True)
+                logger.warning("failed to get cache %s", key, exc_info=True)
             return _value
         return None
 
@@ -159,7 +161,7 @@ class LarkClient:
             result = requests.post(url, json=data, headers=headers).json()
             # 判断是否正常返回
             if result['code'] != 0 or not result.get('tenant_access_token'):
-                logger.warning(f"failed to get tenant_access_token, result is {result}")
+                logger.warning("failed to get tenant_access_token, result is %s", result)
                 raise RemoteServerException(result)
             _tenant_access_token: str = result["tenant_access_token"]
             # 预留20分钟的时间缓冲
@@ -173,7 +175,7 @@ class LarkClient:
             self.__set_cache(ICacheKey.TENANT_ACCESS_TOKEN.value, _tenant_access_token, _token_timeout)
             return _tenant_access_token
         except Exception as e:
-            logger.warning(f"failed to get tenant_access_token", exc_info=True)
+            logger.warning("failed to get tenant_access_token", exc_info=True)
             raise e
 
     def get_multi_user_openid(self, emails: List[str], force_reload: bool = False) -> Dict[str, str]:
@@ -238,7 +240,7 @@ class LarkClient:
             self.__set_cache(ICacheKey.EMAIL_OPEN_ID_MAPPING.value, _email_open_id_mapping, self.cache_timeout)
             return result
         except Exception as e:
-            logger.warning(f"failed to get open_id by emails", exc_info=True)
+            logger.warning("failed to get open_id by emails", exc_info=True)
             raise e
 
     def get_user_open_id(self, email: str, force_reload: bool = False) -> Optional[str]:
@@ -295,7 +297,7 @@ class LarkClient:
                 raise RemoteServerException(json_data)
             return json_data['data']['image_key']
         except Exception as e:
-            logger.warning(f"failed to upload image", exc_info=True)
+            logger.warning("failed to upload image", exc_info=True)
             raise e
 
     def send_msg(
@@ -343,13 +345,10 @@ class LarkClient:
             _result.success = True if json_data['code'] == 0 else False
             _result.msg = json_data['msg']
             if 'data' in json_data:
-                _result.data = from_dict(
-                    ILarkMsgData, json_data['data'],
-                    config=Config(type_hooks={IMessageType: IMessageType})
-                )
+                _result.data = from_dict(ILarkMsgData, json_data['data'], type_hooks=self.TYPE_HOOKS)
             return _result
         except Exception as e:
-            logger.warning(f"failed to send lark msg", exc_info=True)
+            logger.warning("failed to send lark msg", exc_info=True)
             raise e
 
     def reply_msg(
@@ -392,13 +391,10 @@ class LarkClient:
             _result.success = True if json_data['code'] == 0 else False
             _result.msg = json_data['msg']
             if 'data' in json_data:
-                _result.data = from_dict(
-                    ILarkMsgData, json_data['data'],
-                    config=Config(type_hooks={IMessageType: IMessageType})
-                )
+                _result.data = from_dict(ILarkMsgData, json_data['data'], type_hooks=self.TYPE_HOOKS)
             return _result
         except Exception as e:
-            logger.warning(f"failed to reply lark msg to {message_id}", exc_info=True)
+            logger.warning("failed to reply lark msg to %s", message_id, exc_info=True)
             raise e
 
     def revoke_msg(self, message_id: str) -> ILarkMsgResult:
@@ -433,13 +429,10 @@ class LarkClient:
             _result.success = True if json_data['code'] == 0 else False
             _result.msg = json_data['msg']
             if 'data' in json_data:
-                _result.data = from_dict(
-                    ILarkMsgData, json_data['data'],
-                    config=Config(type_hooks={IMessageType: IMessageType})
-                )
+                _result.data = from_dict(ILarkMsgData, json_data['data'], type_hooks=self.TYPE_HOOKS)
             return _result
         except Exception as e:
-            logger.warning(f"failed to revoke lark msg to {message_id}", exc_info=True)
+            logger.warning("failed to revoke lark msg to %s", message_id, exc_info=True)
             raise e
 
     def send_text_msg(self, receive_id_type: IReceiveIDType, receive_id: str, content: str) -> ILarkMsgResult:
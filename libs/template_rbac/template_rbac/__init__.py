@@ -5,6 +5,7 @@ from .lark import LarkSSO, ILarkTokenInfo
 from .oauth2 import OAuth2SSO, ITokenInfo
 from .helpers import decode_token, url_path_append, url_query_join
 from .decorators import AuthStore, Auth
+from .cache import CacheInfo, TTLCache, TokenCache
 
 __all__ = [
     'ITokenInfo',
@@ -16,4 +17,7 @@ __all__ = [
     'url_query_join',
     'AuthStore',
     'Auth',
+    'CacheInfo',
+    'TTLCache',
+    'TokenCache',
 ]
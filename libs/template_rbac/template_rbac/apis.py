@@ -40,7 +40,7 @@ class TemplateSSOLogin(Resource):
 
         # 获得code
         code = args.pop('code')
-        logger.info('获取SSO登录成功后,重定向返回code值: %s ' % code)
+        logger.info('获取SSO登录成功后,重定向返回code值: %s ', code)
 
         # 重定向到登录
         if code is None:
@@ -53,9 +53,9 @@ class TemplateSSOLogin(Resource):
             # 对state_dict进行base64加密
             state_base64: str = base64.b64encode(json.dumps(state_dict).encode('utf-8')).decode('utf-8')
             redirect_url: str = url_query_join(template_rbac.sso_auth_url, state=state_base64)
-            logger.info(f"redirect to {redirect_url}")
+            logger.info("redirect to %s", redirect_url)
             return redirect(redirect_url)
-        logger.info(f"auth code is {code}")
+        logger.info("auth code is %s", code)
 
         # 定义默认值
         state_dict: Dict[str, Any] = {
@@ -69,7 +69,7 @@ class TemplateSSOLogin(Resource):
                 state_json: str = base64.b64decode(args['state']).decode('utf-8')
                 state_dict: Dict[str, Any] = json.loads(state_json)
             except Exception:
-                logger.warning(f"invalid state({args['state']})", exc_info=True)
+                logger.warning("invalid state(%s)", args['state'], exc_info=True)
                 raise AuthorizedFailException("invalid state")
 
         # 详细处理
@@ -1,7 +1,6 @@
 # -*- coding: UTF-8 -*-
 
 
-import json
 import time
 import logging
 from typing import Dict, Callable, Optional, Any
@@ -15,7 +14,7 @@ from template_exception import (
     HandlerUnCallableException, KeyParamsTypeInvalidException,
     AuthorizedFailException, TokenInvalidException
 )
-from template_json_encoder import TemplateJSONEncoder
+from template_json_encoder import dumps_bytes, loads
 from .helpers import url_path_append, url_query_join
 
 logger = logging.getLogger(__name__)
@@ -222,12 +221,12 @@ class SSOBase:
             jti=str(uuid4())
         )
         # 添加data数据
-        pay_load['data'] = json.loads(json.dumps(token_info, default=TemplateJSONEncoder().default))
+        pay_load['data'] = loads(dumps_bytes(token_info))
         # 默认的超时时间
         pay_load['exp'] = expires_at
         # 调用handler
         self.__before_generate_jwt_handler(pay_load)
-        logger.info(f"pay_load is {pay_load}, jwt_secret is {self.jwt_secret}")
+        logger.info("pay_load is %s", pay_load)
         jwt_token = jwt.encode(pay_load, self.jwt_secret, algorithm='HS256')
         if isinstance(jwt_token, bytes):
             jwt_token = jwt_token.decode('utf-8')
@@ -240,9 +239,9 @@ class SSOBase:
         :return:
         """
         if callable(self.before_generate_jwt_handler):
-            logger.info(f"before call generate_token_handler(pay_load), pay_load: {pay_load}")
+            logger.info("before call generate_token_handler(pay_load), pay_load: %s", pay_load)
             self.before_generate_jwt_handler(pay_load)
-            logger.info(f"after call generate_token_handler(pay_load), pay_load: {pay_load}")
+            logger.info("after call generate_token_handler(pay_load), pay_load: %s", pay_load)
 
     def __generate_token_by_code(self, code: str, target_user: Optional[str]) -> str:
         """
@@ -284,13 +283,13 @@ class SSOBase:
                 options={"verify_exp": False},
             )
         except (jwt.InvalidSignatureError, Exception) as e:
-            logger.warning(f"decode jwt failed, token is {jwt_token}", exc_info=True)
+            logger.warning("decode jwt failed, token is %s", jwt_token, exc_info=True)
             raise AuthorizedFailException(str(e))
         # 原始token的data内容
         jwt_data: Dict[str, Any] = jwt_obj["data"]
         # 基本的数据验证
         if not (isinstance(jwt_data, dict) and jwt_data['access_token']):
-            logger.warning(f"invalid token {jwt_data}", exc_info=True)
+            logger.warning("invalid token %s", jwt_data, exc_info=True)
             raise TokenInvalidException()
         # 获取当前时间
         now_ts = int(time.time())
@@ -307,12 +306,12 @@ class SSOBase:
                 raise AuthorizedFailException()
             # 可以refresh
             try:
-                logger.info(f"try to refresh token use refresh_token({jwt_data['refresh_token']})")
+                logger.info("try to refresh token use refresh_token(%s)", jwt_data['refresh_token'])
                 token_info: ITokenInfo = self._refresh_token(jwt_data['refresh_token'])
                 # 转化为字典
-                lark_token_data = json.loads(json.dumps(token_info, cls=TemplateJSONEncoder))
+                lark_token_data = loads(dumps_bytes(token_info))
             except Exception:
-                logger.warning(f"failed to refresh token use refresh_token({jwt_data['refresh_token']})")
+                logger.warning("failed to refresh token use refresh_token(%s)", jwt_data['refresh_token'])
                 raise AuthorizedFailException()
         else:
             # token未过期
@@ -324,10 +323,10 @@ class SSOBase:
         # 调用handler, 由于refresh token会取邮件的username,因此，如果
         # 需要切换用户, 则需要覆盖该handler, 修改username即可
         if callable(refresh_token_handler):
-            logger.info(f"before call refresh_token_handler, pay_load: {pay_load}")
+            logger.info("before call refresh_token_handler, pay_load: %s", pay_load)
             refresh_token_handler(pay_load)
-            logger.info(f"after call refresh_token_handler, pay_load: {pay_load}")
-        logger.info(f"pay_load is {pay_load}, jwt_secret is {self.jwt_secret}")
+            logger.info("after call refresh_token_handler, pay_load: %s", pay_load)
+        logger.info("pay_load is %s", pay_load)
         jwt_token: str = jwt.encode(pay_load, self.jwt_secret, algorithm='HS256')
         if isinstance(jwt_token, bytes):
             jwt_token = jwt_token.decode('utf-8')
@@ -335,9 +334,9 @@ class SSOBase:
 
     def __do_before_redirect_handler(self, args: Dict[str, str]) -> None:
         if callable(self.before_redirect_handler):
-            logger.info(f"before call do_before_redirect_handler(args), args: {args}")
+            logger.info("before call do_before_redirect_handler(args), args: %s", args)
             self.before_redirect_handler(args)
-            logger.info(f"after call do_before_redirect_handler(args), args: {args}")
+            logger.info("after call do_before_redirect_handler(args), args: %s", args)
 
     def do_logout_handler(self) -> Any:
         """
@@ -345,7 +344,7 @@ class SSOBase:
         :return:
         """
         if self.logout_handler is None:
-            logger.error(f"handler logout_handler not implement")
+            logger.error("handler logout_handler not implement")
             raise NotImplementedError('logout_handler')
 
         if not callable(self.logout_handler):
@@ -353,7 +352,7 @@ class SSOBase:
 
         logger.info('before call logout_handle()')
         _logout_res: Any = self.logout_handler()
-        logger.info(f'after call logout_handler(), _logout_res is {_logout_res}')
+        logger.info('after call logout_handler(), _logout_res is %s', _logout_res)
         return _logout_res
 
     def get_resources(self) -> Blueprint:
@@ -0,0 +1,185 @@
+# -*- coding: UTF-8 -*-
+
+
+import copy
+import time
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# 缓存命中统计, 与functools.lru_cache的cache_info保持一致
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# 未命中的标记
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    线程安全的LRU缓存, 每个元素有独立的过期时间, 超出max_size后淘汰最久未使用的元素
+    """
+
+    def __init__(self, max_size: int):
+        if max_size <= 0:
+            raise ValueError(f"max_size must be positive, got {max_size}")
+        self.max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        # key -> (过期时间, 值)
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        # 可重入, 子类可以在持有锁时调用get/set
+        self._lock: threading.RLock = threading.RLock()
+        # 正在加载的key -> [锁, 等待的线程数], 同一个key同时只有一个线程加载
+        self._loading: Dict[Hashable, List[Any]] = dict()
+        # 每次失效时递增, 失效前开始的加载结果不写入缓存
+        self._generation: int = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now: float = time.time()
+        with self._lock:
+            item: Optional[Tuple[float, Any]] = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            if item[0] <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        """
+        :param key:
+        :param value:
+        :param expires_at: 过期的时间戳
+        :return:
+        """
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def _peek(self, key: Hashable) -> Any:
+        """
+        不计入命中统计
+        """
+        with self._lock:
+            item: Optional[Tuple[float, Any]] = self._data.get(key)
+            if item is None or item[0] <= time.time():
+                return _MISSING
+            return item[1]
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float, negative_ttl: float = 0) -> Any:
+        """
+        未命中时调用loader加载并缓存, 同一个key并发未命中时只有一个线程调用loader, 其他线程等待结果
+        :param key:
+        :param loader: 加载方法
+        :param ttl: 缓存时间(秒)
+        :param negative_ttl: loader返回None时的缓存时间(秒), 为0时不缓存None
+        :return:
+        """
+        value: Any = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            loading: List[Any] = self._loading.setdefault(key, [threading.Lock(), 0])
+            loading[1] += 1
+        try:
+            with loading[0]:
+                # 等待期间其他线程已经加载完成
+                value = self._peek(key)
+                if value is not _MISSING:
+                    return value
+                generation: int = self._generation
+                value = loader()
+                expires_in: float = negative_ttl if value is None else ttl
+                with self._lock:
+                    if expires_in > 0 and generation == self._generation:
+                        self.set(key, value, time.time() + expires_in)
+                return value
+        finally:
+            with self._lock:
+                loading[1] -= 1
+                if loading[1] == 0:
+                    self._loading.pop(key, None)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation += 1
+
+    def pop_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        删除满足条件的key
+        :param predicate: key -> 是否删除
+        :return: 删除的数量
+        """
+        with self._lock:
+            keys: List[Hashable] = [_k for _k in self._data if predicate(_k)]
+            for key in keys:
+                del self._data[key]
+            self._generation += 1
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.max_size, len(self._data))
+
+
+class TokenCache(TTLCache):
+    """
+    已校验的jwt token缓存, key为token的摘要, 缓存到token的exp(不超过max_ttl秒)
+    jwt_secret变化时清空缓存, 旧secret签发的token需要重新校验
+    """
+
+    def __init__(self, max_size: int = 1024, max_ttl: float = 300):
+        super().__init__(max_size)
+        self.max_ttl: float = max_ttl
+        self._jwt_secret: Optional[str] = None
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        # 不在内存中保留完整的token
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def _check_secret(self, jwt_secret: str) -> None:
+        """
+        需要持有锁, 保证使用旧secret校验的结果不会写入新secret的缓存
+        """
+        if jwt_secret != self._jwt_secret:
+            self._data.clear()
+            self._jwt_secret = jwt_secret
+
+    def get_claims(self, token: str, jwt_secret: str) -> Optional[Dict[str, Any]]:
+        """
+        获得已校验的token内容, 未命中时返回None
+        :param token:
+        :param jwt_secret: 当前的jwt secret
+        :return:
+        """
+        digest: bytes = self._digest(token)
+        with self._lock:
+            self._check_secret(jwt_secret)
+            claims: Any = self.get(digest, _MISSING)
+        # 深拷贝(token内容为json), 避免调用方修改嵌套的data等内容时影响缓存
+        return None if claims is _MISSING else copy.deepcopy(claims)
+
+    def set_claims(self, token: str, jwt_secret: str, claims: Dict[str, Any]) -> None:
+        expires_at: float = time.time() + self.max_ttl
+        if isinstance(claims.get('exp'), (int, float)):
+            expires_at = min(expires_at, claims['exp'])
+        digest: bytes = self._digest(token)
+        with self._lock:
+            self._check_secret(jwt_secret)
+            self.set(digest, copy.deepcopy(claims), expires_at)
@@ -1,10 +1,11 @@
 # -*- coding: UTF-8 -*-
 
 
+import copy
 import functools
 import threading
 import logging
-from typing import Optional, Callable, List, Dict, Any, Set
+from typing import Optional, Callable, List, Dict, Any, Set, Hashable, Tuple
 from dataclasses import dataclass
 
 from template_exception import (
@@ -13,6 +14,7 @@ from template_exception import (
 )
 
 from .helpers import decode_token
+from .cache import TokenCache, TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -28,14 +30,28 @@ class AuthStore:
 
 
 class Auth:
-    def __init__(self, jwt_secret: str, auth_role: bool = True):
+    def __init__(
+            self, jwt_secret: str, auth_role: bool = True, token_cache_size: int = 1024, token_cache_ttl: float = 300,
+            user_cache_size: int = 1024, user_info_ttl: float = 0, user_roles_ttl: float = 0,
+            user_not_found_ttl: float = 0
+    ):
         """
         初始化方法
         :param jwt_secret: jwt secret
         :param auth_role: 是否认证角色
+        :param token_cache_size: 缓存已校验token的数量, 为0时不缓存
+        :param token_cache_ttl: token缓存的最长时间(秒), 不会超过token的exp
+        :param user_cache_size: 缓存用户信息、用户角色的数量
+        :param user_info_ttl: get_user_info_handler结果的缓存时间(秒), 为0时不缓存
+        :param user_roles_ttl: get_user_roles_handler结果的缓存时间(秒), 为0时不缓存
+        :param user_not_found_ttl: 用户不存在(get_user_info_handler返回None)的缓存时间(秒), 为0时不缓存
         """
         self.jwt_secret = jwt_secret
         self.auth_role = auth_role
+        # 已校验的token, 同一个token重复请求时不再校验签名
+        self.token_cache: Optional[TokenCache] = (
+            TokenCache(token_cache_size, token_cache_ttl) if token_cache_size > 0 else None
+        )
         # 存储token, 解耦flask
         self.registry = threading.local()
         # 获得用户角色的handler
@@ -44,6 +60,14 @@ class Auth:
         self.user_define_validator_handler: Optional[Callable] = None
         # 获取用户信息的handler
         self.get_user_info_handler: Optional[Callable] = None
+        # 从jwt中获得用户唯一标识的handler, 用于缓存用户信息、用户角色
+        self.get_user_key_handler: Callable[[Dict[str, Any]], Optional[Hashable]] = self.default_user_key
+        # 用户信息与用户角色的缓存, key为(用户唯一标识, 额外自定义参数)
+        self.user_info_ttl: float = user_info_ttl
+        self.user_roles_ttl: float = user_roles_ttl
+        self.user_not_found_ttl: float = user_not_found_ttl
+        self.user_info_cache: TTLCache = TTLCache(user_cache_size)
+        self.user_roles_cache: TTLCache = TTLCache(user_cache_size)
 
     def set_get_user_roles_handler(self, handler: Callable) -> None:
         if not callable(handler):
@@ -60,6 +84,50 @@ class Auth:
             raise HandlerUnCallableException(f"{type(self).__name__}.set_get_user_info_handler")
         self.get_user_info_handler = handler
 
+    def set_get_user_key_handler(self, handler: Callable) -> None:
+        if not callable(handler):
+            raise HandlerUnCallableException(f"{type(self).__name__}.set_get_user_key_handler")
+        self.get_user_key_handler = handler
+
+    @staticmethod
+    def default_user_key(jwt_obj: Dict[str, Any]) -> Optional[Hashable]:
+        """
+        默认使用SSO生成的token中的user_id/username作为用户唯一标识
+        :param jwt_obj:
+        :return:
+        """
+        data: Any = jwt_obj.get('data')
+        if isinstance(data, dict):
+            return data.get('user_id') or data.get('username')
+        return jwt_obj.get('sub')
+
+    def __cache_key(self, jwt_obj: Dict[str, Any], kwargs: Dict[str, Any]) -> Optional[Tuple[Hashable, Tuple]]:
+        """
+        用户信息缓存的key, 无法获得用户唯一标识或者参数无法hash时返回None, 不使用缓存
+        """
+        user_key: Optional[Hashable] = self.get_user_key_handler(jwt_obj)
+        if user_key is None:
+            return None
+        key: Tuple[Hashable, Tuple] = (user_key, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def invalidate_user(self, user_key: Optional[Hashable] = None) -> None:
+        """
+        用户信息或角色变化后清理缓存, 正在加载中的结果也不会写入缓存
+        :param user_key: 用户唯一标识, 为None时清理所有用户
+        :return:
+        """
+        if user_key is None:
+            self.user_info_cache.clear()
+            self.user_roles_cache.clear()
+            return
+        self.user_info_cache.pop_if(lambda _k: _k[0] == user_key)
+        self.user_roles_cache.pop_if(lambda _k: _k[0] == user_key)
+
     def __get_user_roles(self, user_info: Any, **kwargs) -> List[str]:
         """
         获取用户角色
@@ -70,7 +138,14 @@ class Auth:
         if not callable(self.get_user_roles_handler):
             logger.error('NotImplementedError get_user_roles_handler')
             raise NotImplementedError('get_user_roles_handler')
-        return self.get_user_roles_handler(user_info, **kwargs)
+        user_roles: List[str] = self.get_user_roles_handler(user_info, **kwargs)
+        # 在写入缓存前校验, 错误的结果不会被缓存
+        if not isinstance(user_roles, list):
+            logger.error(
+                "get_user_roles_handler must return a list, get %s, type %s", user_roles, type(user_roles)
+            )
+            raise KeyParamsTypeInvalidException('user_roles', list)
+        return user_roles
 
     def __get_user_info(self, jwt_obj: Dict[str, Any], **kwargs) -> Any:
         """
@@ -93,6 +168,23 @@ class Auth:
             raise NotImplementedError('user_define_validator_handler')
         return self.user_define_validator_handler(user_info, jwt_obj)
 
+    def decode_token(self, token: str) -> Dict[str, Any]:
+        """
+        校验并解码token, 优先使用缓存
+        jwt_secret变化后缓存失效
+        :param token:
+        :return:
+        """
+        jwt_secret: str = self.jwt_secret
+        if self.token_cache is None:
+            return decode_token(token, jwt_secret)
+        jwt_obj: Optional[Dict[str, Any]] = self.token_cache.get_claims(token, jwt_secret)
+        if jwt_obj is None:
+            jwt_obj = decode_token(token, jwt_secret)
+            # 记录校验时使用的secret, 期间secret变化时不会被当前secret使用
+            self.token_cache.set_claims(token, jwt_secret, jwt_obj)
+        return jwt_obj
+
     def set_token(self, token: Optional[str]) -> None:
         """
         设置token, 此操作在before request中做
@@ -134,11 +226,21 @@ class Auth:
                 token: str = self.get_token()
                 if not token:
                     raise AuthorizedFailException()
-                jwt_obj: Dict[str, Any] = decode_token(token, self.jwt_secret)
+                jwt_obj: Dict[str, Any] = self.decode_token(token)
                 # 获得用户信息
-                user_info: Any = self.__get_user_info(jwt_obj, **user_kwargs)
+                cache_key: Optional[Tuple[Hashable, Tuple]] = None
+                if self.user_info_ttl > 0 or self.user_roles_ttl > 0:
+                    cache_key = self.__cache_key(jwt_obj, user_kwargs)
+                if cache_key is not None and self.user_info_ttl > 0:
+                    # 深拷贝, 避免handler修改用户信息时影响缓存以及其他请求
+                    user_info: Any = copy.deepcopy(self.user_info_cache.get_or_load(
+                        cache_key, lambda: self.__get_user_info(jwt_obj, **user_kwargs),
+                        self.user_info_ttl, self.user_not_found_ttl
+                    ))
+                else:
+                    user_info = self.__get_user_info(jwt_obj, **user_kwargs)
                 if user_info is None:
-                    logger.error("user not found, token is {token}")
+                    logger.error("user not found, token is %s", token)
                     raise UserResourceNotFoundException(f"token is {token}")
                 # 验证token
                 self.__do_user_define_valid(user_info, jwt_obj)
@@ -161,13 +263,13 @@ class Auth:
                 # 获取auth store
                 auth_store: AuthStore = self.get_auth_store()
                 # 获得用户角色
-                user_roles: List[str] = self.__get_user_roles(auth_store.user_info, **user_kwargs)
-                if not isinstance(user_roles, list):
-                    logger.error(
-                        f"get_user_roles_handler must return a list, "
-                        f"get {user_roles}, type {type(user_roles)}"
-                    )
-                    raise KeyParamsTypeInvalidException('user_roles', list)
+                if cache_key is not None and self.user_roles_ttl > 0:
+                    user_roles: List[str] = copy.deepcopy(self.user_roles_cache.get_or_load(
+                        cache_key, lambda: self.__get_user_roles(auth_store.user_info, **user_kwargs),
+                        self.user_roles_ttl
+                    ))
+                else:
+                    user_roles = self.__get_user_roles(auth_store.user_info, **user_kwargs)
                 # 不进行校验
                 if not self.auth_role or not require_roles:
                     return func(*args, **kwargs)
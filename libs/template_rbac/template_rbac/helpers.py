@@ -27,7 +27,7 @@ def decode_token(jwt_token: str, jwt_secret: str) -> Dict[str, Any]:
     try:
         jwt_obj = jwt.decode(jwt_token, key=jwt_secret, verify=True, algorithms=['HS256'])
     except (jwt.InvalidSignatureError, Exception):
-        logger.error(f"invalid token {jwt_token}", exc_info=True)
+        logger.error("invalid token %s", jwt_token, exc_info=True)
         raise TokenInvalidException(jwt_token)
     return jwt_obj
 
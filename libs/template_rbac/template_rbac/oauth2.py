@@ -78,9 +78,9 @@ class OAuth2SSO(SSOBase):
         try:
             user_info_json: str = base64.b64decode(user_info_bs64).decode('utf-8')
             user_info: Dict[str, Any] = json.loads(user_info_json)
-            logger.info('根据token信息获取用户信息是: %s ' % user_info)
+            logger.info('根据token信息获取用户信息是: %s ', user_info)
         except Exception:
-            logger.error(f"invalid access_token_info: {access_token_info}", exc_info=True)
+            logger.error("invalid access_token_info: %s", access_token_info, exc_info=True)
             raise AuthorizedFailException("invalid access_token")
 
         now_ts = int(time.time())
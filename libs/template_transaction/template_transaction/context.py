@@ -49,7 +49,7 @@ class CommitContext:
                         except KeyboardInterrupt:
                             raise
                         except Exception:
-                            logger.error(f'failed to execute {func.__name__}', exc_info=True)
+                            logger.error('failed to execute %s', func.__name__, exc_info=True)
                 else:
                     self.session.rollback()
         else:
@@ -0,0 +1,108 @@
+# -*- coding: UTF-8 -*-
+
+
+"""
+ApolloClient 压测脚本
+基于 FakeApolloServer 测量 get_value 吞吐、配置变更传播延迟以及连接使用情况
+
+python benchmark_template_apollo.py --namespaces 20 --clients 10
+"""
+
+
+import time
+import argparse
+import statistics
+from typing import List, Dict
+
+from template_apollo import ApolloClient, FakeApolloServer
+
+
+def bench_get_value(client: ApolloClient, namespaces: List[str], keys: int, duration: float) -> float:
+    """
+    测量get_value吞吐
+    :return: 每秒调用次数
+    """
+    count: int = 0
+    deadline: float = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for namespace in namespaces:
+            for index in range(keys):
+                client.get_value(f"KEY_{index}", namespace=namespace)
+        count += len(namespaces) * keys
+    return count / duration
+
+
+def bench_propagation(
+        server: FakeApolloServer, clients: List[ApolloClient], namespaces: List[str], rounds: int
+) -> List[float]:
+    """
+    测量配置发布到所有客户端缓存更新的延迟
+    :return: 每个客户端每轮的延迟(毫秒)
+    """
+    latencies: List[float] = []
+    for round_index in range(rounds):
+        namespace: str = namespaces[round_index % len(namespaces)]
+        value: str = f"round-{round_index}"
+        pending: Dict[int, ApolloClient] = {id(_c): _c for _c in clients}
+        start: float = time.perf_counter()
+        server.release(namespace, {'KEY_0': value})
+        while pending:
+            for key, client in list(pending.items()):
+                if client.get_value('KEY_0', namespace=namespace) == value:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    pending.pop(key)
+            time.sleep(0.001)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ApolloClient benchmark')
+    parser.add_argument('--namespaces', type=int, default=10)
+    parser.add_argument('--keys', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=2)
+    parser.add_argument('--latency', type=float, default=0, help='服务端注入延迟(秒)')
+    args = parser.parse_args()
+
+    namespaces: List[str] = ['application'] + [f"ns{_i}" for _i in range(1, args.namespaces)]
+    with FakeApolloServer(long_poll_timeout=30) as server:
+        server.set_latency(args.latency)
+        for namespace in namespaces:
+            server.release(namespace, {f"KEY_{_i}": _i for _i in range(args.keys)})
+
+        # 初始化客户端并预热全部namespace
+        clients: List[ApolloClient] = []
+        start: float = time.perf_counter()
+        for _ in range(args.clients):
+            client: ApolloClient = ApolloClient(
+                app_id=server.app_id, config_server_url=server.url, ip='127.0.0.1', timeout=60, cycle_time=0
+            )
+            for namespace in namespaces:
+                client.get_value('KEY_0', namespace=namespace)
+            clients.append(client)
+        warmup: float = time.perf_counter() - start
+        print(f"warmup: {args.clients} clients x {len(namespaces)} namespaces in {warmup:.3f}s, "
+              f"connections={server.connections}, requests={server.requests}")
+
+        throughput: float = bench_get_value(clients[0], namespaces, args.keys, args.duration)
+        print(f"get_value: {throughput:,.0f} ops/s")
+
+        server.reset_stats()
+        for client in clients:
+            client.start()
+        latencies: List[float] = bench_propagation(server, clients, namespaces, args.rounds)
+        print(
+            f"propagation: n={len(latencies)} "
+            f"mean={statistics.mean(latencies):.2f}ms "
+            f"p50={statistics.median(latencies):.2f}ms "
+            f"max={max(latencies):.2f}ms"
+        )
+        print(f"connections={server.connections}, requests={server.requests}")
+
+        for client in clients:
+            client.stop()
+
+
+if __name__ == '__main__':
+    main()
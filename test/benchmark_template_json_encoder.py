@@ -0,0 +1,359 @@
+# -*- coding: UTF-8 -*-
+
+
+"""
+TemplateJSONEncoder 压测脚本
+
+python benchmark_template_json_encoder.py --rows 10000
+python benchmark_template_json_encoder.py --payload 'flat rows' --compare --profile
+"""
+
+
+import json
+import uuid
+import pstats
+import cProfile
+import timeit
+import tracemalloc
+import argparse
+import dataclasses
+from enum import Enum
+from datetime import timedelta, datetime, date
+from decimal import Decimal
+from json import JSONEncoder
+from dataclasses import dataclass
+from typing import Any, List, Dict, Callable, Optional, NamedTuple, Tuple
+
+import dacite
+import inject
+import numpy
+from numpy import ndarray
+from template_babel import TemplateBabel, LazyString
+from template_json_encoder import TemplateJSONEncoder, use_compact_ndarray, from_dict
+from template_json_encoder.backend import BACKENDS
+from template_json_encoder.stream import iter_encode
+from template_msg.enum import IMessageType
+from template_msg.model import ILarkMsgData
+
+
+class LegacyTemplateJSONEncoder(TemplateJSONEncoder):
+    """
+    基于isinstance判断链的实现, 用于对比
+    """
+
+    def default(self, obj: Any) -> Any:
+        try:
+            if isinstance(obj, (timedelta, datetime, date)):
+                return str(obj)
+            if isinstance(obj, Decimal):
+                return float(obj)
+            if isinstance(obj, LazyString):
+                return str(obj)
+            if isinstance(obj, uuid.UUID):
+                return str(obj)
+            if isinstance(obj, Enum):
+                return obj.value
+            if dataclasses.is_dataclass(obj):
+                return self._asdict(obj)
+            if hasattr(obj, 'to_dict') and callable(obj.to_dict):
+                return obj.to_dict()
+            if isinstance(obj, ndarray):
+                return obj.tolist()
+            iterable = iter(obj)
+        except TypeError:
+            pass
+        else:
+            return list(iterable)
+        return JSONEncoder.default(self, obj)
+
+    def _asdict_inner(self, obj: Any, dict_factory):
+        # 基于dataclasses.fields反射的实现
+        if dataclasses._is_dataclass_instance(obj):
+            result = []
+            for f in dataclasses.fields(obj):
+                value = self._asdict_inner(getattr(obj, f.name), dict_factory)
+                result.append((f.name, value))
+            return dict_factory(result)
+        elif isinstance(obj, tuple) and hasattr(obj, '_fields'):
+            result = {}
+            for index, key in enumerate(obj._fields):
+                result[key] = self._asdict_inner(obj[index], dict_factory)
+            return result
+        elif isinstance(obj, (list, tuple)):
+            return type(obj)(self._asdict_inner(v, dict_factory) for v in obj)
+        elif isinstance(obj, dict):
+            return type(obj)((self._asdict_inner(k, dict_factory),
+                              self._asdict_inner(v, dict_factory))
+                             for k, v in obj.items())
+        elif hasattr(obj, 'to_dict') and callable(obj.to_dict):
+            return obj.to_dict()
+        else:
+            return obj
+
+
+class Status(Enum):
+    ACTIVE = 'active'
+    DELETED = 'deleted'
+
+
+class Position(NamedTuple):
+    x: float
+    y: float
+
+
+@dataclass
+class Owner:
+    user_id: str
+    username: str
+    email: Optional[str]
+
+
+@dataclass
+class Row:
+    id: int
+    name: str
+    score: float
+    owner: Owner
+    position: Position
+    tags: List[str]
+
+
+@dataclass
+class Page:
+    total: int
+    items: List[Row]
+
+
+def build_page(rows: int) -> Page:
+    """
+    分页接口的典型返回: 嵌套的dataclass
+    """
+    return Page(total=rows, items=[
+        Row(
+            id=index, name=f"row-{index}", score=index / 3,
+            owner=Owner(user_id=str(index), username=f"user{index}", email=None),
+            position=Position(index, index), tags=['a', 'b']
+        )
+        for index in range(rows)
+    ])
+
+
+def build_rows(rows: int) -> List[Dict[str, Any]]:
+    """
+    列表接口的典型返回: datetime/Decimal/UUID/Enum
+    """
+    now: datetime = datetime.now()
+    return [
+        {
+            'id': uuid.uuid4(),
+            'created_at': now,
+            'day': now.date(),
+            'amount': Decimal('12.34'),
+            'status': Status.ACTIVE,
+            'index': index,
+        }
+        for index in range(rows)
+    ]
+
+
+# 飞书发送消息接口的典型返回
+LARK_MSG_DATA: Dict[str, Any] = {
+    'message_id': 'om_dc13264520392913993dd051dba21dcf',
+    'root_id': 'om_40eb06e7b84dc71c03e009ad3c754195',
+    'parent_id': 'om_d4be107c616aed9c1da8ed8068570a9f',
+    'msg_type': 'text',
+    'create_time': '1615380573411',
+    'update_time': '1615380573411',
+    'deleted': False,
+    'updated': False,
+    'chat_id': 'oc_5ad11d72b830411d72b836c20',
+    'sender': {'id': 'cli_9f427eec54ae901b', 'id_type': 'app_id', 'sender_type': 'app', 'tenant_key': '736588c9'},
+    'body': {'content': '{"text":"test content"}'},
+    'mentions': [{'key': '@_user_1', 'id': 'ou_155184d1e73cbfb8973e5a9e698e74f2', 'id_type': 'open_id',
+                  'name': 'Tom', 'tenant_key': '736588c9'}],
+    'upper_message_id': 'om_40eb06e7b84dc71c03e009ad3c754195',
+}
+
+
+def build_lazy_strings(rows: int) -> List[Dict[str, Any]]:
+    """
+    国际化较多的返回: 每行包含多个LazyString
+    """
+    return [{'id': index, 'title': LazyString('hello'), 'desc': LazyString('world')} for index in range(rows)]
+
+
+def build_big_list(rows: int) -> List[Any]:
+    """
+    原生类型组成的大列表
+    """
+    return [[index, index / 7, f"value-{index}", index % 2 == 0, None] for index in range(rows * 10)]
+
+
+# 负载名称 -> 构造方法
+PAYLOADS: Dict[str, Callable[[int], Any]] = {
+    'flat rows': build_rows,
+    'nested dataclass': build_page,
+    'lazy strings': build_lazy_strings,
+    'ndarray': lambda rows: {'result': numpy.random.random((rows, 10))},
+    'big list': build_big_list,
+}
+
+
+class Result(NamedTuple):
+    payload: str
+    mode: str
+    seconds: float
+    size: int
+    peak: int
+    blocks: int
+    func: Callable[[], Any]
+
+
+def bench(name: str, func: Callable[[], Any], repeat: int) -> float:
+    best: float = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"{name:<40} {best * 1000:10.2f} ms")
+    return best
+
+
+def measure_peak(func: Callable[[], Any]) -> int:
+    """
+    返回执行过程中的内存峰值(字节)
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_memory(func: Callable[[], Any]) -> Tuple[int, int]:
+    """
+    返回执行过程中的内存峰值(字节)以及执行期间分配且未释放的内存块数量
+    """
+    tracemalloc.start()
+    try:
+        before: int = sum(_s.count for _s in tracemalloc.take_snapshot().statistics('filename'))
+        result: Any = func()
+        blocks: int = sum(_s.count for _s in tracemalloc.take_snapshot().statistics('filename')) - before
+        del result
+        return tracemalloc.get_traced_memory()[1], blocks
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(rows: int, repeat: int, buffer_size: int, payloads: List[str]) -> List[Result]:
+    """
+    各负载分别使用标准库json、可选后端以及流式序列化
+    """
+    modes: Dict[str, Callable[[Any], Any]] = {
+        f"backend {_name}": _dumps_bytes for _name, (_dumps_bytes, _) in BACKENDS.items()
+    }
+    modes['stream'] = lambda obj: b''.join(iter_encode(obj, buffer_size))
+    results: List[Result] = []
+    print(f"{'payload':<18} {'mode':<16} {'time':>10} {'MB/s':>8} {'size':>12} {'peak':>14} {'blocks':>8}")
+    for payload in payloads:
+        data: Any = PAYLOADS[payload](rows)
+        for mode, dumps_bytes in modes.items():
+            func: Callable[[], Any] = lambda _f=dumps_bytes, _d=data: _f(_d)
+            seconds: float = min(timeit.repeat(func, number=1, repeat=repeat))
+            size: int = len(func())
+            peak, blocks = measure_memory(func)
+            results.append(Result(payload, mode, seconds, size, peak, blocks, func))
+            print(f"{payload:<18} {mode:<16} {seconds * 1000:8.2f}ms {size / seconds / 1024 / 1024:8.1f} "
+                  f"{size:>12,} {peak:>14,} {blocks:>8,}")
+    return results
+
+
+def profile(result: Result, output: str) -> None:
+    """
+    使用cProfile分析最慢的用例, 输出到文件并打印耗时最多的函数
+    """
+    profiler: cProfile.Profile = cProfile.Profile()
+    profiler.runcall(result.func)
+    profiler.dump_stats(output)
+    print(f"\nprofile of slowest case [{result.payload} / {result.mode}] saved to {output}")
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+
+
+def compare(rows: List[Dict[str, Any]], repeat: int, buffer_size: int) -> None:
+    """
+    与旧实现的对比
+    """
+    legacy: float = bench(
+        'isinstance chain', lambda: json.dumps(rows, cls=LegacyTemplateJSONEncoder), repeat
+    )
+    dispatch: float = bench(
+        'type dispatch', lambda: json.dumps(rows, cls=TemplateJSONEncoder), repeat
+    )
+    print(f"speedup: {legacy / dispatch:.2f}x")
+
+    page: Page = build_page(1000)
+    legacy_encoder: LegacyTemplateJSONEncoder = LegacyTemplateJSONEncoder()
+    encoder: TemplateJSONEncoder = TemplateJSONEncoder()
+    legacy = bench('dataclass page: fields() reflection', lambda: legacy_encoder.default(page), repeat)
+    compiled = bench('dataclass page: compiled serializer', lambda: encoder.default(page), repeat)
+    print(f"speedup: {legacy / compiled:.2f}x")
+    print(f"peak memory: reflection {measure_peak(lambda: legacy_encoder.default(page)):,} bytes, "
+          f"compiled {measure_peak(lambda: encoder.default(page)):,} bytes")
+
+    # 反序列化吞吐
+    for name, (dumps_bytes, loads) in BACKENDS.items():
+        data: bytes = dumps_bytes(rows)
+        bench(f"backend {name}: loads", lambda: loads(data), repeat)
+
+    # dict -> dataclass
+    hooks: Dict[type, Callable] = {IMessageType: IMessageType}
+    number: int = 10000
+    legacy = bench(f"dacite.from_dict x{number}", lambda: [
+        dacite.from_dict(ILarkMsgData, LARK_MSG_DATA, config=dacite.Config(type_hooks=hooks)) for _ in range(number)
+    ], repeat)
+    compiled = bench(f"from_dict x{number}", lambda: [
+        from_dict(ILarkMsgData, LARK_MSG_DATA, type_hooks=hooks) for _ in range(number)
+    ], repeat)
+    print(f"speedup: {legacy / compiled:.2f}x")
+
+    # 大数组紧凑格式
+    matrix: ndarray = numpy.random.random((len(rows), 10))
+    use_compact_ndarray()
+    bench(f"ndarray {matrix.shape} compact", lambda: json.dumps({'result': matrix}, cls=TemplateJSONEncoder), repeat)
+    use_compact_ndarray(False)
+
+    # 流式序列化: 数据来自生成器, 内存峰值取决于缓冲区大小
+    def export_stream() -> None:
+        for _ in iter_encode({'items': (build_rows(1)[0] for _ in range(len(rows)))}, buffer_size):
+            pass
+
+    def export_dumps() -> None:
+        json.dumps({'items': list(build_rows(1)[0] for _ in range(len(rows)))}, cls=TemplateJSONEncoder)
+
+    bench('export: json.dumps', export_dumps, repeat)
+    bench('export: iter_encode', export_stream, repeat)
+    print(f"peak memory: json.dumps {measure_peak(export_dumps):,} bytes, "
+          f"iter_encode {measure_peak(export_stream):,} bytes")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='TemplateJSONEncoder benchmark')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--buffer-size', type=int, default=64 * 1024)
+    parser.add_argument('--payload', action='append', choices=list(PAYLOADS), help='只运行指定的负载, 可多次指定')
+    parser.add_argument('--compare', action='store_true', help='同时运行与旧实现的对比')
+    parser.add_argument('--profile', action='store_true', help='使用cProfile分析最慢的用例')
+    parser.add_argument('--profile-output', default='benchmark_template_json_encoder.prof')
+    args = parser.parse_args()
+
+    inject.clear_and_configure(
+        lambda binder: binder.bind(TemplateBabel, TemplateBabel("messages", "./translations"))
+    )
+    results: List[Result] = run_suite(args.rows, args.repeat, args.buffer_size, args.payload or list(PAYLOADS))
+    if args.compare:
+        print()
+        compare(build_rows(args.rows), args.repeat, args.buffer_size)
+    if args.profile:
+        profile(max(results, key=lambda _r: _r.seconds), args.profile_output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# -*- coding: UTF-8 -*-
+
+
+"""
+template_logging 压测脚本
+
+python benchmark_template_logging.py --records 100000
+"""
+
+
+import os
+import time
+import timeit
+import logging
+import json
+import argparse
+import tempfile
+from uuid import uuid4
+from typing import Any, Callable
+
+from template_logging import TemplateTimedRotatingFileHandler, TemplateJSONFormatter, TemplateRingBufferHandler, lazy
+
+
+class LegacyTemplateTimedRotatingFileHandler(TemplateTimedRotatingFileHandler):
+    """
+    每条日志都重新计算文件名的实现, 用于对比
+    """
+
+    def shouldRollover(self, _record):
+        if self.currentFileName != self._compute_fn():
+            return True
+        return False
+
+
+def bench(name: str, func: Callable[[], Any], number: int, repeat: int) -> float:
+    best: float = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    print(f"{name:<40} {best * 1e9:10.1f} ns/op {1 / best:14,.0f} ops/s")
+    return best
+
+
+def bench_overhead(number: int, repeat: int) -> None:
+    """
+    日志级别未开启时单次logger调用的开销: f-string会立即格式化参数, %-style与lazy只在输出时格式化
+    实际调用处(SSOBase.generate_token)的对比见 benchmark_template_rbac.py
+    """
+    logger: logging.Logger = logging.getLogger('benchmark.overhead')
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+    logger.setLevel(logging.WARNING)
+    # SSOBase生成token时的pay_load
+    pay_load = {
+        'iat': int(time.time()), 'iss': 'http://localhost:8080', 'jti': str(uuid4()), 'exp': int(time.time()) + 3600,
+        'data': {
+            'username': 'user', 'access_token': 'a' * 64, 'refresh_token': 'r' * 64,
+            'expires_at': int(time.time()) + 3600, 'refresh_expires_at': int(time.time()) + 7200,
+            'user_info': {'name': 'user', 'email': 'user@example.com', 'roles': ['admin', 'user'] * 5},
+        },
+    }
+    eager: float = bench(
+        "disabled info f-string: auth pay_load", lambda: logger.info(f"pay_load is {pay_load}"), number, repeat
+    )
+    deferred: float = bench(
+        "disabled info %-style: auth pay_load", lambda: logger.info("pay_load is %s", pay_load), number, repeat
+    )
+    bench(
+        "disabled info lazy: auth pay_load", lambda: logger.info("pay_load is %s", lazy(json.dumps, pay_load)),
+        number, repeat
+    )
+    print(f"speedup: {eager / deferred:.2f}x")
+    logger.setLevel(logging.INFO)
+    bench("enabled info f-string: auth pay_load", lambda: logger.info(f"pay_load is {pay_load}"), number, repeat)
+    bench("enabled info %-style: auth pay_load", lambda: logger.info("pay_load is %s", pay_load), number, repeat)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='template_logging benchmark')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    bench_overhead(args.records, args.repeat)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        record: logging.LogRecord = logging.makeLogRecord({'msg': 'benchmark', 'created': time.time()})
+        for utc in (False, True):
+            legacy_handler = LegacyTemplateTimedRotatingFileHandler(
+                os.path.join(log_dir, 'legacy.log'), 7, delay=True, utc=utc
+            )
+            handler = TemplateTimedRotatingFileHandler(os.path.join(log_dir, 'info.log'), 7, delay=True, utc=utc)
+            legacy: float = bench(
+                f"shouldRollover utc={utc}: strftime", lambda: legacy_handler.shouldRollover(record),
+                args.records, args.repeat
+            )
+            current: float = bench(
+                f"shouldRollover utc={utc}: rolloverAt", lambda: handler.shouldRollover(record),
+                args.records, args.repeat
+            )
+            print(f"speedup: {legacy / current:.2f}x")
+            legacy_handler.close()
+            handler.close()
+
+        # 完整的写入流程: 逐条写入 / 写缓冲
+        for name, handler_class, kwargs in (
+                ('strftime', LegacyTemplateTimedRotatingFileHandler, {}),
+                ('rolloverAt', TemplateTimedRotatingFileHandler, {}),
+                ('buffered 64KB', TemplateTimedRotatingFileHandler, {'buffer_size': 64 * 1024}),
+        ):
+            handler = handler_class(os.path.join(log_dir, f"{name}.log"), 7, **kwargs)
+            handler.setFormatter(logging.Formatter('[%(asctime)s] [%(levelname)s] %(message)s'))
+            logger: logging.Logger = logging.getLogger(f"benchmark.{name}")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(handler)
+            bench(f"logger.info: {name}", lambda: logger.info('benchmark %s', name), args.records, args.repeat)
+            logger.removeHandler(handler)
+            handler.close()
+
+        # 环形缓冲区: 平时只写入内存
+        ring = TemplateRingBufferHandler(
+            1000, target=TemplateTimedRotatingFileHandler(os.path.join(log_dir, 'ring.log'), 7)
+        )
+        logger = logging.getLogger('benchmark.ring')
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(ring)
+        bench('logger.debug: ring buffer', lambda: logger.debug('benchmark %s', 'ring'), args.records, args.repeat)
+        logger.removeHandler(ring)
+        ring.target.close()
+        ring.close()
+
+        # 格式化: 文本 / json
+        record = logging.makeLogRecord({
+            'msg': 'benchmark %s', 'args': ('format',), 'created': time.time(), 'msecs': 0, 'user_id': 1,
+        })
+        text_formatter = logging.Formatter('[%(asctime)s] [%(levelname)s] %(message)s')
+        json_formatter = TemplateJSONFormatter()
+        bench('format: text', lambda: text_formatter.format(record), args.records, args.repeat)
+        bench('format: json', lambda: json_formatter.format(record), args.records, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
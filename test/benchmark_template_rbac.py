@@ -0,0 +1,130 @@
+# -*- coding: UTF-8 -*-
+
+
+"""
+template_rbac 压测脚本
+
+python benchmark_template_rbac.py --records 100000
+"""
+
+
+import time
+import timeit
+import logging
+import argparse
+from uuid import uuid4
+from typing import Any, Callable, Dict
+
+import jwt
+
+from template_json_encoder import dumps_bytes, loads
+from template_rbac import Auth, decode_token
+from template_rbac.base import SSOBase, ITokenInfo, logger as base_logger
+
+
+class LegacySSO(SSOBase):
+    """
+    生成token时使用f-string记录日志的实现, 用于对比
+    """
+
+    def _legacy_before_generate_jwt_handler(self, pay_load: Dict[str, Any]) -> None:
+        if callable(self.before_generate_jwt_handler):
+            base_logger.info(f"before call generate_token_handler(pay_load), pay_load: {pay_load}")
+            self.before_generate_jwt_handler(pay_load)
+            base_logger.info(f"after call generate_token_handler(pay_load), pay_load: {pay_load}")
+
+    def _legacy_generate_token(self, token_info: ITokenInfo, expires_at: int) -> str:
+        now_ts = int(time.time())
+        pay_load: Dict[str, Any] = dict(iat=now_ts, iss=self.app_root_url, jti=str(uuid4()))
+        pay_load['data'] = loads(dumps_bytes(token_info))
+        pay_load['exp'] = expires_at
+        self._legacy_before_generate_jwt_handler(pay_load)
+        base_logger.info(f"pay_load is {pay_load}, jwt_secret is {self.jwt_secret}")
+        jwt_token = jwt.encode(pay_load, self.jwt_secret, algorithm='HS256')
+        if isinstance(jwt_token, bytes):
+            jwt_token = jwt_token.decode('utf-8')
+        return jwt_token
+
+    # 替换SSOBase中的私有方法, generate_token等公开方法保持不变
+    _SSOBase__generate_token = _legacy_generate_token
+
+
+def bench(name: str, func: Callable[[], Any], number: int, repeat: int) -> float:
+    best: float = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    print(f"{name:<40} {best * 1e9:10.1f} ns/op {1 / best:14,.0f} ops/s")
+    return best
+
+
+def bench_sso_logging(number: int, repeat: int) -> None:
+    """
+    SSOBase.generate_token中的日志调用: INFO未开启(生产环境常见配置)时f-string仍会格式化pay_load, %-style不会
+    """
+    token_info = ITokenInfo(
+        access_token='a' * 64, expires_at=int(time.time()) + 3600, refresh_token='r' * 64,
+        refresh_expires_at=int(time.time()) + 7200, token_type='Bearer', user_id=str(uuid4()), username='user',
+        email='user@example.com', name='user', family_name='u', given_name='ser',
+    )
+    level: int = base_logger.level
+    base_logger.setLevel(logging.WARNING)
+    try:
+        results = []
+        for name, sso_class in (('f-string', LegacySSO), ('%-style', SSOBase)):
+            sso = sso_class(
+                'client_id', 'client_secret', 'http://localhost:8080', None, '/api/auth', '/api/logout', 'benchmark'
+            )
+            sso.set_before_generate_jwt_handler(lambda pay_load: None)
+            results.append(bench(
+                f"SSOBase.generate_token: {name}", lambda: sso.generate_token(token_info), number, repeat
+            ))
+        print(f"speedup: {results[0] / results[1]:.2f}x")
+    finally:
+        base_logger.setLevel(level)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='template_rbac benchmark')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--query-ms', type=float, default=0.5)
+    args = parser.parse_args()
+
+    jwt_secret: str = 'benchmark'
+    token = jwt.encode({
+        'iat': int(time.time()), 'exp': int(time.time()) + 3600, 'iss': 'http://localhost:8080',
+        'data': {'username': 'user', 'access_token': 'a' * 256, 'refresh_token': 'r' * 256},
+    }, jwt_secret, algorithm='HS256')
+    if isinstance(token, bytes):
+        token = token.decode('utf-8')
+
+    auth = Auth(jwt_secret)
+    uncached: float = bench("decode_token", lambda: decode_token(token, jwt_secret), args.records, args.repeat)
+    cached: float = bench("Auth.decode_token: cached", lambda: auth.decode_token(token), args.records, args.repeat)
+    print(f"speedup: {uncached / cached:.2f}x")
+    print(auth.token_cache.cache_info())
+
+    # auth.auth: 用户信息与用户角色各模拟一次耗时query_ms的数据库查询
+    def get_user_info(jwt_obj, **kwargs):
+        time.sleep(args.query_ms / 1000)
+        return {'username': jwt_obj['data']['username']}
+
+    def get_user_roles(user_info, **kwargs):
+        time.sleep(args.query_ms / 1000)
+        return ['admin']
+
+    number: int = max(args.records // 100, 1)
+    results = []
+    for name, kwargs in (('no user cache', {}), ('user cache', {'user_info_ttl': 60, 'user_roles_ttl': 60})):
+        auth = Auth(jwt_secret, **kwargs)
+        auth.set_get_user_info_handler(get_user_info)
+        auth.set_get_user_roles_handler(get_user_roles)
+        auth.set_user_define_validator_handler(lambda user_info, jwt_obj: None)
+        api = auth.auth(require_roles=['admin'])(lambda: None)
+        auth.set_token(token)
+        results.append(bench(f"auth.auth: {name}", api, number, args.repeat))
+    print(f"speedup: {results[0] / results[1]:.2f}x")
+
+    bench_sso_logging(max(args.records // 10, 1), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
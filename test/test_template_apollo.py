@@ -2,6 +2,8 @@
 
 
 import os
+import time
+import threading
 import unittest
 from typing import Dict, Any, List
 from dataclasses import dataclass, Field, asdict
@@ -10,7 +12,7 @@ import inject
 import template_logging
 from dacite import from_dict
 from dacite.dataclasses import get_fields
-from template_apollo import ApolloClient
+from template_apollo import ApolloClient, FakeApolloServer, FakeApolloFailure
 from flask import Flask, make_response
 
 # 创建日志目录
@@ -100,6 +102,81 @@ class TestTemplateApolloMethods(unittest.TestCase):
 
         self.passed = True
 
+    def test_fake_server_get_value(self):
+        """
+        测试使用本地Apollo替身读取配置
+        """
+        with FakeApolloServer(long_poll_timeout=1) as server:
+            server.release('application', {'NAME': 'hello'})
+            server.release('database', {'DB': 'sqlite'})
+            apollo_client: ApolloClient = ApolloClient(
+                app_id="unittest", config_server_url=server.url, ip='127.0.0.1', timeout=5
+            )
+            self.assertEqual(apollo_client.get_value('NAME'), 'hello')
+            self.assertEqual(apollo_client.get_value('DB', namespace='database'), 'sqlite')
+            self.assertEqual(apollo_client.get_value('MISSING', 'default'), 'default')
+            # 缓存未命中时读取configfiles接口
+            server.release('application', {'NAME': 'hello', 'MISSING': 'found'})
+            self.assertEqual(apollo_client.get_value('MISSING', auto_fetch_on_cache_miss=True), 'found')
+        # 重复stop以及未启动时stop都不会阻塞
+        server.stop()
+        FakeApolloServer().stop()
+
+        self.passed = True
+
+    def test_fake_server_config_changed(self):
+        """
+        测试配置变更时调用handler
+        """
+        changed_event: threading.Event = threading.Event()
+        entries: List[Dict[str, Any]] = []
+
+        def config_changed_handler(entry: Dict[str, Any]) -> None:
+            entries.append(entry)
+            changed_event.set()
+
+        with FakeApolloServer(long_poll_timeout=1) as server:
+            server.release('application', {'NAME': 'hello'})
+            apollo_client: ApolloClient = ApolloClient(
+                app_id="unittest", config_server_url=server.url, ip='127.0.0.1', timeout=5, cycle_time=0
+            )
+            apollo_client.set_config_changed_handler(config_changed_handler)
+            self.assertEqual(apollo_client.get_value('NAME'), 'hello')
+            apollo_client.start()
+            # 脚本化发布
+            server.schedule_releases([(0.2, 'application', {'NAME': 'world'})])
+            self.assertTrue(changed_event.wait(5))
+            apollo_client.stop()
+            self.assertEqual(entries[0]['namespaceName'], 'application')
+            self.assertEqual(apollo_client.get_value('NAME'), 'world')
+
+        self.passed = True
+
+    def test_fake_server_failure(self):
+        """
+        测试故障注入
+        """
+        with FakeApolloServer(long_poll_timeout=1) as server:
+            server.release('application', {'NAME': 'hello'})
+            server.inject_failure('configs', FakeApolloFailure.STATUS, 500)
+            apollo_client: ApolloClient = ApolloClient(
+                app_id="unittest", config_server_url=server.url, ip='127.0.0.1', timeout=5
+            )
+            # 拉取配置失败, 返回默认值
+            self.assertEqual(apollo_client.get_value('NAME', 'default'), 'default')
+            self.assertEqual(server.requests['configs'], 1)
+            # 连接被重置
+            server.inject_failure('notifications', FakeApolloFailure.RESET)
+            with self.assertRaises(Exception):
+                apollo_client.get_value('NAME', namespace='other')
+            # 延迟注入
+            server.set_latency(0.2)
+            start: float = time.monotonic()
+            self.assertEqual(apollo_client._cached_http_get('NAME', None), 'hello')
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+        self.passed = True
+
 
 if __name__ == '__main__':
     unittest.main()
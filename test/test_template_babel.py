@@ -2,12 +2,18 @@
 
 
 import os
+import time
+import pickle
+import shutil
+import tempfile
+import gettext
 import unittest
 from typing import Optional
+from unittest import mock
 
 import inject
 import template_logging
-from template_babel import TemplateBabel, get_text as _
+from template_babel import TemplateBabel, LazyString, translate_tree, get_text as _
 
 # 创建日志目录
 os.makedirs('./logs/', exist_ok=True)
@@ -71,6 +77,150 @@ class TestTemplateBabelMethods(unittest.TestCase):
         self.assertEqual(self.origin_zh_text, _(self.origin_text))
         self.passed = True
 
+    def test_translation_cache(self):
+        """
+        每种语言的翻译仅加载一次
+        """
+        self.assertIs(self.translate_cfg.get_translation("en_US"), self.translate_cfg.get_translation("en_US"))
+        # 未知语言使用默认语言的翻译, 且不会被缓存
+        self.assertIs(self.translate_cfg.get_translation("other"), self.translate_cfg.get_translation("zh_CN"))
+        self.assertNotIn("other", self.translate_cfg._translations)
+        self.assertEqual(self.origin_en_text, self.translate_cfg.gettext(self.origin_text, "en_US"))
+        # 未知语言只查找一次翻译文件, 并共用默认语言的翻译结果缓存
+        translate_cfg: TemplateBabel = TemplateBabel("messages", "./translations", memo_size=8)
+        with mock.patch.object(gettext, 'find', wraps=gettext.find) as find:
+            for _ in range(3):
+                self.assertEqual(self.origin_zh_text, translate_cfg.gettext(self.origin_text, "unknown"))
+            self.assertEqual(
+                [_c for _c in find.call_args_list if _c.kwargs.get('languages') == ["unknown"]], [mock.ANY]
+            )
+        self.assertEqual(list(translate_cfg._memo), ["zh_CN"])
+        self.assertTrue(translate_cfg.is_loaded("unknown"))
+        translate_cfg.clear_cache()
+        self.assertFalse(translate_cfg.is_loaded("unknown"))
+        self.passed = True
+
+    def test_memo(self):
+        """
+        测试翻译结果缓存
+        """
+        translate_cfg: TemplateBabel = TemplateBabel("messages", "./translations", memo_size=2)
+        self.assertEqual(self.origin_zh_text, translate_cfg.gettext(self.origin_text, "zh_CN"))
+        self.assertEqual(translate_cfg._memo["zh_CN"], {self.origin_text: self.origin_zh_text})
+        translate_cfg.gettext("a", "zh_CN")
+        translate_cfg.gettext("b", "zh_CN")
+        # 超过容量淘汰最早的结果
+        self.assertEqual(list(translate_cfg._memo["zh_CN"]), ["a", "b"])
+        translate_cfg.clear_cache()
+        self.assertEqual(translate_cfg._memo, {})
+        self.assertEqual(translate_cfg.version, 1)
+        self.passed = True
+
+    def test_preload(self):
+        """
+        测试预加载翻译
+        """
+        translate_cfg: TemplateBabel = TemplateBabel("messages", "./translations")
+        self.assertEqual(translate_cfg.available_languages(), ["en_US", "zh_CN"])
+        translate_cfg.preload()
+        self.assertEqual(translate_cfg.version, 1)
+        self.assertEqual(set(translate_cfg._catalogs), {"en_US", "zh_CN"})
+        self.assertEqual(self.origin_zh_text, translate_cfg.gettext(self.origin_text, "zh_CN"))
+        self.assertEqual(self.origin_en_text, translate_cfg.gettext(self.origin_text, "en_US"))
+        self.assertEqual(self.origin_zh_text, translate_cfg.gettext(self.origin_text, "other"))
+        self.assertEqual("not exists", translate_cfg.gettext("not exists", "en_US"))
+        self.passed = True
+
+    def test_watcher(self):
+        """
+        测试mo文件变化后重新加载翻译
+        """
+        location: str = tempfile.mkdtemp()
+        try:
+            shutil.copytree("./translations", location, dirs_exist_ok=True)
+            translate_cfg: TemplateBabel = TemplateBabel("messages", location)
+            translate_cfg.preload()
+            translate_cfg.start_watcher(0.05)
+            self.assertEqual(self.origin_zh_text, translate_cfg.gettext(self.origin_text, "zh_CN"))
+            # 使用英文翻译覆盖中文翻译
+            zh_mo: str = os.path.join(location, "zh_CN", "LC_MESSAGES", "messages.mo")
+            shutil.copy(os.path.join(location, "en_US", "LC_MESSAGES", "messages.mo"), zh_mo)
+            os.utime(zh_mo, (time.time() + 10, time.time() + 10))
+            deadline: float = time.monotonic() + 5
+            while translate_cfg.version < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            translate_cfg.stop_watcher()
+            self.assertEqual(self.origin_en_text, translate_cfg.gettext(self.origin_text, "zh_CN"))
+        finally:
+            shutil.rmtree(location, ignore_errors=True)
+        self.passed = True
+
+    def test_lazy_string(self):
+        """
+        测试LazyString的缓存以及字符串协议
+        """
+        lazy_text: LazyString = LazyString(self.origin_text)
+        self.translate_cfg.set_lang("zh_CN")
+        self.assertEqual(self.origin_zh_text, str(lazy_text))
+        self.assertEqual(lazy_text._cache, {"zh_CN": self.origin_zh_text})
+        self.translate_cfg.set_lang("en_US")
+        self.assertEqual(self.origin_en_text, str(lazy_text))
+        self.assertEqual(len(lazy_text._cache), 2)
+        # 字符串协议
+        self.assertEqual(len(lazy_text), len(self.origin_en_text))
+        self.assertEqual(lazy_text, self.origin_en_text)
+        # 哈希按原文计算, 不随语言变化
+        self.assertEqual(hash(lazy_text), hash(LazyString(self.origin_text)))
+        self.assertEqual(lazy_text, LazyString(self.origin_text))
+        self.translate_cfg.set_lang("zh_CN")
+        self.assertEqual({lazy_text: 1}[LazyString(self.origin_text)], 1)
+        self.translate_cfg.set_lang("en_US")
+        self.assertLess(lazy_text, "z")
+        self.assertFalse(lazy_text == 1)
+        with self.assertRaises(TypeError):
+            _ = lazy_text < 1
+        self.assertEqual(lazy_text + "!", self.origin_en_text + "!")
+        self.assertEqual("!" + lazy_text, "!" + self.origin_en_text)
+        self.assertEqual(f"{lazy_text:>7}", f"{self.origin_en_text:>7}")
+        self.assertEqual(lazy_text.upper(), self.origin_en_text.upper())
+        self.assertIn("ell", lazy_text)
+        self.assertFalse(hasattr(lazy_text, '__dict__'))
+        # 翻译重新加载后缓存失效
+        self.translate_cfg.clear_cache()
+        self.assertEqual(self.origin_en_text, str(lazy_text))
+        self.assertEqual(len(lazy_text._cache), 1)
+        # 未知语言按默认语言缓存
+        for index in range(300):
+            self.assertEqual(self.origin_zh_text, lazy_text.translate(f"unknown_{index}"))
+        self.assertEqual(set(lazy_text._cache), {"en_US", "zh_CN"})
+        # 序列化
+        self.assertEqual(pickle.loads(pickle.dumps(lazy_text)).text, self.origin_text)
+        self.passed = True
+
+    def test_translate_tree(self):
+        """
+        测试一次性翻译payload
+        """
+        static_part = {"code": 0, "items": [1, 2, "3"]}
+        payload = {
+            "static": static_part,
+            "message": LazyString(self.origin_text),
+            "menus": [{"name": LazyString(self.origin_text), "id": 1}, ("a", LazyString(self.origin_text))],
+        }
+        self.translate_cfg.set_lang("zh_CN")
+        result = translate_tree(payload, "en_US")
+        # 未包含LazyString的子结构不会被复制
+        self.assertIs(result["static"], static_part)
+        self.assertEqual(result["message"], self.origin_en_text)
+        self.assertIs(type(result["message"]), str)
+        self.assertEqual(result["menus"], [{"name": self.origin_en_text, "id": 1}, ("a", self.origin_en_text)])
+        # 原始payload不会被修改
+        self.assertIsInstance(payload["message"], LazyString)
+        # 默认使用当前线程的语言
+        self.assertEqual(translate_tree([LazyString(self.origin_text)]), [self.origin_zh_text])
+        self.assertIs(translate_tree(static_part), static_part)
+        self.passed = True
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,20 +1,34 @@
 # -*- coding: UTF-8 -*-
 
 
+import io
 import os
+import sys
+import time
+import typing
+import threading
+import subprocess
 import unittest
 import json
 from datetime import datetime, timedelta, date
 from decimal import Decimal
 from uuid import uuid1, uuid4
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, field
+from typing import List, Optional, NamedTuple, Dict, Union, Tuple
+from unittest import mock
 
 import inject
 import numpy
 import template_logging
 from template_babel import LazyString, TemplateBabel
-from template_json_encoder import TemplateJSONEncoder
+from template_json_encoder import (
+    TemplateJSONEncoder, register, dumps, dumps_bytes, loads, get_backend, set_backend, iter_encode, dump_stream,
+    use_compact_ndarray, decode_ndarray, from_dict
+)
+from template_json_encoder import decoder
+from template_json_encoder import backend as backend_module
+from template_json_encoder.backend import BACKENDS
 
 # 创建日志目录
 os.makedirs('./logs/', exist_ok=True)
@@ -119,6 +133,48 @@ class TestTemplateJsonEncoderMethods(unittest.TestCase):
 
         self.passed = True
 
+    def test_nested_dataclass(self):
+        class Position(NamedTuple):
+            x: int
+            y: int
+
+        @dataclass
+        class Child:
+            name: str
+            position: Position
+            created_at: datetime
+
+        @dataclass
+        class Parent:
+            id: int
+            children: List[Child] = field(default_factory=list)
+            extra: Optional[dict] = None
+
+        now: datetime = datetime.now()
+        target = Parent(
+            1, [Child('a', Position(1, 2), now), Child('b', Position(3, 4), now)],
+            {'k': [Child('c', Position(5, 6), now)]}
+        )
+        expected = {
+            'id': 1,
+            'children': [
+                {'name': 'a', 'position': {'x': 1, 'y': 2}, 'created_at': now},
+                {'name': 'b', 'position': {'x': 3, 'y': 4}, 'created_at': now},
+            ],
+            'extra': {'k': [{'name': 'c', 'position': {'x': 5, 'y': 6}, 'created_at': now}]},
+        }
+        self.assertEqual(self.default(target), expected)
+        # 非dict的dict_factory与dataclasses.asdict保持一致
+        self.assertEqual(
+            TemplateJSONEncoder()._asdict(target.children[0], dict_factory=lambda items: dict(items)),
+            {'name': 'a', 'position': {'x': 1, 'y': 2}, 'created_at': now}
+        )
+        json_string = json.dumps({'result': target}, default=self.default)
+        self.assertEqual(json.loads(json_string)['result']['children'][1]['created_at'], str(now))
+        self.assertEqual(asdict(target)['id'], self.default(target)['id'])
+
+        self.passed = True
+
     def test_ndarray(self):
         target = numpy.array([1, 2, 3], dtype='int8')
         json_string = json.dumps({'result': target}, default=self.default)
@@ -126,6 +182,311 @@ class TestTemplateJsonEncoderMethods(unittest.TestCase):
 
         self.passed = True
 
+    def test_numpy(self):
+        target = {
+            'int': numpy.int64(1), 'float': numpy.float32(1.5), 'bool': numpy.bool_(False),
+            'datetime64': numpy.datetime64('2022-01-02T03:04:05'),
+        }
+        json_string = json.dumps(target, default=self.default)
+        self.assertEqual(json.loads(json_string), {
+            'int': 1, 'float': 1.5, 'bool': False, 'datetime64': '2022-01-02T03:04:05'
+        })
+        # 标量与数组元素的转换结果一致, 保留datetime64的精度, float32不取最短表示
+        for array in (
+                numpy.array(['2021-01-01'], dtype='datetime64[D]'),
+                numpy.array(['2021-01-01T01:02:03.123'], dtype='datetime64[ms]'),
+                numpy.array([0.1], dtype='float32'),
+        ):
+            self.assertEqual(json.loads(json.dumps(array, default=self.default)),
+                             [json.loads(json.dumps(array[0], default=self.default))])
+        self.assertEqual(json.loads(dumps([numpy.datetime64('2021-01-01'), numpy.float32(0.1)])),
+                         ['2021-01-01', 0.10000000149011612])
+        self.assertEqual(json.loads(dumps(numpy.array(['2021-01-01T01:02:03.123'], dtype='datetime64[ms]'))),
+                         ['2021-01-01T01:02:03.123'])
+
+        # 紧凑格式
+        target = numpy.arange(12, dtype='int32').reshape(3, 4)[:, 1:]
+        use_compact_ndarray()
+        try:
+            json_string = json.dumps({'result': target}, default=self.default)
+            self.assertIn('__ndarray__', json.loads(json_string)['result'])
+            result = json.loads(json_string, object_hook=decode_ndarray)['result']
+            self.assertEqual(result.dtype, target.dtype)
+            numpy.testing.assert_array_equal(result, target)
+            self.assertEqual(json.loads(dumps({'result': target}), object_hook=decode_ndarray)['result'].shape, (3, 3))
+        finally:
+            use_compact_ndarray(False)
+        self.assertEqual(json.loads(dumps({'result': target}))['result'], target.tolist())
+
+        self.passed = True
+
+    def test_from_dict(self):
+        class Color(Enum):
+            RED = 'red'
+
+        @dataclass
+        class Child:
+            name: str
+            color: Optional[Color] = None
+
+        @dataclass
+        class Node:
+            value: int
+            children: List['Node'] = field(default_factory=list)
+
+        @dataclass
+        class Parent:
+            id: int
+            child: Optional[Child]
+            children: List[Child]
+            mapping: Dict[str, Child]
+            pair: Tuple[Child, int] = None
+            either: Union[int, str] = 0
+            node: Optional[Node] = None
+            tags: List[str] = field(default_factory=list)
+
+        data = {
+            'id': 1,
+            'child': {'name': 'a', 'color': 'red'},
+            'children': [{'name': 'b'}],
+            'mapping': {'c': {'name': 'c', 'color': None}},
+            'pair': [{'name': 'd'}, 2],
+            'node': {'value': 1, 'children': [{'value': 2}]},
+            'unknown': 'ignored',
+        }
+        hooks = {Color: Color}
+        result = from_dict(Parent, data, type_hooks=hooks)
+        self.assertEqual(result, Parent(
+            id=1, child=Child('a', Color.RED), children=[Child('b')], mapping={'c': Child('c')},
+            pair=(Child('d'), 2), node=Node(1, [Node(2)])
+        ))
+        # 转换方法被缓存, 再次调用结果一致
+        self.assertEqual(from_dict(Parent, data, type_hooks=hooks), result)
+        self.assertEqual(from_dict(Parent, {'id': 2, 'child': None, 'children': [], 'mapping': {}}).child, None)
+        with self.assertRaises(TypeError):
+            from_dict(Parent, {'id': 3})
+        with self.assertRaises(ValueError):
+            from_dict(Child, {'name': 'a', 'color': 'blue'}, type_hooks=hooks)
+
+        # 与dacite一致: Union中dict转换为dataclass, 缺少没有默认值的Optional字段时使用None
+        @dataclass
+        class Message:
+            content: Union[str, Child]
+            items: Union[str, List[Child]]
+            reply: Optional[Child]
+
+        self.assertEqual(
+            from_dict(Message, {'content': {'name': 'a'}, 'items': [{'name': 'b'}]}),
+            Message(Child('a'), [Child('b')], None)
+        )
+        self.assertEqual(from_dict(Message, {'content': 'a', 'items': 'b', 'reply': None}), Message('a', 'b', None))
+
+        # 每次传入新的lambda时缓存的转换方法数量有限
+        with mock.patch.object(decoder, 'MAX_HOOKED_DECODERS', 8):
+            for _ in range(100):
+                result = from_dict(Child, {'name': 'a', 'color': 'red'}, type_hooks={Color: lambda v: Color(v)})
+                self.assertEqual(result, Child('a', Color.RED))
+            self.assertLessEqual(len(decoder._hooked_decoders), 8)
+
+        self.passed = True
+
+    def test_from_dict_concurrent(self):
+        @dataclass
+        class Tree:
+            value: int
+            children: List['Tree'] = field(default_factory=list)
+
+        get_type_hints = typing.get_type_hints
+
+        def slow_get_type_hints(*args, **kwargs):
+            # 拉长生成转换方法的时间, 其他线程在此期间首次调用
+            time.sleep(0.1)
+            return get_type_hints(*args, **kwargs)
+
+        results = []
+        errors = []
+
+        def decode():
+            try:
+                results.append(from_dict(Tree, {'value': 1, 'children': [{'value': 2}]}))
+            except Exception as e:
+                errors.append(e)
+
+        with mock.patch('typing.get_type_hints', slow_get_type_hints):
+            threads = [threading.Thread(target=decode) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [Tree(1, [Tree(2)])] * 4)
+
+        self.passed = True
+
+    def test_import_time(self):
+        # 导入时不加载numpy与template_babel
+        code = (
+            "import sys, time; start = time.perf_counter(); import template_json_encoder; "
+            "print(time.perf_counter() - start, 'numpy' in sys.modules, 'template_babel' in sys.modules)"
+        )
+        output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+        cost, numpy_loaded, babel_loaded = output.split()
+        self.assertEqual((numpy_loaded, babel_loaded), ('False', 'False'))
+        logger.info(f"import template_json_encoder cost {float(cost) * 1000:.2f}ms")
+
+        self.passed = True
+
+    def test_register(self):
+        class Point:
+            def __init__(self, x: int, y: int):
+                self.x = x
+                self.y = y
+
+        class Point3D(Point):
+            pass
+
+        with self.assertRaises(TypeError):
+            json.dumps({'result': Point(1, 2)}, default=self.default)
+        register(Point, lambda obj: [obj.x, obj.y])
+        json_string = json.dumps({'result': Point(1, 2)}, default=self.default)
+        self.assertEqual(json.loads(json_string)['result'], [1, 2])
+        # 子类沿MRO使用父类的handler, 解析结果会被缓存
+        json_string = json.dumps({'result': Point3D(3, 4)}, default=self.default)
+        self.assertEqual(json.loads(json_string)['result'], [3, 4])
+        self.assertIn(Point3D, TemplateJSONEncoder._handler_cache)
+
+        self.passed = True
+
+    def test_iterable(self):
+        json_string = json.dumps({'result': (i for i in range(3)), 'set': {1}}, default=self.default)
+        self.assertEqual(json.loads(json_string), {'result': [0, 1, 2], 'set': [1]})
+
+        self.passed = True
+
+    def test_backend(self):
+        class MyEnum(Enum):
+            A = 'a'
+
+        @dataclass
+        class MyDataClass:
+            name: str
+            created_at: datetime
+            amount: Decimal
+            tags: List[str] = field(default_factory=list)
+
+        target = {
+            'datetime': datetime(2022, 1, 2, 3, 4, 5, 6),
+            'date': date(2022, 1, 2),
+            'timedelta': timedelta(seconds=61),
+            'decimal': Decimal('1.5'),
+            'uuid': uuid4(),
+            'enum': MyEnum.A,
+            'lazy_string': LazyString('hello'),
+            'ndarray': numpy.array([1, 2, 3]),
+            'matrix': numpy.arange(6, dtype='float64').reshape(2, 3),
+            'datetime64': numpy.array(['2022-01-02T03:04:05'], dtype='datetime64[s]'),
+            'numpy_scalars': [numpy.int64(1), numpy.float64(1.5), numpy.bool_(True), numpy.float32(0.1)],
+            'float32': numpy.array([0.1, 1.5], dtype='float32'),
+            'date64': numpy.array(['2021-01-01'], dtype='datetime64[D]'),
+            'date64_scalar': numpy.datetime64('2021-01-01'),
+            'dataclass': MyDataClass('name', datetime(2022, 1, 2), Decimal('2.5'), ['a']),
+            'text': '中文',
+            'big': 2 ** 70,
+        }
+        floats = {
+            'floats': [1e16, 1e-7, 1.5e300, 5e-324, -2.5e-5, 0.1, 1e22],
+            'decimal': Decimal('1E-7'),
+            'float64': numpy.array([1e16, 1e-7, 1.5e300]),
+            'float32': numpy.array([1e16, 1e-7, 3e38, 1e-45], dtype='float32'),
+            # 字符串中的指数与NaN不受影响
+            'text': ['1e+16', '1e-07', 'NaN', '"NaN"', '\\Infinity'],
+        }
+        # NaN/Infinity在所有后端都输出为null
+        special = [float('nan'), float('inf'), float('-inf'), Decimal('NaN')]
+        stdlib_dumps, _ = BACKENDS['json']
+        expected = stdlib_dumps(target)
+        self.assertIn(b'"floats":[1e16,1e-7,1.5e300,5e-324,-0.000025,0.1,1e22]', stdlib_dumps(floats))
+        self.assertIn(b'"text":["1e+16","1e-07","NaN","\\"NaN\\"","\\\\Infinity"]', stdlib_dumps(floats))
+        backend = get_backend()
+        try:
+            for name in BACKENDS:
+                set_backend(name)
+                # 各后端的输出与标准库逐字节一致
+                self.assertEqual(dumps_bytes(target), expected, name)
+                self.assertEqual(dumps_bytes(target, sort_keys=True), stdlib_dumps(target, True), name)
+                self.assertEqual(dumps_bytes(floats), stdlib_dumps(floats), name)
+                self.assertEqual(dumps_bytes(special), b'[null,null,null,null]', name)
+                self.assertEqual(dumps_bytes(numpy.array(special[:3])), b'[null,null,null]', name)
+                self.assertEqual(b''.join(iter_encode([floats, special])), dumps_bytes([floats, special]), name)
+                self.assertEqual(loads(dumps_bytes({'text': '中文'})), {'text': '中文'}, name)
+        finally:
+            set_backend(backend)
+        with self.assertRaises(ValueError):
+            set_backend('unknown')
+
+        if 'orjson' in BACKENDS:
+            native = [
+                numpy.arange(1000).reshape(10, 100),
+                numpy.arange(1000, dtype='uint8'),
+                numpy.arange(1000) % 3 == 0,
+                numpy.array([1e16, 1e-7, 2.5e-5, float('nan'), -0.0] * 200),
+            ]
+            # 小数组、非C连续、大端序、float32与datetime64经由ndarray_to_list转换, 1970年以前的datetime64不会交给orjson
+            converted = [
+                numpy.arange(3),
+                numpy.arange(2000)[::2],
+                numpy.arange(1000, dtype='>i4'),
+                numpy.full(1000, 0.1, dtype='float32'),
+                numpy.full(1000, numpy.datetime64('1969-12-31T23:59:59', 's')),
+            ]
+            set_backend('orjson')
+            try:
+                self.assertEqual(dumps_bytes({'native': native, 'converted': converted}),
+                                 stdlib_dumps({'native': native, 'converted': converted}))
+                self.assertEqual(b''.join(iter_encode(native)), stdlib_dumps(native))
+                # 可原生序列化的数组不经过default转换
+                TemplateJSONEncoder._handler_cache.clear()
+                with mock.patch.object(backend_module, '_default', side_effect=AssertionError):
+                    self.assertEqual(dumps_bytes(native), stdlib_dumps(native))
+            finally:
+                set_backend(backend)
+
+        self.passed = True
+
+    def test_stream(self):
+        consumed = []
+
+        def rows():
+            for index in range(1000):
+                consumed.append(index)
+                yield {'id': index, 'created_at': datetime(2022, 1, 2), 'amount': Decimal('1.5'), 'name': '中文'}
+
+        expected = [
+            {'id': index, 'created_at': str(datetime(2022, 1, 2)), 'amount': 1.5, 'name': '中文'}
+            for index in range(1000)
+        ]
+        chunks = iter_encode({'total': 1000, 'items': rows(), 'empty': (i for i in ())}, buffer_size=1024)
+        first = next(chunks)
+        # 生成器是惰性消费的
+        self.assertLess(len(consumed), 1000)
+        self.assertGreaterEqual(len(first), 1024)
+        result = json.loads(first + b''.join(chunks))
+        self.assertEqual(result, {'total': 1000, 'items': expected, 'empty': []})
+
+        fp = io.BytesIO()
+        written = dump_stream([1.5, None, True, {1: 'a'}, uuid4(), numpy.array([1, 2])], fp, buffer_size=4)
+        self.assertEqual(written, len(fp.getvalue()))
+        self.assertEqual(json.loads(fp.getvalue())[:4], [1.5, None, True, {'1': 'a'}])
+
+        with self.assertRaises(TypeError):
+            b''.join(iter_encode({'result': object()}))
+        loop = []
+        loop.append(loop)
+        with self.assertRaises(ValueError):
+            b''.join(iter_encode(loop))
+
+        self.passed = True
+
 
 if __name__ == '__main__':
     unittest.main()
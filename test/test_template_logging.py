@@ -2,10 +2,51 @@
 
 
 import os
+import json
+import time
+import datetime
+import queue
+import tarfile
+import tempfile
+import logging
+import threading
 import unittest
+import multiprocessing
 from uuid import uuid1
+from unittest import mock
 
 import template_logging
+from template_logging.handlers import _archive_worker
+
+
+class DayRotatingFileHandler(template_logging.TemplateTimedRotatingFileHandler):
+    """
+    由测试控制日期的handler
+    """
+    day = 1
+
+    def _compute_fn(self):
+        # 从今天开始, 避免压缩包因过期被清理
+        return f"{self.baseFilename}.{datetime.date.today() + datetime.timedelta(days=self.day)}"
+
+
+def write_days(log_dir: str, index: int, days: int, lines: int, barrier) -> None:
+    """
+    多进程压测: 每个进程按天写入日志, 所有进程同时切换日期
+    """
+    handler = DayRotatingFileHandler(os.path.join(log_dir, 'stress.log'), 1, multiprocess=True)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for day in range(1, days + 1):
+        barrier.wait()
+        if day > 1:
+            handler.day = day
+            handler.rolloverAt = 0
+        for line in range(lines):
+            handler.handle(logging.makeLogRecord({'msg': f"{index}-{day}-{line}"}))
+    barrier.wait()
+    # 进程退出前等待后台压缩完成
+    _archive_worker.wait()
+    handler.close()
 
 
 class TestTemplateLoggingMethods(unittest.TestCase):
@@ -37,6 +78,530 @@ class TestTemplateLoggingMethods(unittest.TestCase):
             f"func {self.__class__.__name__}.{self._testMethodName}.........{'passed' if self.passed else 'failed'}"
         )
 
+    @staticmethod
+    def _find(path: str, text: str) -> bool:
+        with open(path) as f:
+            return text in f.read()
+
+    def test_async_log(self):
+        template_logging.init_logger('./config/log.ini', async_mode=True, queue_size=100)
+        try:
+            root = logging.getLogger()
+            self.assertTrue(all(isinstance(_h, template_logging.TemplateQueueHandler) for _h in root.handlers))
+            log_text = f"this is async {self.uuid_string}"
+            # 异常信息在调用方线程格式化
+            try:
+                raise RuntimeError(log_text)
+            except RuntimeError:
+                self.logger.exception("error %s", log_text)
+            self.logger.debug(log_text)
+            self.logger.info(log_text)
+            # 不修改调用方的record
+            record = logging.makeLogRecord({'msg': 'prepare %s', 'args': (log_text,)})
+            prepared = root.handlers[0].prepare(record)
+            self.assertEqual((prepared.msg, prepared.args), (f"prepare {log_text}", None))
+            self.assertEqual((record.msg, record.args), ('prepare %s', (log_text,)))
+
+            # fork后子进程重新启动后台线程, 日志仍然写入
+            fork_text = f"this is async fork {self.uuid_string}"
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    self.logger.info(fork_text)
+                    template_logging.shutdown_logger()
+                    code = 0
+                finally:
+                    os._exit(code)
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+        finally:
+            # 等待队列中的日志写入后恢复为同步写入
+            template_logging.shutdown_logger()
+        self.assertFalse(any(isinstance(_h, template_logging.TemplateQueueHandler) for _h in root.handlers))
+        self.assertTrue(self._find('./logs/debug.log', f"[DEBUG] [process-{os.getpid()}]"))
+        self.assertTrue(self._find('./logs/info.log', log_text))
+        self.assertTrue(self._find('./logs/error.log', f"RuntimeError: {log_text}"))
+        self.assertTrue(self._find('./logs/info.log', fork_text))
+
+        with self.assertRaises(ValueError):
+            template_logging.init_logger('./config/log.ini', async_mode=True, overflow_policy='unknown')
+        template_logging.init_logger('./config/log.ini')
+
+        self.passed = True
+
+    def test_async_overflow(self):
+        # 阻塞后台线程, 使队列保持已满状态
+        blocker = threading.Event()
+
+        class SlowHandler(logging.Handler):
+            def emit(self, record):
+                blocker.wait(5)
+
+        target = SlowHandler()
+        log_queue = queue.Queue(1)
+        listener = template_logging.TemplateQueueListener(log_queue)
+        drop = template_logging.TemplateQueueHandler(log_queue, target, 'drop')
+        drop_debug = template_logging.TemplateQueueHandler(log_queue, target, 'drop-debug')
+        listener.start()
+        try:
+            record = logging.makeLogRecord({'msg': 'overflow', 'levelno': logging.DEBUG})
+            for _ in range(3):
+                drop.handle(record)
+                drop_debug.handle(record)
+            self.assertGreater(drop.dropped, 0)
+            self.assertGreater(drop_debug.dropped, 0)
+        finally:
+            blocker.set()
+            listener.stop()
+
+        self.passed = True
+
+    def test_rollover_at(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            for utc in (True, False):
+                handler = template_logging.TemplateTimedRotatingFileHandler(
+                    os.path.join(log_dir, 'rollover.log'), 7, delay=True, utc=utc
+                )
+                convert = time.gmtime if utc else time.localtime
+                now = time.time()
+                # 切换时间为下一个0点
+                self.assertGreater(handler.rolloverAt, now)
+                self.assertEqual(convert(handler.rolloverAt)[3:6], (0, 0, 0))
+                self.assertEqual(convert(handler.rolloverAt - 1)[:3], convert(now)[:3])
+
+                record = logging.makeLogRecord({'msg': 'rollover'})
+                self.assertFalse(handler.shouldRollover(record))
+                record.created = handler.rolloverAt
+                # 日期没有变化时不切换, 只重新计算切换时间
+                rollover_at = handler.rolloverAt
+                handler._day_fn = handler._compute_fn()
+                handler.rolloverAt = now - 1
+                self.assertFalse(handler.shouldRollover(record))
+                self.assertEqual(handler.rolloverAt, rollover_at)
+                # 日期变化时切换
+                handler.rolloverAt = now - 1
+                handler._day_fn = handler.baseFilename + '.2000-01-01'
+                self.assertTrue(handler.shouldRollover(record))
+                handler.close()
+
+        self.passed = True
+
+    def test_archive(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            handler = template_logging.TemplateTimedRotatingFileHandler(
+                os.path.join(log_dir, 'archive.log'), 2, delay=True, compression_level=9
+            )
+            for day in range(1, 6):
+                with open(os.path.join(log_dir, f"archive.log.2022-01-0{day}"), 'w') as f:
+                    f.write(f"day {day}\n" * 1000)
+            # 过期的压缩包
+            expired = os.path.join(log_dir, 'archive.log.2000-01-01_2000-01-07.tar.gz')
+            with open(expired, 'w'):
+                pass
+            handler.doRollover()
+            # 压缩在后台线程中执行
+            _archive_worker.wait()
+
+            files = sorted(os.listdir(log_dir))
+            # 保留最新的backup_count个日志文件不压缩
+            self.assertEqual(files, [
+                'archive.log.2022-01-01_2022-01-02.tar.gz', 'archive.log.2022-01-03', 'archive.log.2022-01-04',
+                'archive.log.2022-01-05'
+            ])
+            path = os.path.join(log_dir, files[0])
+            with tarfile.open(path, 'r:gz') as tar:
+                self.assertEqual(tar.getnames(), ['archive.log.2022-01-01', 'archive.log.2022-01-02'])
+            self.assertLess(os.path.getsize(path), 1000)
+            handler.close()
+
+        with tempfile.TemporaryDirectory() as log_dir:
+            # utc模式下按UTC日期清理压缩包
+            handler = template_logging.TemplateTimedRotatingFileHandler(
+                os.path.join(log_dir, 'utc.log'), 2, delay=True, utc=True, retention_days=3
+            )
+            for day in (6, 8):
+                with open(os.path.join(log_dir, f"utc.log.2022-01-0{day}_2022-01-0{day}.tar.gz"), 'w'):
+                    pass
+            with mock.patch('time.gmtime', return_value=time.struct_time((2022, 1, 10, 0, 0, 0, 0, 10, 0))):
+                handler.clean_log_zip()
+            self.assertEqual(
+                [_f for _f in os.listdir(log_dir) if _f.endswith('.tar.gz')], ['utc.log.2022-01-08_2022-01-08.tar.gz']
+            )
+
+            # 压缩失败时删除临时文件, 保留日志文件
+            log_files = []
+            for day in (1, 2):
+                log_files.append(os.path.join(log_dir, f"utc.log.2022-01-0{day}"))
+                with open(log_files[-1], 'w') as f:
+                    f.write('utc\n')
+            with mock.patch.object(tarfile.TarFile, 'add', side_effect=OSError('No space left on device')):
+                with self.assertRaises(OSError):
+                    handler._compress(log_files)
+            self.assertFalse([_f for _f in os.listdir(log_dir) if _f.endswith('.tmp')])
+            self.assertTrue(all(os.path.exists(_f) for _f in log_files))
+            handler.close()
+
+        with self.assertRaises(ValueError):
+            template_logging.TemplateTimedRotatingFileHandler('logs/archive.log', compression='rar')
+
+        self.passed = True
+
+    def test_size_rollover(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            handler = template_logging.TemplateTimedRotatingFileHandler(
+                os.path.join(log_dir, 'size.log'), 2, delay=True, max_bytes=1000
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            day = handler._compute_fn()
+            with mock.patch('os.listdir', wraps=os.listdir) as listdir:
+                # 每个文件写入4条后超过max_bytes
+                for index in range(44):
+                    handler.handle(logging.makeLogRecord({'msg': f"{index:03d}" + 'x' * 296}))
+                    _archive_worker.wait()
+                # 只在首次压缩时扫描目录
+                self.assertEqual(listdir.call_count, 1)
+            self.assertEqual(handler.currentFileName, f"{day}.10")
+            self.assertEqual(os.path.realpath(handler.baseFilename), handler.currentFileName)
+            handler.close()
+
+            date = day[-10:]
+            files = sorted(os.listdir(log_dir))
+            # 按序号排序压缩, .10在.9之后
+            self.assertEqual(files, sorted([
+                f"size.log.{date}_{date}.1.tar.gz", f"size.log.{date}.2_{date}.3.tar.gz",
+                f"size.log.{date}.4_{date}.5.tar.gz", f"size.log.{date}.6_{date}.7.tar.gz",
+                f"size.log.{date}.8", f"size.log.{date}.9", f"size.log.{date}.10", 'size.log'
+            ]))
+            lines = []
+            for file_name in files:
+                path = os.path.join(log_dir, file_name)
+                if file_name.endswith('.tar.gz'):
+                    with tarfile.open(path, 'r:gz') as tar:
+                        for member in tar.getmembers():
+                            lines.extend(tar.extractfile(member).read().decode().split())
+                elif file_name != 'size.log':
+                    with open(path) as f:
+                        lines.extend(f.read().split())
+            self.assertEqual(sorted(_l[:3] for _l in lines), [f"{_i:03d}" for _i in range(44)])
+
+        with tempfile.TemporaryDirectory() as log_dir:
+            # 按写入的字节数累计文件大小(包括多字节字符), 写入时不再获取文件状态
+            path = os.path.join(log_dir, 'bytes.log')
+            handler = template_logging.TemplateTimedRotatingFileHandler(path, 2, max_bytes=1000, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            with mock.patch('os.fstat', wraps=os.fstat) as fstat:
+                for index in range(3):
+                    handler.handle(logging.makeLogRecord({'msg': f"中文{index}"}))
+                self.assertEqual(fstat.call_count, 0)
+            self.assertEqual(handler._file_size, os.path.getsize(handler.currentFileName))
+            handler.close()
+
+        with tempfile.TemporaryDirectory() as log_dir:
+            # 按总大小清理, 从最早的压缩包开始删除
+            handler = template_logging.TemplateTimedRotatingFileHandler(
+                os.path.join(log_dir, 'size.log'), 0, delay=True, retention_days=3650, retention_bytes=1500
+            )
+            for day in range(1, 4):
+                with open(os.path.join(log_dir, f"size.log.2022-01-0{day}_2022-01-0{day}.tar.gz"), 'wb') as f:
+                    f.write(b'x' * 1000)
+            handler.clean_log_zip()
+            remain = [_f for _f in os.listdir(log_dir) if _f.startswith('size.log.2022')]
+            self.assertEqual(remain, ['size.log.2022-01-03_2022-01-03.tar.gz'])
+            handler.close()
+
+        self.passed = True
+
+    def test_multiprocess_rollover(self):
+        processes, days, lines = 4, 4, 500
+        context = multiprocessing.get_context('fork')
+        with tempfile.TemporaryDirectory() as log_dir:
+            barrier = context.Barrier(processes)
+            workers = [
+                context.Process(target=write_days, args=(log_dir, _i, days, lines, barrier)) for _i in range(processes)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join(60)
+                self.assertEqual(worker.exitcode, 0)
+
+            written = []
+            archived_days = []
+            for name in sorted(os.listdir(log_dir)):
+                path = os.path.join(log_dir, name)
+                if name.endswith('.tar.gz'):
+                    with tarfile.open(path, 'r:gz') as tar:
+                        for member in tar.getmembers():
+                            archived_days.append(member.name)
+                            written.extend(tar.extractfile(member).read().decode().splitlines())
+                elif name.startswith('stress.log.') and name[-1].isdigit():
+                    with open(path) as f:
+                        written.extend(f.read().splitlines())
+            # 每天的日志只被压缩一次, 且没有丢失
+            self.assertEqual(len(archived_days), len(set(archived_days)))
+            self.assertGreater(len(archived_days), 0)
+            self.assertEqual(sorted(written), sorted(
+                f"{_i}-{_d}-{_l}" for _i in range(processes) for _d in range(1, days + 1) for _l in range(lines)
+            ))
+            self.assertEqual(
+                os.readlink(os.path.join(log_dir, 'stress.log')),
+                f"stress.log.{datetime.date.today() + datetime.timedelta(days=days)}"
+            )
+
+        self.passed = True
+
+    def test_multiprocess_scan(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            path = os.path.join(log_dir, 'scan.log')
+            # 两个handler模拟两个进程
+            first, second = [
+                template_logging.TemplateTimedRotatingFileHandler(
+                    path, 1, delay=True, multiprocess=True, retention_days=3650
+                ) for _ in range(2)
+            ]
+            for day in (1, 2):
+                with open(f"{path}.2022-01-0{day}", 'w') as f:
+                    f.write(f"day {day}\n")
+            with mock.patch.object(first, '_scan', wraps=first._scan) as first_scan:
+                # 首次压缩时扫描
+                first.archive()
+                self.assertEqual(first_scan.call_count, 1)
+                # 目录只被自己修改过时不再扫描, 自己切换的日志文件直接记录到索引
+                with open(f"{path}.2022-01-03", 'w') as f:
+                    f.write("day 3\n")
+                first._add_log(f"{path}.2022-01-03")
+                first.archive()
+                self.assertEqual(first_scan.call_count, 1)
+                # 其他进程压缩后重新扫描, 不会压缩已被删除的日志文件
+                with open(f"{path}.2022-01-04", 'w') as f:
+                    f.write("day 4\n")
+                first._add_log(f"{path}.2022-01-04")
+                second.archive()
+                first.archive()
+                self.assertEqual(first_scan.call_count, 2)
+            self.assertEqual(sorted(os.listdir(log_dir)), [
+                'scan.log.2022-01-01_2022-01-01.tar.gz', 'scan.log.2022-01-02_2022-01-02.tar.gz',
+                'scan.log.2022-01-03_2022-01-03.tar.gz', 'scan.log.2022-01-04', 'scan.log.lock'
+            ])
+            first.close()
+            second.close()
+
+        self.passed = True
+
+    def test_buffered_write(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            path = os.path.join(log_dir, 'buffered.log')
+            handler = template_logging.TemplateTimedRotatingFileHandler(
+                path, 7, buffer_size=1024, flush_interval=60000
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            handler.handle(logging.makeLogRecord({'msg': 'info', 'levelno': logging.INFO}))
+            # 缓冲中的日志未写入
+            self.assertEqual(os.path.getsize(path), 0)
+            # ERROR级别立即写入
+            handler.handle(logging.makeLogRecord({'msg': 'error', 'levelno': logging.ERROR}))
+            self.assertEqual(open(path).read(), 'info\nerror\n')
+            # 超过buffer_size时写入
+            for _ in range(200):
+                handler.handle(logging.makeLogRecord({'msg': 'x' * 9, 'levelno': logging.INFO}))
+            self.assertGreater(os.path.getsize(path), 1024)
+            handler.close()
+            self.assertEqual(os.path.getsize(path), len('info\nerror\n') + 200 * 10)
+
+            # 超过flush_interval时由后台线程写入
+            path = os.path.join(log_dir, 'interval.log')
+            handler = template_logging.TemplateTimedRotatingFileHandler(
+                path, 7, buffer_size=1024, flush_interval=50
+            )
+            handler.handle(logging.makeLogRecord({'msg': 'interval', 'levelno': logging.INFO}))
+            deadline = time.time() + 5
+            while os.path.getsize(path) == 0 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(open(path).read(), 'interval\n')
+            handler.close()
+
+            # fork后子进程不重复写入父进程缓冲中的日志, 并重新启动后台线程
+            path = os.path.join(log_dir, 'fork.log')
+            handler = template_logging.TemplateTimedRotatingFileHandler(
+                path, 7, buffer_size=1024, flush_interval=60000
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            interval_path = os.path.join(log_dir, 'fork_interval.log')
+            interval_handler = template_logging.TemplateTimedRotatingFileHandler(
+                interval_path, 7, buffer_size=1024, flush_interval=50
+            )
+            handler.handle(logging.makeLogRecord({'msg': 'parent', 'levelno': logging.INFO}))
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    handler.handle(logging.makeLogRecord({'msg': 'child', 'levelno': logging.INFO}))
+                    handler.close()
+                    interval_handler.handle(logging.makeLogRecord({'msg': 'child', 'levelno': logging.INFO}))
+                    deadline = time.time() + 5
+                    while os.path.getsize(interval_path) == 0 and time.time() < deadline:
+                        time.sleep(0.01)
+                    code = 0 if os.path.getsize(interval_path) > 0 else 2
+                finally:
+                    os._exit(code)
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+            handler.close()
+            interval_handler.close()
+            self.assertEqual(open(path).read(), 'child\nparent\n')
+            self.assertEqual(open(interval_path).read(), 'child\n')
+
+        self.passed = True
+
+    def test_json_formatter(self):
+        formatter = template_logging.TemplateJSONFormatter()
+        record = logging.makeLogRecord({
+            'name': 'json', 'msg': 'hello %s', 'args': ('world',), 'levelno': logging.INFO, 'levelname': 'INFO',
+            'created': 1640995200.123, 'msecs': 123, 'order_id': uuid1(), 'amount': 1.5,
+        })
+        data = json.loads(formatter.format(record))
+        self.assertEqual(data['message'], 'hello world')
+        self.assertEqual(data['level'], 'INFO')
+        self.assertEqual(data['time'], time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(1640995200)) + '.123')
+        # extra字段使用TemplateJSONEncoder序列化
+        self.assertEqual(data['order_id'], str(record.order_id))
+        self.assertEqual(data['amount'], 1.5)
+        # 无法序列化的extra字段转为字符串
+        record.unknown = object()
+        self.assertTrue(json.loads(formatter.format(record))['unknown'].startswith('<object'))
+
+        try:
+            raise ValueError('json error')
+        except ValueError:
+            self.logger.error('failed', exc_info=True, extra={'step': 1})
+        record = logging.makeLogRecord({'msg': 'line\nbreak', 'exc_text': 'Traceback'})
+        output = formatter.format(record)
+        self.assertNotIn('\n', output)
+        self.assertEqual(json.loads(output)['exc_info'], 'Traceback')
+
+        self.passed = True
+
+    def test_rate_limit_filter(self):
+        records = []
+
+        class ListHandler(logging.Handler):
+            def emit(self, record):
+                records.append(record.getMessage())
+
+        logger = logging.getLogger('test_rate_limit')
+        logger.propagate = False
+        handler = ListHandler()
+        handler.addFilter(template_logging.TemplateRateLimitFilter(60, 10, 5))
+        logger.addHandler(handler)
+        try:
+            now = time.time()
+            for index in range(25):
+                record = logger.makeRecord(logger.name, logging.WARNING, __file__, 1, 'hot path %d', (index,), None)
+                record.created = now
+                logger.handle(record)
+            # 前10条正常输出, 之后每5条保留1条
+            self.assertEqual(len(records), 13)
+            # 其他日志不受影响
+            logger.warning('other')
+            self.assertEqual(records[-1], 'other')
+            # 无法hash的日志内容
+            for _ in range(3):
+                logger.warning({'a': 1})
+            self.assertEqual(records[-1], "{'a': 1}")
+            self.assertEqual(len(records), 17)
+            # 窗口结束后先输出汇总
+            record = logger.makeRecord(logger.name, logging.WARNING, __file__, 1, 'hot path %d', (25,), None)
+            record.created = now + 60
+            logger.handle(record)
+            self.assertEqual(records[-2:], ['suppressed 12 messages in 60s: hot path %d', 'hot path 25'])
+        finally:
+            logger.removeHandler(handler)
+
+        # log.ini中配置filter, 重新加载配置时不会重复添加
+        template_logging.init_logger()
+        template_logging.init_logger()
+        cache_logger = logging.getLogger('template_cache.decorators')
+        self.assertEqual(len(cache_logger.filters), 1)
+        self.assertIsInstance(cache_logger.filters[0], template_logging.TemplateRateLimitFilter)
+        template_logging.init_logger('./config/log.ini')
+        self.assertEqual(len(cache_logger.filters), 0)
+
+        self.passed = True
+
+    def test_ring_buffer_handler(self):
+        records = []
+
+        class ListHandler(logging.Handler):
+            def emit(self, record):
+                records.append(record.getMessage())
+
+        ring = template_logging.TemplateRingBufferHandler(3, target=ListHandler())
+        logger = logging.getLogger('test_ring_buffer')
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(ring)
+        try:
+            for index in range(5):
+                logger.debug('main %d', index)
+            thread = threading.Thread(target=logger.debug, args=('thread',))
+            thread.start()
+            thread.join()
+            # 平时不输出
+            self.assertEqual(records, [])
+            # ERROR日志触发输出当前线程最近的日志
+            logger.error('failed')
+            self.assertEqual(records, ['main 3', 'main 4', 'failed'])
+            logger.debug('after')
+            ring.dump()
+            self.assertEqual(records[-1], 'after')
+            ring.dump(all_threads=True)
+            self.assertEqual(records[-1], 'thread')
+            self.assertEqual(len(records), 5)
+        finally:
+            logger.removeHandler(ring)
+            ring.close()
+
+        # fileConfig中通过target配置输出的handler
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write(
+                "[formatters]\nkeys=\n[handlers]\nkeys=console,ring\n"
+                "[handler_console]\nclass=StreamHandler\nargs=(sys.stdout,)\n"
+                "[handler_ring]\nclass=template_logging.TemplateRingBufferHandler\nlevel=DEBUG\n"
+                "args=(100, ERROR)\ntarget=console\n"
+                "[loggers]\nkeys=root\n[logger_root]\nlevel=DEBUG\nhandlers=ring\n"
+            )
+        try:
+            template_logging.init_logger(f.name)
+            ring = logging.getLogger().handlers[0]
+            self.assertIsInstance(ring, template_logging.TemplateRingBufferHandler)
+            self.assertIsInstance(ring.target, logging.StreamHandler)
+        finally:
+            os.remove(f.name)
+            template_logging.init_logger('./config/log.ini')
+
+        self.passed = True
+
+    def test_lazy_message(self):
+        calls = []
+
+        def expensive(value):
+            calls.append(value)
+            return json.dumps(value)
+
+        logger = logging.getLogger('test_lazy')
+        logger.setLevel(logging.INFO)
+        # 日志级别未开启时不计算
+        logger.debug('payload: %s', template_logging.lazy(expensive, {'a': 1}))
+        self.assertEqual(calls, [])
+        # 多个handler输出同一条日志时只计算一次
+        message = template_logging.lazy(expensive, {'a': 1})
+        record = logger.makeRecord(logger.name, logging.INFO, __file__, 1, 'payload: %s', (message,), None)
+        self.assertEqual(record.getMessage(), 'payload: {"a": 1}')
+        self.assertEqual(record.getMessage(), 'payload: {"a": 1}')
+        self.assertEqual(calls, [{'a': 1}])
+        self.assertEqual(repr(message), repr('{"a": 1}'))
+
+        self.passed = True
+
     def test_debug_log(self):
         log_text = f"this is debug {self.uuid_string}"
         self.logger.debug(log_text)
@@ -2,11 +2,15 @@
 
 
 import os
+import time
+import threading
 import unittest
 
+import jwt
 import inject
 import template_logging
-from template_rbac import OAuth2SSO
+from template_exception import TokenInvalidException, UserResourceNotFoundException, KeyParamsTypeInvalidException
+from template_rbac import OAuth2SSO, Auth
 from flask import Flask, make_response
 
 # 创建日志目录
@@ -123,6 +127,108 @@ class TestTemplateRbacMethods(unittest.TestCase):
             f"func {self.__class__.__name__}.{self._testMethodName}.........{'passed' if self.passed else 'failed'}"
         )
 
+    def test_token_cache(self):
+        auth = Auth('abcd1234', token_cache_size=2, token_cache_ttl=60)
+        token = jwt.encode({'exp': int(time.time()) + 3600, 'data': {'username': 'user'}}, 'abcd1234', 'HS256')
+        if isinstance(token, bytes):
+            token = token.decode('utf-8')
+        jwt_obj = auth.decode_token(token)
+        self.assertEqual(jwt_obj['data'], {'username': 'user'})
+        # 修改返回值不影响缓存
+        jwt_obj['extra'] = 1
+        jwt_obj['data']['username'] = 'other'
+        self.assertEqual(auth.decode_token(token), {'exp': jwt_obj['exp'], 'data': {'username': 'user'}})
+        info = auth.token_cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+        # 缓存时间不超过token_cache_ttl
+        self.assertLessEqual(next(iter(auth.token_cache._data.values()))[0], time.time() + 60)
+        # 超出数量后淘汰最久未使用的token
+        for index in range(2):
+            other = jwt.encode({'index': index}, 'abcd1234', 'HS256')
+            auth.decode_token(other.decode('utf-8') if isinstance(other, bytes) else other)
+        self.assertEqual(auth.token_cache.cache_info().currsize, 2)
+        self.assertIsNone(auth.token_cache.get_claims(token, 'abcd1234'))
+        # secret变化后重新校验
+        auth.decode_token(token)
+        auth.jwt_secret = 'new_secret'
+        with self.assertRaises(TokenInvalidException):
+            auth.decode_token(token)
+        self.assertEqual(auth.token_cache.cache_info().currsize, 0)
+        # 过期的token不缓存
+        expired = jwt.encode({'exp': int(time.time()) - 1}, 'new_secret', 'HS256')
+        with self.assertRaises(TokenInvalidException):
+            auth.decode_token(expired.decode('utf-8') if isinstance(expired, bytes) else expired)
+        self.assertIsNone(Auth('abcd1234', token_cache_size=0).token_cache)
+
+        self.passed = True
+
+    def test_user_cache(self):
+        auth = Auth('abcd1234', user_info_ttl=60, user_roles_ttl=60, user_not_found_ttl=60)
+        calls = {'info': 0, 'roles': 0}
+        users = {'u1': {'name': 'u1'}}
+
+        def get_user_info(jwt_obj, **kwargs):
+            calls['info'] += 1
+            time.sleep(0.05)
+            return users.get(jwt_obj['data']['username'])
+
+        def get_user_roles(user_info, **kwargs):
+            calls['roles'] += 1
+            return ['admin']
+
+        auth.set_get_user_info_handler(get_user_info)
+        auth.set_get_user_roles_handler(get_user_roles)
+        auth.set_user_define_validator_handler(lambda user_info, jwt_obj: None)
+
+        @auth.auth(require_roles=['admin'])
+        def api():
+            return auth.get_auth_store().user_info
+
+        def request(username):
+            token = jwt.encode({'data': {'username': username}}, 'abcd1234', 'HS256')
+            auth.set_token(token.decode('utf-8') if isinstance(token, bytes) else token)
+            return api()
+
+        # 并发请求时只加载一次
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(request('u1'))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{'name': 'u1'}] * 5)
+        self.assertEqual(request('u1'), {'name': 'u1'})
+        self.assertEqual(calls, {'info': 1, 'roles': 1})
+        # 用户不存在的结果也会缓存
+        for _ in range(2):
+            with self.assertRaises(UserResourceNotFoundException):
+                request('u2')
+        self.assertEqual(calls['info'], 2)
+        # 清理缓存后重新加载
+        users['u2'] = {'name': 'u2'}
+        auth.invalidate_user('u2')
+        self.assertEqual(request('u2'), {'name': 'u2'})
+        self.assertEqual(calls['info'], 3)
+        users['u1'] = {'name': 'new u1'}
+        auth.invalidate_user()
+        self.assertEqual(request('u1'), {'name': 'new u1'})
+        self.assertEqual(calls, {'info': 4, 'roles': 3})
+        # 修改返回的用户信息不影响缓存
+        request('u1')['name'] = 'changed'
+        self.assertEqual(request('u1'), {'name': 'new u1'})
+        self.assertEqual(calls['info'], 4)
+
+        # 角色不是list时不写入缓存
+        roles = {'u3': 'admin'}
+        auth.set_get_user_roles_handler(lambda user_info, **kwargs: roles[user_info['name']])
+        users['u3'] = {'name': 'u3'}
+        with self.assertRaises(KeyParamsTypeInvalidException):
+            request('u3')
+        roles['u3'] = ['admin']
+        self.assertEqual(request('u3'), {'name': 'u3'})
+
+        self.passed = True
+
     def test_transaction_decorator(self):
         """
         测试事务注解